@@ -0,0 +1,38 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('attendance_history', sa.Column('election_id', sa.Integer(), nullable=True))
+    op.execute(
+        """
+        UPDATE attendance_history
+        SET election_id = (
+            SELECT attendances.election_id FROM attendances
+            WHERE attendances.id = attendance_history.attendance_id
+        )
+        """
+    )
+    op.create_index('ix_attendance_history_attendance_id', 'attendance_history', ['attendance_id'])
+    op.create_index(
+        'ix_attendance_history_election_changed',
+        'attendance_history',
+        ['election_id', 'changed_at', 'id'],
+    )
+    op.create_index(
+        'ix_attendance_history_election_changed_by',
+        'attendance_history',
+        ['election_id', 'changed_by', 'changed_at'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_attendance_history_election_changed_by', table_name='attendance_history')
+    op.drop_index('ix_attendance_history_election_changed', table_name='attendance_history')
+    op.drop_index('ix_attendance_history_attendance_id', table_name='attendance_history')
+    op.drop_column('attendance_history', 'election_id')
@@ -0,0 +1,20 @@
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shareholders_name', 'shareholders', ['name'])
+    op.create_index('ix_shareholders_actions', 'shareholders', ['actions'])
+    op.create_index('ix_attendances_election_shareholder', 'attendances', ['election_id', 'shareholder_id'])
+    op.create_index('ix_attendances_election_mode', 'attendances', ['election_id', 'mode'])
+
+
+def downgrade():
+    op.drop_index('ix_attendances_election_mode', table_name='attendances')
+    op.drop_index('ix_attendances_election_shareholder', table_name='attendances')
+    op.drop_index('ix_shareholders_actions', table_name='shareholders')
+    op.drop_index('ix_shareholders_name', table_name='shareholders')
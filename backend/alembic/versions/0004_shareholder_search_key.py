@@ -0,0 +1,91 @@
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+FTS_TABLE = 'shareholders_fts'
+
+# Copia de app.search a la fecha de esta revisión: las migraciones no importan la app
+def _normalize(value):
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def search_key(code, name):
+    return _normalize(f"{code or ''} {name or ''}")
+
+
+def upgrade():
+    op.add_column('shareholders', sa.Column('search_key', sa.String(), nullable=True))
+    bind = op.get_bind()
+    shareholders = sa.table(
+        'shareholders',
+        sa.column('id', sa.Integer),
+        sa.column('code', sa.String),
+        sa.column('name', sa.String),
+        sa.column('search_key', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(shareholders.c.id, shareholders.c.code, shareholders.c.name)
+            .where(shareholders.c.id > last_id)
+            .order_by(shareholders.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            shareholders.update()
+            .where(shareholders.c.id == sa.bindparam('row_id'))
+            .values(search_key=sa.bindparam('key')),
+            [{'row_id': r.id, 'key': search_key(r.code, r.name)} for r in rows],
+        )
+        last_id = rows[-1].id
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            'CREATE INDEX ix_shareholders_search_key_trgm '
+            'ON shareholders USING gin (search_key gin_trgm_ops)'
+        )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "search_key, content='shareholders', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON shareholders BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON shareholders BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) "
+            "VALUES ('delete', old.id, old.search_key); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON shareholders BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) "
+            "VALUES ('delete', old.id, old.search_key); "
+            f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END"
+        )
+        op.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_shareholders_search_key_trgm', table_name='shareholders')
+    elif dialect == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    op.drop_column('shareholders', 'search_key')
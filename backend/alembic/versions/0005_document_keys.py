@@ -0,0 +1,61 @@
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+# Copia de app.search a la fecha de esta revisión: las migraciones no importan la app
+def document_key(value):
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    compact = ''.join(ch for ch in stripped.casefold() if ch.isalnum()).upper()
+    return compact.lstrip('0') or compact[:1]
+
+
+def _backfill(bind, table_name):
+    target = sa.table(
+        table_name,
+        sa.column('id', sa.Integer),
+        sa.column('document', sa.String),
+        sa.column('document_key', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(target.c.id, target.c.document)
+            .where(target.c.id > last_id)
+            .order_by(target.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            target.update()
+            .where(target.c.id == sa.bindparam('row_id'))
+            .values(document_key=sa.bindparam('key')),
+            [{'row_id': r.id, 'key': document_key(r.document)} for r in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table_name in ('shareholders', 'persons'):
+        op.add_column(table_name, sa.Column('document_key', sa.String(), nullable=True))
+        _backfill(bind, table_name)
+        op.create_index(f'ix_{table_name}_document_key', table_name, ['document_key'])
+
+
+def downgrade():
+    for table_name in ('persons', 'shareholders'):
+        op.drop_index(f'ix_{table_name}_document_key', table_name=table_name)
+        op.drop_column(table_name, 'document_key')
@@ -0,0 +1,29 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'election_roster_snapshots',
+        sa.Column('election_id', sa.Integer(), primary_key=True),
+        sa.Column('roster_size', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('capital_suscrito', sa.DECIMAL(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True)),
+    )
+    op.execute(
+        """
+        INSERT INTO election_roster_snapshots (election_id, roster_size, capital_suscrito, updated_at)
+        SELECT a.election_id, count(*), coalesce(sum(s.actions), 0), CURRENT_TIMESTAMP
+        FROM attendances a JOIN shareholders s ON s.id = a.shareholder_id
+        GROUP BY a.election_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('election_roster_snapshots')
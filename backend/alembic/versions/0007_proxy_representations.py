@@ -0,0 +1,48 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'proxy_representations',
+        sa.Column('assignment_id', sa.Integer(), primary_key=True),
+        sa.Column('election_id', sa.Integer(), nullable=False),
+        sa.Column('shareholder_id', sa.Integer(), nullable=False),
+        sa.Column('proxy_id', sa.Integer(), nullable=False),
+        sa.Column('proxy_person_id', sa.Integer(), nullable=False),
+        sa.Column('apoderado', sa.String(), nullable=False),
+        sa.Column('weight_actions_snapshot', sa.DECIMAL(), nullable=False),
+        sa.Column('present', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('fecha_vigencia', sa.Date()),
+    )
+    op.create_index(
+        'ix_proxy_representations_election_shareholder',
+        'proxy_representations',
+        ['election_id', 'shareholder_id'],
+    )
+    op.create_index('ix_proxy_representations_proxy_id', 'proxy_representations', ['proxy_id'])
+    op.execute(
+        """
+        INSERT INTO proxy_representations (
+            assignment_id, election_id, shareholder_id, proxy_id, proxy_person_id,
+            apoderado, weight_actions_snapshot, present, fecha_vigencia
+        )
+        SELECT pa.id, p.election_id, pa.shareholder_id, p.id, p.proxy_person_id,
+               pe.name, pa.weight_actions_snapshot, coalesce(p.present, false), p.fecha_vigencia
+        FROM proxy_assignments pa
+        JOIN proxies p ON p.id = pa.proxy_id
+        JOIN persons pe ON pe.id = p.proxy_person_id
+        WHERE p.status = 'VALID'
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_proxy_representations_proxy_id', table_name='proxy_representations')
+    op.drop_index('ix_proxy_representations_election_shareholder', table_name='proxy_representations')
+    op.drop_table('proxy_representations')
@@ -0,0 +1,41 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+import_job_status = sa.Enum(
+    'QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', 'CANCELLED', name='importjobstatus'
+)
+
+
+def upgrade():
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('election_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('filename', sa.String()),
+        sa.Column('status', import_job_status, nullable=False, server_default='QUEUED'),
+        sa.Column('rows_parsed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_valid', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_written', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('errors', sa.JSON()),
+        sa.Column('result', sa.JSON()),
+        sa.Column('created_by', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True)),
+        sa.Column('started_at', sa.DateTime(timezone=True)),
+        sa.Column('finished_at', sa.DateTime(timezone=True)),
+    )
+    op.create_index('ix_import_jobs_id', 'import_jobs', ['id'])
+    op.create_index('ix_import_jobs_election_id', 'import_jobs', ['election_id'])
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_election_id', table_name='import_jobs')
+    op.drop_index('ix_import_jobs_id', table_name='import_jobs')
+    op.drop_table('import_jobs')
+    import_job_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,45 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def _has_attendees():
+    # La tabla la crea ``create_all`` de la app, no una migración anterior
+    return sa.inspect(op.get_bind()).has_table('attendees')
+
+
+def upgrade():
+    if not _has_attendees():
+        return
+    op.add_column('attendees', sa.Column('shareholder_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_attendees_shareholder_id',
+        'attendees',
+        'shareholders',
+        ['shareholder_id'],
+        ['id'],
+        ondelete='SET NULL',
+    )
+    op.create_index(
+        'ix_attendees_election_shareholder', 'attendees', ['election_id', 'shareholder_id']
+    )
+    op.execute(
+        """
+        UPDATE attendees SET shareholder_id = (
+            SELECT s.id FROM shareholders s WHERE s.code = attendees.identifier
+        )
+        WHERE shareholder_id IS NULL
+        """
+    )
+
+
+def downgrade():
+    if not _has_attendees():
+        return
+    op.drop_index('ix_attendees_election_shareholder', table_name='attendees')
+    op.drop_constraint('fk_attendees_shareholder_id', 'attendees', type_='foreignkey')
+    op.drop_column('attendees', 'shareholder_id')
@@ -0,0 +1,39 @@
+"""Record the storage format of share columns in ``settings``.
+
+The columns keep their type here: ``shares_storage`` stores what the
+database actually holds (``decimal``, or ``micro`` when ``shareholders.actions``
+is already BIGINT), so the app can refuse to start with a different
+``SHARES_STORAGE`` (see ``app.shares``). Converting is an explicit step,
+``python convert_shares.py micro|decimal``, which also updates the record.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+SETTING = 'shares_storage'
+
+
+def _current_storage():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('shareholders'):
+        return 'decimal'
+    for column in inspector.get_columns('shareholders'):
+        if column['name'] == 'actions':
+            return 'micro' if isinstance(column['type'], sa.BigInteger) else 'decimal'
+    return 'decimal'
+
+
+def upgrade():
+    settings = sa.table('settings', sa.column('key', sa.String), sa.column('value', sa.String))
+    op.execute(settings.delete().where(settings.c.key == SETTING))
+    op.execute(settings.insert().values(key=SETTING, value=_current_storage()))
+
+
+def downgrade():
+    settings = sa.table('settings', sa.column('key', sa.String), sa.column('value', sa.String))
+    op.execute(settings.delete().where(settings.c.key == SETTING))
@@ -0,0 +1,22 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'rate_limit_hits',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('hit_at', sa.Float(), nullable=False),
+    )
+    op.create_index('ix_rate_limit_hits_key_hit_at', 'rate_limit_hits', ['key', 'hit_at'])
+
+
+def downgrade():
+    op.drop_index('ix_rate_limit_hits_key_hit_at', table_name='rate_limit_hits')
+    op.drop_table('rate_limit_hits')
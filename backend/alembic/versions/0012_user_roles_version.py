@@ -0,0 +1,18 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'users',
+        sa.Column('roles_version', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_column('users', 'roles_version')
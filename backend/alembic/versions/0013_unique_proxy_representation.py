@@ -0,0 +1,39 @@
+"""One representation row per shareholder and election.
+
+Rows of shareholders held by several proxies (allowed before this revision)
+keep only the oldest assignment; ``GET /proxies/conflicts`` still reports
+them from the assignments table.
+"""
+
+from alembic import op
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'DELETE FROM proxy_representations WHERE EXISTS ('
+        'SELECT 1 FROM proxy_representations other '
+        'WHERE other.election_id = proxy_representations.election_id '
+        'AND other.shareholder_id = proxy_representations.shareholder_id '
+        'AND other.assignment_id < proxy_representations.assignment_id)'
+    )
+    op.drop_index('ix_proxy_representations_election_shareholder', table_name='proxy_representations')
+    op.create_index(
+        'ux_proxy_representations_election_shareholder',
+        'proxy_representations',
+        ['election_id', 'shareholder_id'],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index('ux_proxy_representations_election_shareholder', table_name='proxy_representations')
+    op.create_index(
+        'ix_proxy_representations_election_shareholder',
+        'proxy_representations',
+        ['election_id', 'shareholder_id'],
+    )
@@ -0,0 +1,17 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('owner', sa.String(), nullable=True))
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('import_jobs', 'heartbeat_at')
+    op.drop_column('import_jobs', 'owner')
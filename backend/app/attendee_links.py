@@ -0,0 +1,64 @@
+"""Keep ``attendees.shareholder_id`` in sync with ``identifier = code``.
+
+The link is resolved when an attendee is inserted or its identifier
+changes. A shareholder created later picks up the attendees waiting for
+its code, and changing a shareholder's code drops the attendees of the old
+code and links those of the new one. The bulk importer merge links staged
+codes itself (see ``app.importer``), since it bypasses the ORM.
+
+Imported from ``app.models`` so the listeners are always registered.
+"""
+
+from sqlalchemy import event, inspect, select, update
+
+from . import models
+
+
+def _shareholder_for(connection, identifier: str) -> int | None:
+    return connection.execute(
+        select(models.Shareholder.id).where(models.Shareholder.code == identifier)
+    ).scalar()
+
+
+def _link_code(connection, shareholder_id: int, code: str) -> None:
+    connection.execute(
+        update(models.Attendee)
+        .where(
+            models.Attendee.shareholder_id.is_(None),
+            models.Attendee.identifier == code,
+        )
+        .values(shareholder_id=shareholder_id)
+    )
+
+
+@event.listens_for(models.Attendee, "before_insert")
+def _resolve_new_attendee(mapper, connection, target):
+    if target.shareholder_id is None:
+        target.shareholder_id = _shareholder_for(connection, target.identifier)
+
+
+@event.listens_for(models.Attendee, "before_update")
+def _resolve_changed_attendee(mapper, connection, target):
+    if target.shareholder_id is None or inspect(target).attrs.identifier.history.has_changes():
+        target.shareholder_id = _shareholder_for(connection, target.identifier)
+
+
+@event.listens_for(models.Shareholder, "after_insert")
+def _link_waiting_attendees(mapper, connection, target):
+    _link_code(connection, target.id, target.code)
+
+
+@event.listens_for(models.Shareholder, "after_update")
+def _relink_renamed_shareholder(mapper, connection, target):
+    if not inspect(target).attrs.code.history.has_changes():
+        return
+    # Los asistentes del código anterior quedan sin accionista
+    connection.execute(
+        update(models.Attendee)
+        .where(
+            models.Attendee.shareholder_id == target.id,
+            models.Attendee.identifier != target.code,
+        )
+        .values(shareholder_id=None)
+    )
+    _link_code(connection, target.id, target.code)
@@ -0,0 +1,330 @@
+"""Background padrón imports with progress reporting.
+
+The upload is copied to a temporary file and an ``import_jobs`` row is
+created, so the request returns at once with the job id. The import runs
+in a thread pool (``IMPORT_JOB_WORKERS``) with the same routines as the
+synchronous endpoints (``app.importer``). After every chunk the job's
+counters (rows parsed, validated, written) are broadcast over the observer
+WebSocket as ``{"import_job": {...}}``.
+
+Live counters are kept in the worker process that accepted the job, like
+preview sessions. The row stores the durable state: status, final
+counters, the per-row error report and the result. Keeping it out of the
+import transaction means the row is never written while that transaction
+holds its locks. A cancel request sets ``cancel_requested`` on the row, so
+any worker can accept it; the import checks the flag between chunks and is
+then rolled back.
+
+Each job records the process that owns it (``owner``), and every process
+refreshes ``heartbeat_at`` on its active jobs every
+``IMPORT_JOB_HEARTBEAT`` seconds. A QUEUED or RUNNING job whose heartbeat
+is older than ``IMPORT_JOB_STALE_AFTER`` lost its process and is marked
+FAILED (``fail_stale``, at startup and on every beat). A finished job is
+never changed again, so a late ``_finish`` cannot overwrite that status.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from . import database, models
+from .importer import ImportCancelled, import_attendee_rows, import_shareholder_rows, open_table
+from .observer import manager
+from .typeahead import registry as typeahead
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", "2"))
+IMPORT_JOB_HEARTBEAT = int(os.getenv("IMPORT_JOB_HEARTBEAT", "15"))
+IMPORT_JOB_STALE_AFTER = int(os.getenv("IMPORT_JOB_STALE_AFTER", "120"))
+KINDS = ("shareholders", "assistants")
+COPY_CHUNK_SIZE = 1024 * 1024
+ACTIVE = (models.ImportJobStatus.QUEUED, models.ImportJobStatus.RUNNING)
+# Identifica a este proceso como dueño de los jobs que acepta
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_JOB_WORKERS, thread_name_prefix="import-job")
+
+
+@dataclass
+class _Handle:
+    cancel: threading.Event = field(default_factory=threading.Event)
+    rows_parsed: int = 0
+    rows_valid: int = 0
+    rows_written: int = 0
+
+
+_handles: dict[int, _Handle] = {}
+_lock = threading.Lock()
+
+
+def job_dict(job: models.ImportJob) -> dict:
+    data = {
+        "id": job.id,
+        "election_id": job.election_id,
+        "kind": job.kind,
+        "filename": job.filename,
+        "status": job.status,
+        "rows_parsed": job.rows_parsed,
+        "rows_valid": job.rows_valid,
+        "rows_written": job.rows_written,
+        "errors": job.errors,
+        "result": job.result,
+        "created_by": job.created_by,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    with _lock:
+        handle = _handles.get(job.id)
+    if handle is not None and job.status == models.ImportJobStatus.RUNNING:
+        data["rows_parsed"] = handle.rows_parsed
+        data["rows_valid"] = handle.rows_valid
+        data["rows_written"] = handle.rows_written
+    return data
+
+
+def _publish(loop: asyncio.AbstractEventLoop | None, job: models.ImportJob) -> None:
+    if loop is None or loop.is_closed() or not loop.is_running():
+        return
+    message = {"import_job": job_dict(job)}
+    try:
+        asyncio.run_coroutine_threadsafe(manager.broadcast(message), loop)
+    except RuntimeError:  # pragma: no cover - loop closed meanwhile
+        pass
+
+
+def _copy_upload(upload: UploadFile) -> str:
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        upload.file.seek(0)
+        shutil.copyfileobj(upload.file, out, COPY_CHUNK_SIZE)
+    return path
+
+
+def submit(
+    db: Session,
+    election_id: int,
+    kind: str,
+    upload: UploadFile,
+    username: str,
+    loop: asyncio.AbstractEventLoop | None = None,
+) -> models.ImportJob:
+    """Create the job row and queue the import; the upload is copied first."""
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail="invalid import kind")
+    path = _copy_upload(upload)
+    try:
+        job = models.ImportJob(
+            election_id=election_id,
+            kind=kind,
+            filename=upload.filename,
+            status=models.ImportJobStatus.QUEUED,
+            created_by=username,
+            owner=WORKER_ID,
+            heartbeat_at=datetime.now(timezone.utc),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except BaseException:
+        os.remove(path)
+        raise
+    with _lock:
+        _handles[job.id] = _Handle()
+    _executor.submit(run_job, job.id, path, loop)
+    return job
+
+
+def cancel(db: Session, job: models.ImportJob) -> None:
+    if job.status not in ACTIVE:
+        raise HTTPException(status_code=400, detail="job already finished")
+    # El flag queda en la fila: el worker que corre el job puede ser otro
+    db.execute(
+        update(models.ImportJob)
+        .where(models.ImportJob.id == job.id, models.ImportJob.status.in_(ACTIVE))
+        .values(cancel_requested=True)
+    )
+    db.commit()
+    with _lock:
+        handle = _handles.get(job.id)
+    if handle is not None:
+        handle.cancel.set()
+
+
+def _cancel_requested(job_id: int) -> bool:
+    with database.SessionLocal() as db:
+        return bool(
+            db.scalar(select(models.ImportJob.cancel_requested).where(models.ImportJob.id == job_id))
+        )
+
+
+def fail_stale(now: datetime | None = None) -> int:
+    """Mark QUEUED or RUNNING jobs whose owner stopped beating as FAILED."""
+    now = now or datetime.now(timezone.utc)
+    with database.SessionLocal() as db:
+        count = db.execute(
+            update(models.ImportJob)
+            .where(
+                models.ImportJob.status.in_(ACTIVE),
+                models.ImportJob.owner.is_distinct_from(WORKER_ID),
+                or_(
+                    models.ImportJob.heartbeat_at.is_(None),
+                    models.ImportJob.heartbeat_at < now - timedelta(seconds=IMPORT_JOB_STALE_AFTER),
+                ),
+            )
+            .values(
+                status=models.ImportJobStatus.FAILED,
+                rows_written=0,
+                errors=["import worker stopped"],
+                finished_at=now,
+            )
+        ).rowcount
+        db.commit()
+    if count:
+        logger.warning("marked %s stale import jobs as failed", count)
+    return count
+
+
+def heartbeat() -> None:
+    """Refresh ``heartbeat_at`` on this process's active jobs, then fail stale ones."""
+    now = datetime.now(timezone.utc)
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.ImportJob)
+            .where(models.ImportJob.owner == WORKER_ID, models.ImportJob.status.in_(ACTIVE))
+            .values(heartbeat_at=now)
+        )
+        db.commit()
+    fail_stale(now)
+
+
+async def run_heartbeat(interval: int = IMPORT_JOB_HEARTBEAT):
+    while True:
+        try:
+            await asyncio.to_thread(heartbeat)
+        except Exception:  # pragma: no cover - keep the loop alive
+            logger.exception("import job heartbeat failed")
+        await asyncio.sleep(interval)
+
+
+def run_job(job_id: int, path: str, loop: asyncio.AbstractEventLoop | None = None) -> None:
+    tracker = database.SessionLocal()
+    db = database.SessionLocal()
+    job = None
+    with _lock:
+        handle = _handles.get(job_id) or _Handle()
+    try:
+        job = tracker.get(models.ImportJob, job_id)
+        if handle.cancel.is_set() or job.cancel_requested:
+            _finish(tracker, job, handle, models.ImportJobStatus.CANCELLED)
+            return
+        # Solo un job aún en cola pasa a RUNNING: pudo fallar por inactividad
+        started = tracker.execute(
+            update(models.ImportJob)
+            .where(
+                models.ImportJob.id == job_id,
+                models.ImportJob.status == models.ImportJobStatus.QUEUED,
+            )
+            .values(status=models.ImportJobStatus.RUNNING, started_at=datetime.now(timezone.utc))
+        ).rowcount
+        tracker.commit()
+        if not started:
+            return
+        _publish(loop, job)
+
+        def progress(parsed: int, valid: int, written: int):
+            handle.rows_parsed, handle.rows_valid, handle.rows_written = parsed, valid, written
+            _publish(loop, job)
+            if handle.cancel.is_set() or _cancel_requested(job_id):
+                raise ImportCancelled()
+
+        try:
+            with open(path, "rb") as fileobj, open_table(fileobj, job.filename) as reader:
+                if job.kind == "shareholders":
+                    result, errors = import_shareholder_rows(db, job.election_id, reader, progress)
+                else:
+                    attendees, synced, errors = import_attendee_rows(
+                        db, job.election_id, reader, progress
+                    )
+                    result = {"attendees_created": len(attendees), "shareholders_synced": len(synced)}
+            if errors:
+                db.rollback()
+                _finish(tracker, job, handle, models.ImportJobStatus.FAILED, errors=errors)
+                return
+            db.add(
+                models.AuditLog(
+                    election_id=job.election_id,
+                    username=job.created_by,
+                    action="SHAREHOLDER_IMPORT" if job.kind == "shareholders" else "ATTENDEE_IMPORT",
+                    details={"job_id": job.id, **result},
+                )
+            )
+            db.commit()
+        except ImportCancelled:
+            db.rollback()
+            _finish(tracker, job, handle, models.ImportJobStatus.CANCELLED)
+            return
+        except HTTPException as exc:
+            db.rollback()
+            _finish(tracker, job, handle, models.ImportJobStatus.FAILED, errors=[exc.detail])
+            return
+        # Las cargas masivas pueden renombrar accionistas de otras elecciones
+        typeahead.invalidate()
+        _finish(tracker, job, handle, models.ImportJobStatus.SUCCEEDED, result=result)
+    except Exception:
+        logger.exception("import job %s failed", job_id)
+        db.rollback()
+        tracker.rollback()
+        job = tracker.get(models.ImportJob, job_id)
+        if job is not None:
+            _finish(tracker, job, handle, models.ImportJobStatus.FAILED, errors=["internal error"])
+    finally:
+        with _lock:
+            _handles.pop(job_id, None)
+        if job is not None:
+            _publish(loop, job)
+        db.close()
+        tracker.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _finish(
+    tracker: Session,
+    job: models.ImportJob,
+    handle: _Handle,
+    status: models.ImportJobStatus,
+    errors: list | None = None,
+    result: dict | None = None,
+) -> bool:
+    """Record the final state; a job that already finished is left as is."""
+    finished = tracker.execute(
+        update(models.ImportJob)
+        .where(models.ImportJob.id == job.id, models.ImportJob.status.in_(ACTIVE))
+        .values(
+            status=status,
+            rows_parsed=handle.rows_parsed,
+            rows_valid=handle.rows_valid,
+            rows_written=handle.rows_written if status == models.ImportJobStatus.SUCCEEDED else 0,
+            errors=errors,
+            result=result,
+            finished_at=datetime.now(timezone.utc),
+        )
+    ).rowcount
+    tracker.commit()
+    if not finished:
+        logger.warning("import job %s already finished, keeping its status", job.id)
+    return bool(finished)
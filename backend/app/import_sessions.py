@@ -0,0 +1,88 @@
+"""Short-lived server-side storage for validated import previews.
+
+A preview parses and validates the upload once and keeps the resulting rows
+here under a random token, so confirming the import does not need the file
+again. The store is bounded by a total row budget (oldest sessions are
+evicted first) and every session expires after ``IMPORT_PREVIEW_TTL``
+seconds. Sessions live in the worker process that produced them.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import HTTPException
+
+IMPORT_PREVIEW_TTL = int(os.getenv("IMPORT_PREVIEW_TTL", "900"))
+IMPORT_PREVIEW_MAX_ROWS = int(os.getenv("IMPORT_PREVIEW_MAX_ROWS", "200000"))
+
+
+@dataclass
+class PreviewSession:
+    token: str
+    election_id: int
+    username: str
+    rows: list
+    expires_at: float
+
+
+class PreviewStore:
+    def __init__(self, ttl: int = IMPORT_PREVIEW_TTL, max_rows: int = IMPORT_PREVIEW_MAX_ROWS):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._sessions: "OrderedDict[str, PreviewSession]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def put(self, election_id: int, username: str, rows: list) -> PreviewSession:
+        if len(rows) > self.max_rows:
+            raise HTTPException(status_code=413, detail="preview too large")
+        session = PreviewSession(
+            token=secrets.token_urlsafe(24),
+            election_id=election_id,
+            username=username,
+            rows=rows,
+            expires_at=time.time() + self.ttl,
+        )
+        with self._lock:
+            self._purge_expired()
+            while self._sessions and self._rows + len(rows) > self.max_rows:
+                _, oldest = self._sessions.popitem(last=False)
+                self._rows -= len(oldest.rows)
+            self._sessions[session.token] = session
+            self._rows += len(rows)
+        return session
+
+    def get(self, token: str, election_id: int, username: str) -> PreviewSession:
+        with self._lock:
+            self._purge_expired()
+            session = self._sessions.get(token)
+            if (
+                session is None
+                or session.election_id != election_id
+                or session.username != username
+            ):
+                raise HTTPException(status_code=404, detail="preview not found or expired")
+        return session
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(token, None)
+            if session is not None:
+                self._rows -= len(session.rows)
+
+    def pop(self, token: str, election_id: int, username: str) -> PreviewSession:
+        """Remove and return a session; tokens are single use."""
+        session = self.get(token, election_id, username)
+        self.discard(token)
+        return session
+
+    def _purge_expired(self):
+        now = time.time()
+        for token in [t for t, s in self._sessions.items() if s.expires_at <= now]:
+            self._rows -= len(self._sessions.pop(token).rows)
+
+
+preview_store = PreviewStore()
@@ -0,0 +1,458 @@
+"""Bulk import engine for the shareholder registry.
+
+Rows are staged in a temporary table (``COPY FROM STDIN`` on PostgreSQL,
+``executemany`` elsewhere) and merged into ``shareholders`` with a single
+``INSERT ... ON CONFLICT (code) DO UPDATE``. The election's attendance rows
+are then created with one ``INSERT ... SELECT`` instead of a lookup per row.
+"""
+
+import csv
+import io
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Iterator, Sequence
+from fastapi import HTTPException
+from pydantic import ValidationError
+from openpyxl import load_workbook
+from sqlalchemy import Boolean, DateTime, bindparam, column, insert, select, table, text, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, shares
+from .roster import refresh_snapshots
+from .search import document_key, search_key
+
+STAGE_TABLE = "shareholder_import_stage"
+STAGE_COLUMNS = ("code", "name", "document", "email", "actions")
+UPDATE_COLUMNS = ("name", "document", "email", "actions")
+# Columnas del stage: las de entrada más las claves normalizadas calculadas
+STAGED_COLUMNS = STAGE_COLUMNS + ("search_key", "document_key")
+
+SHAREHOLDER_FILE_COLUMNS = {"code", "name", "document", "actions"}
+ATTENDEE_FILE_COLUMNS = {"id", "accionista", "representante_legal", "apoderado", "acciones"}
+
+# Filas validadas que se mantienen en memoria antes de enviarlas al stage
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+stage_table = table(STAGE_TABLE, column("code"))
+
+
+@contextmanager
+def open_csv(fileobj: BinaryIO) -> Iterator[csv.DictReader]:
+    """Read a CSV upload incrementally straight from its spooled file.
+
+    The text wrapper decodes the bytes as they are consumed, so the file is
+    never held in memory as a whole. It is detached on exit to leave the
+    underlying upload open for FastAPI to close.
+    """
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    try:
+        yield csv.DictReader(stream)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="file must be UTF-8 encoded")
+    finally:
+        stream.detach()
+
+
+class SheetReader:
+    """``csv.DictReader``-like view over worksheet rows (first row is the header)."""
+
+    def __init__(self, rows: Iterator[tuple]):
+        header = next(rows, None) or ()
+        self.fieldnames = [str(h).strip() if h is not None else "" for h in header]
+        self._rows = rows
+
+    def numbered(self) -> Iterator[tuple[int, dict]]:
+        # Las filas vacías se saltan, pero cuentan para el número de fila
+        for number, values in enumerate(self._rows, start=2):
+            if all(v is None or v == "" for v in values):
+                continue
+            yield number, dict(zip(self.fieldnames, values))
+
+    def __iter__(self) -> Iterator[dict]:
+        for _, row in self.numbered():
+            yield row
+
+
+def iter_rows(reader) -> Iterator[tuple[int, dict]]:
+    """``(row_number, row)`` pairs as numbered in the file (the header is row 1).
+
+    Blank rows are skipped by both readers, so counting the yielded rows
+    would drift from what the user sees in the file.
+    """
+    if isinstance(reader, SheetReader):
+        yield from reader.numbered()
+    elif isinstance(reader, csv.DictReader):
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        yield from enumerate(reader, start=2)
+
+
+@contextmanager
+def open_table(fileobj: BinaryIO, filename: str | None):
+    """Stream rows from a CSV or XLSX file as dicts keyed by header."""
+    if (filename or "").lower().endswith(".xlsx"):
+        try:
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        except Exception:
+            raise HTTPException(status_code=400, detail="invalid xlsx file")
+        try:
+            yield SheetReader(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    else:
+        with open_csv(fileobj) as reader:
+            yield reader
+
+
+def require_columns(reader, required: set) -> None:
+    missing = required - set(reader.fieldnames or [])
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Missing columns: {', '.join(sorted(missing))}"
+        )
+
+
+def chunked(rows: Iterable, size: int | None = None) -> Iterator[list]:
+    size = size or IMPORT_CHUNK_SIZE
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ShareholderImporter:
+    """Stages shareholder rows and merges them with set-based statements.
+
+    Use it as a context manager so the staging table is always dropped::
+
+        with ShareholderImporter(db, election_id) as importer:
+            importer.stage(rows)
+            counts = importer.merge()
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        election_id: int,
+        update_columns: Sequence[str] = UPDATE_COLUMNS,
+    ):
+        self.db = db
+        self.election_id = election_id
+        self.update_columns = tuple(update_columns)
+        self.staged = 0
+        self.postgres = db.get_bind().dialect.name == "postgresql"
+        # El stage guarda las acciones ya en micro-acciones si ese es el almacenamiento
+        self.micro = shares.SHARES_STORAGE == "micro"
+
+    def __enter__(self):
+        self.db.execute(text(f"DROP TABLE IF EXISTS {STAGE_TABLE}"))
+        self.db.execute(
+            text(
+                f"CREATE TEMPORARY TABLE {STAGE_TABLE} ("
+                "code VARCHAR PRIMARY KEY, "
+                "name VARCHAR NOT NULL, "
+                "document VARCHAR NOT NULL, "
+                "email VARCHAR, "
+                f"actions {'BIGINT' if self.micro else 'NUMERIC'} NOT NULL, "
+                "search_key VARCHAR, "
+                "document_key VARCHAR)"
+            )
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute(text(f"DROP TABLE IF EXISTS {STAGE_TABLE}"))
+        except Exception:  # pragma: no cover - the transaction is already broken
+            if exc_type is None:
+                raise
+        return False
+
+    def stage(self, rows: Iterable) -> int:
+        """Copy validated rows into the stage.
+
+        Rows may be ``ShareholderCreate`` models, dicts or tuples ordered as
+        ``STAGE_COLUMNS``. Codes must be unique across every call; callers deduplicate first.
+        """
+        records = [_record(row) for row in rows]
+        if self.micro:
+            records = [record[:4] + (shares.to_micro(record[4]),) for record in records]
+        records = [
+            record + (search_key(record[0], record[1]), document_key(record[2]))
+            for record in records
+        ]
+        if not records:
+            return 0
+        if self.postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(records)
+            buffer.seek(0)
+            raw = self.db.connection().connection.dbapi_connection
+            with raw.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {STAGE_TABLE} ({', '.join(STAGED_COLUMNS)}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+        else:
+            self.db.execute(
+                text(
+                    f"INSERT INTO {STAGE_TABLE} ({', '.join(STAGED_COLUMNS)}) "
+                    "VALUES (:code, :name, :document, :email, :actions, :search_key, :document_key)"
+                ),
+                [dict(zip(STAGED_COLUMNS, record)) for record in records],
+            )
+        self.staged += len(records)
+        return len(records)
+
+    def merge(self) -> dict:
+        """Upsert the staged rows and create missing attendance rows."""
+        updated = self.db.execute(
+            text(
+                f"SELECT count(*) FROM {STAGE_TABLE} s "
+                "JOIN shareholders sh ON sh.code = s.code"
+            )
+        ).scalar() or 0
+        columns = self.update_columns
+        if "name" in columns:
+            columns += ("search_key",)
+        if "document" in columns:
+            columns += ("document_key",)
+        assignments = ", ".join(f"{c} = excluded.{c}" for c in columns)
+        # ``WHERE true`` keeps SQLite from parsing ON CONFLICT as a join clause
+        self.db.execute(
+            text(
+                "INSERT INTO shareholders "
+                "(code, name, document, email, actions, search_key, document_key, status) "
+                "SELECT code, name, document, email, actions, search_key, document_key, 'ACTIVE' "
+                f"FROM {STAGE_TABLE} "
+                "WHERE true "
+                f"ON CONFLICT (code) DO UPDATE SET {assignments}"
+            )
+        )
+        # PostgreSQL no convierte implícitamente texto al tipo enum
+        absent = "'AUSENTE'::attendancemode" if self.postgres else "'AUSENTE'"
+        created = self.db.execute(
+            text(
+                "INSERT INTO attendances (election_id, shareholder_id, mode, present, marked_at) "
+                f"SELECT :election_id, sh.id, {absent}, :present, :now "
+                f"FROM shareholders sh JOIN {STAGE_TABLE} s ON s.code = sh.code "
+                "WHERE NOT EXISTS ("
+                "SELECT 1 FROM attendances a "
+                "WHERE a.election_id = :election_id AND a.shareholder_id = sh.id)"
+            ).bindparams(
+                bindparam("present", type_=Boolean()),
+                bindparam("now", type_=DateTime(timezone=True)),
+            ),
+            {
+                "election_id": self.election_id,
+                "present": False,
+                "now": datetime.now(timezone.utc),
+            },
+        ).rowcount
+        # Asistentes cuyo accionista acaba de crearse (o llegó antes que él)
+        self.db.execute(
+            update(models.Attendee)
+            .where(
+                models.Attendee.shareholder_id.is_(None),
+                models.Attendee.identifier.in_(select(stage_table.c.code)),
+            )
+            .values(
+                shareholder_id=select(models.Shareholder.id)
+                .where(models.Shareholder.code == models.Attendee.identifier)
+                .scalar_subquery()
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        # El merge omite los eventos del ORM: se recalculan los padrones afectados
+        refresh_snapshots(
+            self.db,
+            select(models.Attendance.election_id)
+            .join(models.Shareholder, models.Shareholder.id == models.Attendance.shareholder_id)
+            .join(stage_table, stage_table.c.code == models.Shareholder.code)
+            .distinct(),
+        )
+        return {
+            "received": self.staged,
+            "inserted": self.staged - updated,
+            "updated": updated,
+            "attendances_created": created or 0,
+        }
+
+    def merged_shareholders(self) -> list[models.Shareholder]:
+        """Load the merged shareholders with a single join against the stage."""
+        return (
+            self.db.query(models.Shareholder)
+            .join(stage_table, stage_table.c.code == models.Shareholder.code)
+            .order_by(models.Shareholder.id)
+            .all()
+        )
+
+
+def _record(row) -> tuple:
+    if isinstance(row, tuple):
+        return row
+    data = row if isinstance(row, dict) else row.model_dump()
+    return tuple(data.get(c) for c in STAGE_COLUMNS)
+
+
+class ImportCancelled(Exception):
+    """Raised by a progress callback to stop an import between chunks."""
+
+
+class _Progress:
+    """Cumulative row counters handed to an optional ``progress`` callback.
+
+    The callback receives ``(parsed, valid, written)`` after every chunk and
+    may raise ``ImportCancelled``; the caller then rolls back.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.valid = 0
+        self.written = 0
+
+    def step(self, errors: list, valid: int, written: int):
+        self.valid += valid
+        self.written += written
+        if self.callback:
+            self.callback(self.valid + len(errors), self.valid, self.written)
+
+
+def validate_shareholder_rows(reader, errors: list) -> Iterator[schemas.ShareholderCreate]:
+    seen_codes = set()
+    for idx, row in iter_rows(reader):
+        row_errors = []
+        code = (row.get("code") or "").strip()
+        if not code:
+            row_errors.append("code required")
+        elif code in seen_codes:
+            row_errors.append("duplicate code in file")
+        else:
+            seen_codes.add(code)
+        name = (row.get("name") or "").strip()
+        if not name:
+            row_errors.append("name required")
+        document = (row.get("document") or "").strip()
+        if not document:
+            row_errors.append("document required")
+        email = (row.get("email") or "").strip() or None
+        actions_raw = row.get("actions")
+        try:
+            actions = float(actions_raw)
+            if actions < 0:
+                row_errors.append("actions must be >= 0")
+        except (TypeError, ValueError):
+            row_errors.append("actions must be a number")
+            actions = 0
+        if not row_errors:
+            try:
+                yield schemas.ShareholderCreate(
+                    code=code, name=name, document=document, email=email, actions=actions
+                )
+                continue
+            except ValidationError:
+                row_errors.append("invalid email")
+        errors.append({"row": idx, "errors": row_errors})
+
+
+def import_shareholder_rows(
+    db: Session, election_id: int, reader, progress=None
+) -> tuple[dict | None, list]:
+    """Validate and merge a shareholder file; returns ``(counts, errors)``.
+
+    Valid chunks are staged as soon as they are complete; the merge only
+    runs when the whole file is valid, otherwise ``counts`` is ``None``.
+    """
+    require_columns(reader, SHAREHOLDER_FILE_COLUMNS)
+    errors: list = []
+    tracker = _Progress(progress)
+    with ShareholderImporter(db, election_id) as importer:
+        for chunk in chunked(validate_shareholder_rows(reader, errors)):
+            importer.stage(chunk)
+            tracker.step(errors, len(chunk), len(chunk))
+        if errors:
+            return None, errors
+        counts = importer.merge()
+    tracker.step(errors, 0, 0)
+    return counts, []
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def import_attendee_rows(
+    db: Session, election_id: int, reader, progress=None
+) -> tuple[list, list, list]:
+    """Import the attendee padrón in chunks; returns ``(attendees, shareholders, errors)``.
+
+    Each chunk is validated and inserted at once, and staged into
+    ``ShareholderImporter`` so shareholders and attendance rows are synced
+    with set-based statements. Validation goes on after the first error so
+    every bad row is reported; nothing should be committed in that case.
+    """
+    require_columns(reader, ATTENDEE_FILE_COLUMNS)
+    results: list = []
+    errors: list = []
+    tracker = _Progress(progress)
+    seen_ids = set(
+        a.identifier
+        for a in db.query(models.Attendee.identifier).filter_by(election_id=election_id)
+    )
+
+    def validate(idx: int, row: dict) -> dict | None:
+        row_errors = []
+        identifier = _cell(row.get("id"))
+        if not identifier:
+            row_errors.append("id required")
+        elif identifier in seen_ids:
+            row_errors.append("duplicate id")
+        accionista = _cell(row.get("accionista"))
+        if not accionista:
+            row_errors.append("accionista required")
+        acciones_val = None
+        try:
+            acciones_val = float(row.get("acciones"))
+            if acciones_val <= 0:
+                row_errors.append("acciones must be positive")
+        except Exception:
+            row_errors.append("acciones must be numeric")
+        if row_errors:
+            errors.append(f"Row {idx}: {', '.join(row_errors)}")
+            return None
+        seen_ids.add(identifier)
+        return {
+            "election_id": election_id,
+            "identifier": identifier,
+            "accionista": accionista,
+            "representante": row.get("representante_legal") or None,
+            "apoderado": row.get("apoderado") or None,
+            "acciones": acciones_val,
+        }
+
+    with ShareholderImporter(db, election_id, update_columns=("name", "actions")) as importer:
+        for chunk in chunked(iter_rows(reader)):
+            valid = [v for v in (validate(idx, row) for idx, row in chunk) if v]
+            # Tras el primer error solo se sigue validando para informar todo
+            if errors or not valid:
+                tracker.step(errors, len(valid), 0)
+                continue
+            results.extend(db.scalars(insert(models.Attendee).returning(models.Attendee), valid))
+            importer.stage(
+                (v["identifier"], v["accionista"], v["identifier"], None, v["acciones"])
+                for v in valid
+            )
+            tracker.step(errors, len(valid), len(valid))
+        if errors:
+            return [], [], errors
+        importer.merge()
+        synced = importer.merged_shareholders()
+    return results, synced, []
+
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 try:
     from dotenv import load_dotenv
@@ -22,8 +24,12 @@ from .routers import (
     voting,
     election_users,
     settings,
+    import_jobs,
 )
-from .database import Base, engine
+from . import passwords, shares, storage
+from .database import Base, engine, pool_stats
+from .import_jobs import IMPORT_JOB_HEARTBEAT, run_heartbeat
+from .proxy_status import PROXY_EXPIRY_SWEEP_INTERVAL, run_periodic_sweep
 
 load_dotenv()
 
@@ -34,8 +40,25 @@ else:
     CORS_ORIGINS = ["http://localhost:5173"]
 
 Base.metadata.create_all(bind=engine)
+# No arrancar si SHARES_STORAGE no coincide con el formato de la base
+shares.check_storage(engine)
 
-app = FastAPI(title="BVG Attendance API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if IMPORT_JOB_HEARTBEAT > 0:
+        tasks.append(asyncio.create_task(run_heartbeat()))
+    if PROXY_EXPIRY_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_periodic_sweep()))
+    if storage.STORAGE_GC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(storage.run_periodic_sweep()))
+    yield
+    for task in tasks:
+        task.cancel()
+    passwords.shutdown()
+
+
+app = FastAPI(title="BVG Attendance API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -57,6 +80,7 @@ app.include_router(users.router)
 app.include_router(voting.router)
 app.include_router(election_users.router)
 app.include_router(settings.router)
+app.include_router(import_jobs.router)
 
 @app.get("/")
 def read_root():
@@ -67,3 +91,9 @@ def read_root():
 def health_check():
     """Simple healthcheck endpoint for monitoring."""
     return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["health"])
+def metrics():
+    """Password hashing queue and database connection pool counters."""
+    return {"password_hashing": passwords.metrics(), "db_pool": pool_stats()}
@@ -6,10 +6,10 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     Enum,
-    DECIMAL,
     Float,
     ForeignKey,
     JSON,
+    Index,
     UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
@@ -17,6 +17,7 @@ from datetime import datetime, timezone
 import enum
 
 from ..database import Base
+from ..shares import Shares
 
 class AttendanceMode(str, enum.Enum):
     PRESENCIAL = "PRESENCIAL"
@@ -36,15 +37,32 @@ class Shareholder(Base):
     __tablename__ = "shareholders"
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True, nullable=False)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     document = Column(String, nullable=False)
     email = Column(String)
-    actions = Column(DECIMAL, nullable=False, default=0)
+    actions = Column(Shares, nullable=False, default=0, index=True)
     status = Column(String, default="ACTIVE")
+    # Código y nombre normalizados (sin tildes, minúsculas) para la búsqueda
+    search_key = Column(String)
+    document_key = Column(String, index=True)
     attendances = relationship("Attendance", back_populates="shareholder")
 
+class ElectionRosterSnapshot(Base):
+    """Tamaño del padrón y capital suscrito por elección (ver ``app.roster``)."""
+    __tablename__ = "election_roster_snapshots"
+    election_id = Column(Integer, primary_key=True)
+    roster_size = Column(Integer, nullable=False, default=0)
+    capital_suscrito = Column(Shares, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
 class Attendance(Base):
     __tablename__ = "attendances"
+    __table_args__ = (
+        Index("ix_attendances_election_shareholder", "election_id", "shareholder_id"),
+        Index("ix_attendances_election_mode", "election_id", "mode"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     election_id = Column(Integer, index=True, nullable=False)
     shareholder_id = Column(Integer, ForeignKey("shareholders.id"), nullable=False)
@@ -60,8 +78,25 @@ class Attendance(Base):
 
 class AttendanceHistory(Base):
     __tablename__ = "attendance_history"
+    __table_args__ = (
+        Index("ix_attendance_history_attendance_id", "attendance_id"),
+        Index(
+            "ix_attendance_history_election_changed",
+            "election_id",
+            "changed_at",
+            "id",
+        ),
+        Index(
+            "ix_attendance_history_election_changed_by",
+            "election_id",
+            "changed_by",
+            "changed_at",
+        ),
+    )
     id = Column(Integer, primary_key=True)
     attendance_id = Column(Integer, ForeignKey("attendances.id"), nullable=False)
+    # Denormalizado desde attendances para paginar el historial por elección
+    election_id = Column(Integer)
     from_mode = Column(Enum(AttendanceMode))
     to_mode = Column(Enum(AttendanceMode))
     from_present = Column(Boolean)
@@ -81,6 +116,7 @@ class Person(Base):
     type = Column(Enum(PersonType), nullable=False)
     name = Column(String, nullable=False)
     document = Column(String, nullable=False)
+    document_key = Column(String, index=True)
     email = Column(String)
 
 class Proxy(Base):
@@ -99,16 +135,41 @@ class Proxy(Base):
     marked_by = Column(String)
     marked_at = Column(DateTime(timezone=True))
     assignments = relationship("ProxyAssignment", back_populates="proxy")
+    person = relationship("Person")
 
 class ProxyAssignment(Base):
     __tablename__ = "proxy_assignments"
     id = Column(Integer, primary_key=True)
     proxy_id = Column(Integer, ForeignKey("proxies.id"), nullable=False)
     shareholder_id = Column(Integer, ForeignKey("shareholders.id"), nullable=False)
-    weight_actions_snapshot = Column(DECIMAL, nullable=False)
+    weight_actions_snapshot = Column(Shares, nullable=False)
     valid_from = Column(Date)
     valid_until = Column(Date)
     proxy = relationship("Proxy", back_populates="assignments")
+    shareholder = relationship("Shareholder")
+
+
+class ProxyRepresentation(Base):
+    """Una fila por asignación de un poder VALID (ver ``app.representation``)."""
+    __tablename__ = "proxy_representations"
+    __table_args__ = (
+        # Un accionista, un representante por elección: rechaza dobles poderes concurrentes
+        Index(
+            "ux_proxy_representations_election_shareholder",
+            "election_id",
+            "shareholder_id",
+            unique=True,
+        ),
+    )
+    assignment_id = Column(Integer, primary_key=True)
+    election_id = Column(Integer, nullable=False)
+    shareholder_id = Column(Integer, nullable=False)
+    proxy_id = Column(Integer, nullable=False, index=True)
+    proxy_person_id = Column(Integer, nullable=False)
+    apoderado = Column(String, nullable=False)
+    weight_actions_snapshot = Column(Shares, nullable=False)
+    present = Column(Boolean, nullable=False, default=False)
+    fecha_vigencia = Column(Date)
 
 
 class ElectionStatus(str, enum.Enum):
@@ -152,6 +213,8 @@ class User(Base):
     verification_token = Column(String, nullable=True)
     reset_token = Column(String, nullable=True)
     reset_token_expires = Column(DateTime(timezone=True), nullable=True)
+    # Se incrementa con cada cambio de roles por elección (ver ``app.security``)
+    roles_version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class ElectionRole(str, enum.Enum):
@@ -201,14 +264,17 @@ class Attendee(Base):
     __tablename__ = "attendees"
     __table_args__ = (
         UniqueConstraint("election_id", "identifier", name="uix_attendee_identifier"),
+        Index("ix_attendees_election_shareholder", "election_id", "shareholder_id"),
     )
     id = Column(Integer, primary_key=True)
     election_id = Column(Integer, index=True, nullable=False)
     identifier = Column(String, nullable=False)
+    # Accionista resuelto a partir de ``identifier`` (ver ``app.attendee_links``)
+    shareholder_id = Column(Integer, ForeignKey("shareholders.id", ondelete="SET NULL"))
     accionista = Column(String, nullable=False)
     representante = Column(String)
     apoderado = Column(String)
-    acciones = Column(DECIMAL, nullable=False, default=0)
+    acciones = Column(Shares, nullable=False, default=0)
     apoderado_pdf_url = Column(String)
 
 
@@ -272,7 +338,7 @@ class Vote(Base):
     ballot_id = Column(Integer, ForeignKey("ballots.id"), nullable=False)
     option_id = Column(Integer, ForeignKey("ballot_options.id"), nullable=False)
     attendee_id = Column(Integer, ForeignKey("attendees.id"), nullable=False)
-    weight = Column(DECIMAL, nullable=False, default=0)
+    weight = Column(Shares, nullable=False, default=0)
     created_by = Column(String)
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
@@ -280,3 +346,50 @@ class Vote(Base):
     ballot = relationship("Ballot", back_populates="votes")
     option = relationship("BallotOption", back_populates="votes")
     attendee = relationship("Attendee")
+
+
+class ImportJobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+
+class ImportJob(Base):
+    """Carga de padrón ejecutada en segundo plano (ver ``app.import_jobs``)."""
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    election_id = Column(Integer, index=True, nullable=False)
+    kind = Column(String, nullable=False)
+    filename = Column(String)
+    status = Column(Enum(ImportJobStatus), nullable=False, default=ImportJobStatus.QUEUED)
+    rows_parsed = Column(Integer, nullable=False, default=0)
+    rows_valid = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # Proceso que ejecuta el job y su último latido (ver ``fail_stale``)
+    owner = Column(String)
+    heartbeat_at = Column(DateTime(timezone=True))
+    errors = Column(JSON)
+    result = Column(JSON)
+    created_by = Column(String, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+class RateLimitHit(Base):
+    """Intento registrado por el limitador compartido (ver ``app.ratelimit``)."""
+    __tablename__ = "rate_limit_hits"
+    id = Column(Integer, primary_key=True)
+    key = Column(String, nullable=False)
+    # segundos epoch: la ventana se compara igual en SQLite y PostgreSQL
+    hit_at = Column(Float, nullable=False)
+    __table_args__ = (Index("ix_rate_limit_hits_key_hit_at", "key", "hit_at"),)
+
+
+# Registra los listeners que enlazan asistentes con accionistas
+from .. import attendee_links  # noqa: E402,F401
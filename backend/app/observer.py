@@ -3,7 +3,9 @@ from typing import List
 from fastapi import WebSocket
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from . import models, schemas
+from . import models
+from .representation import current as current_representation
+from .roster import roster_totals
 
 class ObserverManager:
     def __init__(self):
@@ -27,22 +29,28 @@ class ObserverManager:
 manager = ObserverManager()
 
 def compute_summary(db: Session, election_id: int) -> dict:
-    total = db.query(models.Attendance).filter_by(election_id=election_id).count()
-    presencial = db.query(models.Attendance).filter_by(election_id=election_id, mode=models.AttendanceMode.PRESENCIAL).count()
-    virtual = db.query(models.Attendance).filter_by(election_id=election_id, mode=models.AttendanceMode.VIRTUAL).count()
-    ausente = db.query(models.Attendance).filter_by(election_id=election_id, mode=models.AttendanceMode.AUSENTE).count()
-    representado = (
-        db.query(func.count(models.ProxyAssignment.id))
-        .join(models.Proxy)
+    total, suscrito = roster_totals(db, election_id)
+    by_mode = dict(
+        db.query(models.Attendance.mode, func.count())
+        .filter(models.Attendance.election_id == election_id)
+        .group_by(models.Attendance.mode)
+        .all()
+    )
+    presencial = by_mode.get(models.AttendanceMode.PRESENCIAL, 0)
+    virtual = by_mode.get(models.AttendanceMode.VIRTUAL, 0)
+    ausente = by_mode.get(models.AttendanceMode.AUSENTE, 0)
+    representado, representado_cap = (
+        db.query(
+            func.count(models.ProxyRepresentation.assignment_id),
+            func.coalesce(func.sum(models.ProxyRepresentation.weight_actions_snapshot), 0),
+        )
         .filter(
-            models.Proxy.election_id == election_id,
-            models.Proxy.present.is_(True),
-            models.Proxy.status == models.ProxyStatus.VALID,
+            models.ProxyRepresentation.election_id == election_id,
+            models.ProxyRepresentation.present.is_(True),
+            current_representation(),
         )
-        .scalar()
-        or 0
+        .one()
     )
-    suscrito = db.query(func.coalesce(func.sum(models.Shareholder.actions), 0)).scalar() or 0
     directo = (
         db.query(func.coalesce(func.sum(models.Shareholder.actions), 0))
         .join(
@@ -54,17 +62,6 @@ def compute_summary(db: Session, election_id: int) -> dict:
         .scalar()
         or 0
     )
-    representado_cap = (
-        db.query(func.coalesce(func.sum(models.ProxyAssignment.weight_actions_snapshot), 0))
-        .join(models.Proxy)
-        .filter(
-            models.Proxy.election_id == election_id,
-            models.Proxy.present.is_(True),
-            models.Proxy.status == models.ProxyStatus.VALID,
-        )
-        .scalar()
-        or 0
-    )
     porcentaje = (directo + representado_cap) / suscrito if suscrito else 0
     return {
         "total": total,
@@ -79,40 +76,61 @@ def compute_summary(db: Session, election_id: int) -> dict:
     }
 
 
-def observer_row(db: Session, election_id: int, shareholder_id: int) -> dict:
-    sh = db.query(models.Shareholder).filter_by(id=shareholder_id).first()
-    if not sh:
-        return {}
-    attendance = (
-        db.query(models.Attendance)
-        .filter_by(election_id=election_id, shareholder_id=sh.id)
-        .first()
-    )
-    person = (
-        db.query(models.Person)
-        .join(models.Proxy, models.Proxy.proxy_person_id == models.Person.id)
-        .join(models.ProxyAssignment, models.ProxyAssignment.proxy_id == models.Proxy.id)
+def observer_rows(db: Session, election_id: int, shareholder_ids=None) -> List[dict]:
+    """Filas del observador calculadas en una sola consulta.
+
+    Sin ``shareholder_ids`` devuelve todo el registro de accionistas.
+    """
+    represented = (
+        db.query(
+            models.ProxyRepresentation.shareholder_id.label("shareholder_id"),
+            func.min(models.ProxyRepresentation.apoderado).label("apoderado"),
+        )
         .filter(
-            models.ProxyAssignment.shareholder_id == sh.id,
-            models.Proxy.election_id == election_id,
-            models.Proxy.status == models.ProxyStatus.VALID,
-            models.Proxy.present.is_(True),
+            models.ProxyRepresentation.election_id == election_id,
+            models.ProxyRepresentation.present.is_(True),
+            current_representation(),
         )
-        .first()
-    )
-    apoderado = person.name if person else None
-    acciones_propias = (
-        float(sh.actions) if attendance and attendance.present else 0.0
+        .group_by(models.ProxyRepresentation.shareholder_id)
+        .subquery()
     )
-    acciones_rep = float(sh.actions) if apoderado and not acciones_propias else 0.0
-    total = acciones_propias + acciones_rep
-    row = schemas.ObserverRow(
-        code=sh.code,
-        name=sh.name,
-        estado=attendance.mode if attendance else models.AttendanceMode.AUSENTE,
-        apoderado=apoderado,
-        acciones_propias=acciones_propias,
-        acciones_representadas=acciones_rep,
-        total_quorum=total,
+    query = (
+        db.query(
+            models.Shareholder.code,
+            models.Shareholder.name,
+            models.Shareholder.actions,
+            models.Attendance.mode,
+            models.Attendance.present,
+            represented.c.apoderado,
+        )
+        .outerjoin(
+            models.Attendance,
+            (models.Attendance.shareholder_id == models.Shareholder.id)
+            & (models.Attendance.election_id == election_id),
+        )
+        .outerjoin(represented, represented.c.shareholder_id == models.Shareholder.id)
+        .order_by(models.Shareholder.id)
     )
-    return row.model_dump()
+    if shareholder_ids is not None:
+        query = query.filter(models.Shareholder.id.in_(shareholder_ids))
+    rows = []
+    for code, name, actions, mode, present, apoderado in query:
+        acciones_propias = float(actions) if present else 0.0
+        acciones_rep = float(actions) if apoderado and not acciones_propias else 0.0
+        rows.append(
+            {
+                "code": code,
+                "name": name,
+                "estado": mode or models.AttendanceMode.AUSENTE,
+                "apoderado": apoderado,
+                "acciones_propias": acciones_propias,
+                "acciones_representadas": acciones_rep,
+                "total_quorum": acciones_propias + acciones_rep,
+            }
+        )
+    return rows
+
+
+def observer_row(db: Session, election_id: int, shareholder_id: int) -> dict:
+    rows = observer_rows(db, election_id, [shareholder_id])
+    return rows[0] if rows else {}
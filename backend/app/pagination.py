@@ -0,0 +1,35 @@
+"""Helpers for keyset (cursor) pagination.
+
+Cursors are opaque url-safe strings that carry the sort key of the last row
+returned, so the next page can be fetched with an indexed range predicate
+instead of an ``OFFSET`` scan.
+"""
+
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return values
+
+
+def keyset_after(column, id_column, value, last_id: int, descending: bool = False):
+    """Predicate selecting rows strictly after ``(value, last_id)``."""
+    if descending:
+        return or_(column < value, and_(column == value, id_column < last_id))
+    return or_(column > value, and_(column == value, id_column > last_id))
@@ -0,0 +1,185 @@
+"""Password hashing in a dedicated process pool.
+
+PBKDF2 is CPU bound, and a burst of logins used to fill FastAPI's
+threadpool and hold the GIL. Here hashing and verification run in a
+``ProcessPoolExecutor`` of ``PASSWORD_HASH_WORKERS`` processes, which also
+bounds how many run at once. The handlers stay sync: their threadpool
+thread waits on the result without holding the GIL, and their database
+work never runs on the event loop. Requests wait in the pool's queue; once
+``PASSWORD_HASH_MAX_QUEUE`` operations are pending, new ones are rejected
+with 503 instead of piling up. If a worker process dies the pool is
+broken for good, so it is replaced and the call retried once.
+``metrics()`` exposes the counters for ``/metrics``. With
+``PASSWORD_HASH_WORKERS=0`` hashing runs in a thread, for environments
+without subprocesses.
+
+Hashes are stored as ``pbkdf2_sha256$<iterations>$<salt>$<hash>``. The
+legacy ``<salt>:<hash>`` format (100k iterations) still verifies, and
+``needs_rehash`` tells the login to upgrade it, or any hash made with
+fewer than ``PASSWORD_ITERATIONS``.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", "100000"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+
+SCHEME = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100_000
+
+
+def hash_password(password: str, salt: bytes | None = None, iterations: int | None = None) -> str:
+    if salt is None:
+        salt = os.urandom(16)
+    iterations = iterations or PASSWORD_ITERATIONS
+    pwd_hash = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{SCHEME}${iterations}${salt.hex()}${pwd_hash.hex()}"
+
+
+def _parse(hashed: str) -> tuple[int, bytes, str]:
+    if hashed.startswith(SCHEME + "$"):
+        _, iterations, salt_hex, pwd_hex = hashed.split("$")
+        return int(iterations), bytes.fromhex(salt_hex), pwd_hex
+    salt_hex, pwd_hex = hashed.split(":")
+    return LEGACY_ITERATIONS, bytes.fromhex(salt_hex), pwd_hex
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    iterations, salt, pwd_hex = _parse(hashed)
+    new_hash = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return hmac.compare_digest(new_hash.hex(), pwd_hex)
+
+
+def needs_rehash(hashed: str) -> bool:
+    return not hashed.startswith(SCHEME + "$") or _parse(hashed)[0] < PASSWORD_ITERATIONS
+
+
+class _Pool:
+    def __init__(self):
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if PASSWORD_HASH_WORKERS > 0:
+                    # ``spawn``: the app has threads running, forking them is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=PASSWORD_HASH_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1)
+            return self._executor
+
+    def _enter(self, count: int) -> float:
+        with self._lock:
+            if self.pending + count > PASSWORD_HASH_MAX_QUEUE:
+                self.rejected += count
+                raise HTTPException(status_code=503, detail="password service busy")
+            self.pending += count
+            self.max_pending = max(self.max_pending, self.pending)
+        return time.perf_counter()
+
+    def _exit(self, count: int, started: float) -> None:
+        with self._lock:
+            self.pending -= count
+            self.completed += count
+            self.total_seconds += time.perf_counter() - started
+
+    def _reset(self, broken: Executor) -> None:
+        with self._lock:
+            # Otro hilo pudo haberlo reemplazado ya
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.restarts += 1
+
+    def _with_executor(self, work):
+        executor = self.executor()
+        try:
+            return work(executor)
+        except BrokenProcessPool:
+            self._reset(executor)
+            return work(self.executor())
+
+    def call(self, fn, *args):
+        started = self._enter(1)
+        try:
+            return self._with_executor(lambda executor: executor.submit(fn, *args).result())
+        finally:
+            self._exit(1, started)
+
+    def map(self, fn, *iterables) -> list:
+        items = list(zip(*iterables))
+        if not items:
+            return []
+        started = self._enter(len(items))
+        try:
+            return self._with_executor(lambda executor: list(executor.map(fn, *zip(*items))))
+        finally:
+            self._exit(len(items), started)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": PASSWORD_HASH_WORKERS,
+                "max_queue": PASSWORD_HASH_MAX_QUEUE,
+                "pending": self.pending,
+                "queued": max(0, self.pending - max(PASSWORD_HASH_WORKERS, 1)),
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "avg_latency_ms": (
+                    self.total_seconds * 1000 / self.completed if self.completed else 0.0
+                ),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = _Pool()
+
+
+def hash_password_pooled(password: str) -> str:
+    """``hash_password`` in the pool (blocking; call it from sync handlers)."""
+    return _pool.call(hash_password, password)
+
+
+def verify_password_pooled(password: str, hashed: str) -> bool:
+    """``verify_password`` in the pool (blocking; call it from sync handlers)."""
+    return _pool.call(verify_password, password, hashed)
+
+
+def hash_many(passwords: list[str]) -> list[str]:
+    """Hash several passwords in parallel across the pool (blocking)."""
+    return _pool.map(hash_password, passwords)
+
+
+def metrics() -> dict:
+    return _pool.metrics()
+
+
+def shutdown() -> None:
+    _pool.shutdown()
@@ -0,0 +1,257 @@
+"""Bulk proxy import from a manifest plus a ZIP archive of PDFs.
+
+The manifest (CSV or XLSX) has one row per assignment; rows sharing a
+``num_doc`` describe the same proxy and must agree on its data. Validation
+is set-based: rows are parsed first, then existing proxies, shareholders
+and persons are loaded with one query each. Only when every row is valid
+are the PDFs streamed out of the archive into the content-addressed store
+and the persons, proxies and assignments inserted in one transaction.
+"""
+
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+from sqlalchemy.orm import Session
+
+from . import models
+from .importer import iter_rows
+from .representation import conflicting_shareholders, ensure_mapped
+from .search import document_key
+from .storage import release, store_fileobj
+
+REQUIRED_COLUMNS = {
+    "num_doc",
+    "tipo_doc",
+    "fecha_otorg",
+    "person_name",
+    "person_document",
+    "shareholder_code",
+    "pdf",
+}
+# Columnas que deben coincidir entre las filas de un mismo poder
+PROXY_FIELDS = ("tipo_doc", "fecha_otorg", "fecha_vigencia", "person_document", "pdf")
+
+
+@dataclass
+class ManifestRow:
+    row: int
+    num_doc: str
+    tipo_doc: str
+    fecha_otorg: date | None
+    fecha_vigencia: date | None
+    person_type: models.PersonType | None
+    person_name: str
+    person_document: str
+    person_email: str | None
+    shareholder_code: str
+    weight: Decimal | None
+    pdf: str
+    errors: list = field(default_factory=list)
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _date(value, name: str, errors: list) -> date | None:
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(_text(value))
+    except ValueError:
+        errors.append(f"{name} must be a date (YYYY-MM-DD)")
+        return None
+
+
+def parse_rows(reader) -> list[ManifestRow]:
+    rows = []
+    for idx, raw in iter_rows(reader):
+        errors = []
+        values = {k: _text(raw.get(k)) for k in REQUIRED_COLUMNS}
+        for column in sorted(REQUIRED_COLUMNS):
+            if not values[column]:
+                errors.append(f"{column} required")
+        fecha_otorg = _date(raw.get("fecha_otorg"), "fecha_otorg", errors)
+        fecha_vigencia = _date(raw.get("fecha_vigencia"), "fecha_vigencia", errors)
+        person_type = None
+        type_raw = _text(raw.get("person_type")).upper() or models.PersonType.TERCERO.value
+        try:
+            person_type = models.PersonType(type_raw)
+        except ValueError:
+            errors.append("invalid person_type")
+        weight = None
+        weight_raw = _text(raw.get("weight"))
+        if weight_raw:
+            try:
+                weight = Decimal(weight_raw)
+                if weight <= 0:
+                    errors.append("weight must be positive")
+            except InvalidOperation:
+                errors.append("weight must be a number")
+        rows.append(
+            ManifestRow(
+                row=idx,
+                num_doc=values["num_doc"],
+                tipo_doc=values["tipo_doc"],
+                fecha_otorg=fecha_otorg,
+                fecha_vigencia=fecha_vigencia,
+                person_type=person_type,
+                person_name=values["person_name"],
+                person_document=values["person_document"],
+                person_email=_text(raw.get("person_email")) or None,
+                shareholder_code=values["shareholder_code"],
+                weight=weight,
+                pdf=values["pdf"],
+                errors=errors,
+            )
+        )
+    return rows
+
+
+def validate(
+    db: Session,
+    election: models.Election,
+    rows: list[ManifestRow],
+    archive_names: set[str],
+) -> tuple[dict, dict, list]:
+    """Set-based checks. Returns ``(shareholders, persons, errors)``."""
+    num_docs = {r.num_doc for r in rows if r.num_doc}
+    existing = {
+        n
+        for (n,) in db.query(models.Proxy.num_doc).filter(
+            models.Proxy.election_id == election.id, models.Proxy.num_doc.in_(num_docs)
+        )
+    }
+    codes = {r.shareholder_code for r in rows if r.shareholder_code}
+    shareholders = {
+        sh.code: sh
+        for sh in db.query(models.Shareholder.id, models.Shareholder.code, models.Shareholder.actions)
+        .filter(models.Shareholder.code.in_(codes))
+    }
+    keys = {document_key(r.person_document) for r in rows if r.person_document}
+    persons = {
+        p.document_key: p.id
+        for p in db.query(models.Person.id, models.Person.document_key).filter(
+            models.Person.document_key.in_(keys)
+        )
+    }
+
+    represented = set(
+        conflicting_shareholders(db, election.id, [sh.id for sh in shareholders.values()])
+    )
+
+    first_of = {}
+    assigned = set()
+    holder_of = {}
+    for r in rows:
+        if r.num_doc in existing:
+            r.errors.append("proxy already exists")
+        if r.shareholder_code and r.shareholder_code not in shareholders:
+            r.errors.append("shareholder not found")
+        if (r.num_doc, r.shareholder_code) in assigned:
+            r.errors.append("duplicate assignment")
+        assigned.add((r.num_doc, r.shareholder_code))
+        holder = shareholders.get(r.shareholder_code)
+        if holder is not None and (
+            holder.id in represented
+            or holder_of.setdefault(holder.id, r.num_doc) != r.num_doc
+        ):
+            r.errors.append("shareholder already has an active proxy")
+        if r.fecha_otorg and r.fecha_otorg > election.date:
+            r.errors.append("proxy not yet valid")
+        if r.fecha_vigencia and election.date > r.fecha_vigencia:
+            r.errors.append("proxy expired for election date")
+        if r.pdf and r.pdf not in archive_names:
+            r.errors.append("pdf not found in archive")
+        first = first_of.setdefault(r.num_doc, r)
+        if first is not r and any(getattr(first, f) != getattr(r, f) for f in PROXY_FIELDS):
+            r.errors.append("conflicting proxy data for num_doc")
+    errors = [{"row": r.row, "errors": r.errors} for r in rows if r.errors]
+    return shareholders, persons, errors
+
+
+def import_proxies(
+    db: Session,
+    election_id: int,
+    rows: list[ManifestRow],
+    archive: zipfile.ZipFile,
+    shareholders: dict,
+    persons: dict,
+    audit: Callable[[dict], None] | None = None,
+) -> dict:
+    """Store the PDFs, insert everything, record ``audit(result)`` and commit.
+
+    The commit happens here so that if anything fails, the commit included,
+    the stored PDFs are released again and no orphan files stay.
+    """
+    stored: dict[str, str] = {}
+    try:
+        for name in sorted({r.pdf for r in rows}):
+            with archive.open(name) as member:
+                stored[name] = store_fileobj(member)
+
+        new_persons = {}
+        for r in rows:
+            key = document_key(r.person_document)
+            if key not in persons and key not in new_persons:
+                new_persons[key] = models.Person(
+                    type=r.person_type,
+                    name=r.person_name,
+                    document=r.person_document,
+                    email=r.person_email,
+                )
+        db.add_all(new_persons.values())
+        db.flush()
+        persons = {**persons, **{k: p.id for k, p in new_persons.items()}}
+
+        proxies = {}
+        for r in rows:
+            if r.num_doc not in proxies:
+                proxies[r.num_doc] = models.Proxy(
+                    election_id=election_id,
+                    proxy_person_id=persons[document_key(r.person_document)],
+                    tipo_doc=r.tipo_doc,
+                    num_doc=r.num_doc,
+                    fecha_otorg=r.fecha_otorg,
+                    fecha_vigencia=r.fecha_vigencia,
+                    pdf_url=stored[r.pdf],
+                    status=models.ProxyStatus.VALID,
+                    mode=models.AttendanceMode.AUSENTE,
+                    present=False,
+                )
+        db.add_all(proxies.values())
+        db.flush()
+        db.add_all(
+            models.ProxyAssignment(
+                proxy_id=proxies[r.num_doc].id,
+                shareholder_id=shareholders[r.shareholder_code].id,
+                weight_actions_snapshot=r.weight or shareholders[r.shareholder_code].actions,
+            )
+            for r in rows
+        )
+        ensure_mapped(db, [p.id for p in proxies.values()])
+        result = {
+            "proxies_created": len(proxies),
+            "assignments_created": len(rows),
+            "persons_created": len(new_persons),
+            "pdfs_stored": len(set(stored.values())),
+        }
+        if audit is not None:
+            audit(result)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        for path in stored.values():
+            release(db, path)
+        raise
+    return result
@@ -0,0 +1,135 @@
+"""Proxy expiry evaluated in SQL.
+
+A VALID proxy whose ``fecha_vigencia`` has passed is treated as EXPIRED by
+every read (listing, quorum, observer rows, active-proxy checks) through
+the expressions below, so no request has to write to expire it. The stored
+status is brought up to date by ``sweep_expired``: one ``UPDATE`` per run,
+triggered on demand or by the optional periodic task in ``app.main``.
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import and_, case, literal, or_, update
+from sqlalchemy.orm import Session
+
+from . import database, models
+from .representation import refresh_representations
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre barridos automáticos; 0 desactiva la tarea periódica
+PROXY_EXPIRY_SWEEP_INTERVAL = int(os.getenv("PROXY_EXPIRY_SWEEP_INTERVAL", "0"))
+
+
+def _expired(today: date | None = None):
+    return and_(
+        models.Proxy.status == models.ProxyStatus.VALID,
+        models.Proxy.fecha_vigencia.is_not(None),
+        models.Proxy.fecha_vigencia < (today or date.today()),
+    )
+
+
+def effective_status(today: date | None = None):
+    return case(
+        (_expired(today), literal(models.ProxyStatus.EXPIRED, models.Proxy.status.type)),
+        else_=models.Proxy.status,
+    )
+
+
+def effective_present(today: date | None = None):
+    return case((_expired(today), False), else_=models.Proxy.present)
+
+
+def active_proxy(today: date | None = None):
+    """Filter for proxies that are VALID and not past ``fecha_vigencia``."""
+    return and_(
+        models.Proxy.status == models.ProxyStatus.VALID,
+        or_(
+            models.Proxy.fecha_vigencia.is_(None),
+            models.Proxy.fecha_vigencia >= (today or date.today()),
+        ),
+    )
+
+
+def is_active(proxy: models.Proxy, today: date | None = None) -> bool:
+    return proxy.status == models.ProxyStatus.VALID and not (
+        proxy.fecha_vigencia and proxy.fecha_vigencia < (today or date.today())
+    )
+
+
+def sweep_expired(db: Session, election_id: int | None = None) -> dict:
+    """Expire every overdue proxy with a single UPDATE.
+
+    Returns ``{election_id: {"proxy_ids": [...], "shareholder_ids": [...]}}``
+    for the proxies that changed; the caller commits, audits and broadcasts.
+    """
+    statement = (
+        update(models.Proxy)
+        .where(_expired())
+        .values(status=models.ProxyStatus.EXPIRED, present=False)
+        .returning(models.Proxy.id, models.Proxy.election_id)
+    )
+    if election_id is not None:
+        statement = statement.where(models.Proxy.election_id == election_id)
+    expired = db.execute(statement, execution_options={"synchronize_session": False}).all()
+    if not expired:
+        return {}
+    refresh_representations(db, [proxy_id for proxy_id, _ in expired])
+    result = defaultdict(lambda: {"proxy_ids": [], "shareholder_ids": []})
+    election_of = {}
+    for proxy_id, proxy_election in expired:
+        result[proxy_election]["proxy_ids"].append(proxy_id)
+        election_of[proxy_id] = proxy_election
+    assignments = db.query(
+        models.ProxyAssignment.proxy_id, models.ProxyAssignment.shareholder_id
+    ).filter(models.ProxyAssignment.proxy_id.in_(election_of))
+    for proxy_id, shareholder_id in assignments:
+        result[election_of[proxy_id]]["shareholder_ids"].append(shareholder_id)
+    for entry in result.values():
+        entry["proxy_ids"].sort()
+        entry["shareholder_ids"] = sorted(set(entry["shareholder_ids"]))
+    return dict(result)
+
+
+def _sweep_all() -> list[dict]:
+    from .observer import compute_summary, observer_rows
+
+    db = database.SessionLocal()
+    try:
+        swept = sweep_expired(db)
+        for election_id, entry in swept.items():
+            db.add(
+                models.AuditLog(
+                    election_id=election_id,
+                    username="system",
+                    action="PROXY_EXPIRE",
+                    details={"proxy_ids": entry["proxy_ids"]},
+                )
+            )
+        db.commit()
+        return [
+            {
+                "summary": compute_summary(db, election_id),
+                "rows": observer_rows(db, election_id, entry["shareholder_ids"]),
+            }
+            for election_id, entry in swept.items()
+        ]
+    finally:
+        db.close()
+
+
+async def run_periodic_sweep(interval: int = PROXY_EXPIRY_SWEEP_INTERVAL):
+    from .observer import manager
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            messages = await asyncio.to_thread(_sweep_all)
+        except Exception:  # pragma: no cover - keep the loop alive
+            logger.exception("proxy expiry sweep failed")
+            continue
+        for message in messages:
+            await manager.broadcast(message)
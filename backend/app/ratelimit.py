@@ -0,0 +1,158 @@
+"""Sliding-window rate limiting for failed logins.
+
+A key (``login:<username>``) is limited once it has ``limit`` hits within
+the last ``window`` seconds. Old hits drop out on their own, so there is
+nothing to expire by hand, and a successful login resets the key.
+
+Two stores, chosen with ``RATE_LIMIT_BACKEND``:
+
+* ``memory`` (default): per process. Keeps at most ``limit`` timestamps
+  per key and ``RATE_LIMIT_MAX_KEYS`` keys. Expired keys are evicted as new
+  hits arrive, and the least recently hit key goes first when full.
+* ``db``: the ``rate_limit_hits`` table, shared by every worker. Each hit
+  deletes the key's expired rows, and expired rows of other keys are purged
+  at most once per window.
+
+``hit`` records a failed attempt and answers whether the key was already
+limited in the same step, so parallel attempts cannot all pass a separate
+check. The database store runs it in the caller's session (one transaction,
+committed before returning): the hit is inserted first and counted after,
+and on PostgreSQL a transaction advisory lock on the key serializes
+concurrent hits (SQLite already serializes writers).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from sqlalchemy import delete, func, select, text
+
+from . import database, models
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "900"))
+
+
+class MemoryRateLimiter:
+    def __init__(self, limit: int, window: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: OrderedDict[str, deque] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key: str, now: float) -> deque | None:
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if not hits:
+            del self._hits[key]
+            return None
+        return hits
+
+    def is_limited(self, key: str, db=None) -> bool:
+        with self._lock:
+            hits = self._recent(key, time.time())
+            return hits is not None and len(hits) >= self.limit
+
+    def hit(self, key: str, db=None) -> bool:
+        """Record a failed attempt; True if ``key`` was already limited."""
+        now = time.time()
+        with self._lock:
+            hits = self._recent(key, now)
+            if hits is not None and len(hits) >= self.limit:
+                return True
+            if hits is None:
+                hits = self._hits[key] = deque(maxlen=self.limit)
+            hits.append(now)
+            self._hits.move_to_end(key)
+            # El primero es el menos reciente: si venció, o si sobran claves, fuera
+            while self._hits:
+                oldest_key, oldest = next(iter(self._hits.items()))
+                if len(self._hits) <= self.max_keys and oldest[-1] > now - self.window:
+                    break
+                del self._hits[oldest_key]
+        return False
+
+    def reset(self, key: str, db=None) -> None:
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._hits)
+
+
+class DatabaseRateLimiter:
+    def __init__(self, limit: int, window: float, session_factory=None):
+        self.limit = limit
+        self.window = window
+        self.session_factory = session_factory or database.SessionLocal
+        self._last_purge = 0.0
+
+    @contextmanager
+    def _session(self, db):
+        # Sin sesión del request se abre una propia
+        if db is not None:
+            yield db
+            return
+        with self.session_factory() as own:
+            yield own
+
+    def _count(self, db, key: str, now: float) -> int:
+        return db.execute(
+            select(func.count()).where(
+                models.RateLimitHit.key == key,
+                models.RateLimitHit.hit_at > now - self.window,
+            )
+        ).scalar_one()
+
+    def is_limited(self, key: str, db=None) -> bool:
+        with self._session(db) as db:
+            return self._count(db, key, time.time()) >= self.limit
+
+    def hit(self, key: str, db=None) -> bool:
+        """Record a failed attempt; True if ``key`` was already limited.
+
+        Commits ``db``: the hit has to survive the error response.
+        """
+        now = time.time()
+        with self._session(db) as db:
+            if db.get_bind().dialect.name == "postgresql":
+                db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": key})
+            expired = models.RateLimitHit.hit_at <= now - self.window
+            if now - self._last_purge >= self.window:
+                db.execute(delete(models.RateLimitHit).where(expired))
+                self._last_purge = now
+            else:
+                db.execute(delete(models.RateLimitHit).where(models.RateLimitHit.key == key, expired))
+            # Se inserta antes de contar: un intento en paralelo ya queda contado
+            own = models.RateLimitHit(key=key, hit_at=now)
+            db.add(own)
+            db.flush()
+            limited = self._count(db, key, now) > self.limit
+            if limited:
+                # No hace falta guardar más de ``limit`` intentos por clave
+                db.delete(own)
+            db.commit()
+            return limited
+
+    def reset(self, key: str, db=None) -> None:
+        with self._session(db) as db:
+            db.execute(delete(models.RateLimitHit).where(models.RateLimitHit.key == key))
+            db.commit()
+
+
+def create_limiter(limit: int, window: float, backend: str = RATE_LIMIT_BACKEND):
+    if backend == "memory":
+        return MemoryRateLimiter(limit, window)
+    if backend == "db":
+        return DatabaseRateLimiter(limit, window)
+    raise ValueError(f"unknown rate limit backend: {backend}")
+
+
+login_limiter = create_limiter(LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW_SECONDS)
@@ -0,0 +1,263 @@
+"""Per-election representation map: who represents each shareholder.
+
+``proxy_representations`` holds one row per assignment of a VALID proxy
+with the proxy person's name, the weight snapshot and the present flag,
+keyed for lookups by ``(election_id, shareholder_id)``. The observer,
+quorum summary and active-proxy checks read it instead of joining
+assignments, proxies and persons. ``fecha_vigencia`` is copied so expiry
+keeps being evaluated at read time (see ``app.proxy_status``).
+
+A shareholder has at most one row per election, enforced by the unique
+index on ``(election_id, shareholder_id)``. Writers check
+``conflicting_shareholders`` up front for a clear 400. Two concurrent
+writers can both pass that check, but the second then hits the index, and
+``conflict_guard`` turns the ``IntegrityError`` into a 409; a proxy
+committed in between is caught by ``ensure_mapped`` (also 409). Rows of
+expired proxies are purged before a rebuild so they don't hold the slot.
+Assignments that never reach the map, because another proxy already holds
+the shareholder (data loaded around the API or from before the index),
+are reported by ``conflicts``, which reads the assignments themselves.
+
+Rows are rebuilt per proxy inside the writer's transaction:
+
+* an ``after_flush`` listener covers ORM changes to proxies, assignments,
+  persons and shareholder deletions;
+* bulk statements that bypass the ORM (bulk marking, the expiry sweep)
+  call ``refresh_representations`` explicitly.
+"""
+
+from contextlib import contextmanager
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy import event, exists, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+
+_map = models.ProxyRepresentation.__table__
+
+
+def current(today: date | None = None, column=None):
+    """Filter for map rows (or proxies) not past ``fecha_vigencia``."""
+    column = _map.c.fecha_vigencia if column is None else column
+    return or_(column.is_(None), column >= (today or date.today()))
+
+
+def refresh_representations(db: Session, proxy_ids) -> None:
+    """Rebuild the map rows of ``proxy_ids`` (a list or a SELECT of ids)."""
+    if isinstance(proxy_ids, (list, tuple, set)):
+        proxy_ids = sorted({p for p in proxy_ids if p is not None})
+        if not proxy_ids:
+            return
+    connection = db.connection()
+    connection.execute(_map.delete().where(_map.c.proxy_id.in_(proxy_ids)))
+    assigned = select(models.ProxyAssignment.shareholder_id).where(
+        models.ProxyAssignment.proxy_id.in_(proxy_ids)
+    )
+    # Un poder vencido aún sin barrer no debe ocupar el lugar en el índice único
+    connection.execute(
+        _map.delete().where(_map.c.shareholder_id.in_(assigned), ~current())
+    )
+    earlier = aliased(models.ProxyAssignment)
+    earlier_proxy = aliased(models.Proxy)
+    rows = (
+        select(
+            models.ProxyAssignment.id,
+            models.Proxy.election_id,
+            models.ProxyAssignment.shareholder_id,
+            models.Proxy.id,
+            models.Proxy.proxy_person_id,
+            models.Person.name,
+            models.ProxyAssignment.weight_actions_snapshot,
+            func.coalesce(models.Proxy.present, False),
+            models.Proxy.fecha_vigencia,
+        )
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .join(models.Person, models.Person.id == models.Proxy.proxy_person_id)
+        .where(
+            models.Proxy.id.in_(proxy_ids),
+            models.Proxy.status == models.ProxyStatus.VALID,
+            current(column=models.Proxy.fecha_vigencia),
+            # Si otro poder ya representa al accionista, la asignación queda
+            # fuera del mapa (``conflicts`` la reporta). Dos transacciones
+            # concurrentes no se ven entre sí y chocan en el índice único.
+            ~exists().where(
+                _map.c.election_id == models.Proxy.election_id,
+                _map.c.shareholder_id == models.ProxyAssignment.shareholder_id,
+            ),
+            # Entre los poderes de esta misma reconstrucción gana la asignación más antigua
+            ~exists().where(
+                earlier.shareholder_id == models.ProxyAssignment.shareholder_id,
+                earlier.id < models.ProxyAssignment.id,
+                earlier_proxy.id == earlier.proxy_id,
+                earlier_proxy.id.in_(proxy_ids),
+                earlier_proxy.election_id == models.Proxy.election_id,
+                earlier_proxy.status == models.ProxyStatus.VALID,
+                current(column=earlier_proxy.fecha_vigencia),
+            ),
+        )
+    )
+    connection.execute(
+        _map.insert().from_select(
+            [
+                "assignment_id",
+                "election_id",
+                "shareholder_id",
+                "proxy_id",
+                "proxy_person_id",
+                "apoderado",
+                "weight_actions_snapshot",
+                "present",
+                "fecha_vigencia",
+            ],
+            rows,
+        )
+    )
+
+
+def has_active_proxy(db: Session, election_id: int, shareholder_id: int) -> bool:
+    return (
+        db.query(models.ProxyRepresentation.assignment_id)
+        .filter(
+            models.ProxyRepresentation.election_id == election_id,
+            models.ProxyRepresentation.shareholder_id == shareholder_id,
+            current(),
+        )
+        .first()
+        is not None
+    )
+
+
+def conflicting_shareholders(
+    db: Session,
+    election_id: int,
+    shareholder_ids,
+    exclude_proxy_id: int | None = None,
+) -> list[int]:
+    """Shareholders of ``shareholder_ids`` already held by another current proxy."""
+    shareholder_ids = list(shareholder_ids)
+    if not shareholder_ids:
+        return []
+    query = db.query(models.ProxyRepresentation.shareholder_id).filter(
+        models.ProxyRepresentation.election_id == election_id,
+        models.ProxyRepresentation.shareholder_id.in_(shareholder_ids),
+        current(),
+    )
+    if exclude_proxy_id is not None:
+        query = query.filter(models.ProxyRepresentation.proxy_id != exclude_proxy_id)
+    return sorted({shareholder_id for (shareholder_id,) in query})
+
+
+def conflicts(db: Session, election_id: int) -> list[dict]:
+    """Shareholders assigned to more than one current proxy, in one query.
+
+    Reads the assignments, not the map: the unique index keeps the map to
+    one row per shareholder.
+    """
+    active = (
+        models.Proxy.election_id == election_id,
+        models.Proxy.status == models.ProxyStatus.VALID,
+        current(column=models.Proxy.fecha_vigencia),
+    )
+    doubled = (
+        select(models.ProxyAssignment.shareholder_id)
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .where(*active)
+        .group_by(models.ProxyAssignment.shareholder_id)
+        .having(func.count(models.Proxy.id.distinct()) > 1)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            models.Shareholder.id,
+            models.Shareholder.code,
+            models.Shareholder.name,
+            models.Proxy.id,
+            models.Person.name,
+        )
+        .select_from(models.ProxyAssignment)
+        .join(doubled, doubled.c.shareholder_id == models.ProxyAssignment.shareholder_id)
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .join(models.Person, models.Person.id == models.Proxy.proxy_person_id)
+        .join(models.Shareholder, models.Shareholder.id == models.ProxyAssignment.shareholder_id)
+        .filter(*active)
+        .distinct()
+        .order_by(models.Shareholder.id, models.Proxy.id)
+    )
+    report: dict[int, dict] = {}
+    for shareholder_id, code, name, proxy_id, apoderado in rows:
+        entry = report.setdefault(
+            shareholder_id,
+            {"shareholder_id": shareholder_id, "code": code, "name": name, "proxies": []},
+        )
+        entry["proxies"].append({"proxy_id": proxy_id, "apoderado": apoderado})
+    return list(report.values())
+
+
+def ensure_mapped(db: Session, proxy_ids) -> None:
+    """Reject (409) if an assignment of ``proxy_ids`` lost its shareholder to another proxy.
+
+    Run it after the writes, just before committing: it catches proxies
+    committed since the up-front check, which the rebuild silently skips.
+    """
+    db.flush()
+    lost = (
+        db.query(models.ProxyAssignment.id)
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .filter(
+            models.Proxy.id.in_(list(proxy_ids)),
+            models.Proxy.status == models.ProxyStatus.VALID,
+            current(column=models.Proxy.fecha_vigencia),
+            ~exists().where(_map.c.assignment_id == models.ProxyAssignment.id),
+        )
+        .first()
+    )
+    if lost is not None:
+        raise HTTPException(status_code=409, detail="shareholder already has an active proxy")
+
+
+def is_conflict(exc: IntegrityError) -> bool:
+    return "proxy_representations" in str(exc.orig)
+
+
+@contextmanager
+def conflict_guard(db: Session):
+    """Map a unique-index violation on the map to 409; other errors pass through."""
+    try:
+        yield
+    except IntegrityError as exc:
+        if not is_conflict(exc):
+            raise
+        db.rollback()
+        raise HTTPException(status_code=409, detail="shareholder already has an active proxy")
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_changed_proxies(session: Session, flush_context):
+    proxies = set()
+    persons = set()
+    shareholders = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Proxy):
+            proxies.add(obj.id)
+        elif isinstance(obj, models.ProxyAssignment):
+            proxies.add(obj.proxy_id)
+        elif isinstance(obj, models.Person) and obj not in session.new:
+            persons.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, models.Shareholder):
+            shareholders.add(obj.id)
+    if persons:
+        proxies.update(
+            p
+            for (p,) in session.connection().execute(
+                select(models.Proxy.id).where(models.Proxy.proxy_person_id.in_(persons))
+            )
+        )
+    if shareholders:
+        session.connection().execute(
+            _map.delete().where(_map.c.shareholder_id.in_(shareholders))
+        )
+    if proxies:
+        refresh_representations(session, proxies)
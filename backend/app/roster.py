@@ -0,0 +1,114 @@
+"""Per-election roster snapshot: roster size and subscribed capital.
+
+``compute_summary`` reads the quorum denominator from
+``election_roster_snapshots`` instead of summing shareholder actions on
+every call. Snapshots are recomputed inside the transaction that changes
+the roster, so they commit or roll back with it:
+
+* an ``after_flush`` listener covers ORM inserts/deletes of attendance rows
+  and changes to a shareholder's actions or its deletion;
+* bulk statements that bypass the ORM (the importer, bulk deletes) call
+  ``refresh_snapshots`` explicitly.
+"""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import bindparam, event, exists, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+_snapshots = models.ElectionRosterSnapshot.__table__
+
+
+def refresh_snapshots(db: Session, election_ids) -> None:
+    """Recompute the snapshots of ``election_ids`` (a list or a SELECT of ids)."""
+    if isinstance(election_ids, (list, tuple, set)):
+        election_ids = sorted({e for e in election_ids if e is not None})
+        if not election_ids:
+            return
+    connection = db.connection()
+    aggregate = (
+        select(
+            models.Attendance.election_id,
+            func.count(),
+            func.coalesce(func.sum(models.Shareholder.actions), 0),
+            bindparam("now", datetime.now(timezone.utc), type_=_snapshots.c.updated_at.type),
+        )
+        .join(models.Shareholder, models.Shareholder.id == models.Attendance.shareholder_id)
+        .where(models.Attendance.election_id.in_(election_ids))
+        .group_by(models.Attendance.election_id)
+    )
+    # Upsert: dos transacciones que refrescan la misma elección no chocan en la PK
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    upsert = dialect.insert(_snapshots).from_select(
+        ["election_id", "roster_size", "capital_suscrito", "updated_at"], aggregate
+    )
+    connection.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[_snapshots.c.election_id],
+            set_={
+                "roster_size": upsert.excluded.roster_size,
+                "capital_suscrito": upsert.excluded.capital_suscrito,
+                "updated_at": upsert.excluded.updated_at,
+            },
+        )
+    )
+    # Elecciones que se quedaron sin padrón
+    connection.execute(
+        _snapshots.delete().where(
+            _snapshots.c.election_id.in_(election_ids),
+            ~exists().where(models.Attendance.election_id == _snapshots.c.election_id),
+        )
+    )
+
+
+def roster_totals(db: Session, election_id: int) -> tuple[int, Decimal]:
+    """``(roster_size, capital_suscrito)`` for an election."""
+    # Columnas sueltas: el mapa de identidad podría guardar una versión anterior
+    snapshot = (
+        db.query(
+            models.ElectionRosterSnapshot.roster_size,
+            models.ElectionRosterSnapshot.capital_suscrito,
+        )
+        .filter(models.ElectionRosterSnapshot.election_id == election_id)
+        .first()
+    )
+    if snapshot is not None:
+        return snapshot.roster_size, snapshot.capital_suscrito
+    # Sin snapshot: padrón vacío o datos anteriores a la migración
+    size, capital = (
+        db.query(func.count(), func.coalesce(func.sum(models.Shareholder.actions), 0))
+        .select_from(models.Attendance)
+        .join(models.Shareholder, models.Shareholder.id == models.Attendance.shareholder_id)
+        .filter(models.Attendance.election_id == election_id)
+        .one()
+    )
+    return size, capital
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_changed_rosters(session: Session, flush_context):
+    elections = set()
+    shareholders = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, models.Attendance):
+            elections.add(obj.election_id)
+    for obj in session.deleted:
+        if isinstance(obj, models.Shareholder):
+            shareholders.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, models.Shareholder) and inspect(obj).attrs.actions.history.has_changes():
+            shareholders.add(obj.id)
+    if shareholders:
+        elections.update(
+            e
+            for (e,) in session.connection().execute(
+                select(models.Attendance.election_id)
+                .where(models.Attendance.shareholder_id.in_(shareholders))
+                .distinct()
+            )
+        )
+    if elections:
+        refresh_snapshots(session, elections)
@@ -1,29 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
-import csv
-from io import StringIO, BytesIO
-from pathlib import Path
-from openpyxl import load_workbook, Workbook
-import os
+from io import BytesIO
+from openpyxl import Workbook
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
 from fastapi.responses import Response, FileResponse
 
-from .. import models, schemas, database
+from .. import models, schemas
 from ..security import get_current_user, require_role, require_election_role
+from ..typeahead import registry as typeahead
+from ..serialization import FastJSONResponse, row_dicts
+from ..storage import release, release_async, save_upload
+from ..importer import import_attendee_rows, open_table
+from ..database import get_db
 
 router = APIRouter(prefix="/elections/{election_id}/assistants", tags=["assistants"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/template", dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])] )
 def export_template(election_id: int, format: str = "csv"):
     headers = ["id", "accionista", "representante_legal", "apoderado", "acciones"]
@@ -57,115 +51,22 @@ def import_attendees_excel(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
-    required = {"id", "accionista", "representante_legal", "apoderado", "acciones"}
-    results: List[models.Attendee] = []
-    errors: List[str] = []
-    seen_ids = set(
-        a.identifier
-        for a in db.query(models.Attendee.identifier).filter_by(election_id=election_id)
-    )
-
-    def process_row(row: dict, idx: int):
-        row_errors = []
-        identifier = str(row.get("id", "")).strip()
-        if not identifier:
-            row_errors.append("id required")
-        elif identifier in seen_ids:
-            row_errors.append("duplicate id")
-        accionista = (row.get("accionista") or "").strip()
-        if not accionista:
-            row_errors.append("accionista required")
-        acciones_raw = row.get("acciones")
-        try:
-            acciones_val = float(acciones_raw)
-            if acciones_val <= 0:
-                row_errors.append("acciones must be positive")
-        except Exception:
-            row_errors.append("acciones must be numeric")
-
-        representante = (row.get("representante_legal") or None)
-        apoderado = (row.get("apoderado") or None)
-
-        if row_errors:
-            errors.append(f"Row {idx}: {', '.join(row_errors)}")
-            return
-
-        attendee = models.Attendee(
-            election_id=election_id,
-            identifier=identifier,
-            accionista=accionista,
-            representante=representante,
-            apoderado=apoderado,
-            acciones=acciones_val,
-        )
-        db.add(attendee)
-        results.append(attendee)
-        seen_ids.add(identifier)
-
-        # Sync with shareholders/attendance so registrars can see attendees
-        sh = (
-            db.query(models.Shareholder)
-            .filter_by(code=attendee.identifier)
-            .first()
-        )
-        if not sh:
-            sh = models.Shareholder(
-                code=attendee.identifier,
-                name=attendee.accionista,
-                document=attendee.identifier,
-                actions=attendee.acciones,
-                status="ACTIVE",
-            )
-            db.add(sh)
-            db.flush()
-        else:
-            sh.name = attendee.accionista
-            sh.actions = attendee.acciones
-            db.flush()
-        if not db.query(models.Attendance).filter_by(
-            election_id=election_id, shareholder_id=sh.id
-        ).first():
-            db.add(
-                models.Attendance(
-                    election_id=election_id,
-                    shareholder_id=sh.id,
-                    mode=models.AttendanceMode.AUSENTE,
-                    present=False,
-                )
-            )
-
-    if file.filename and file.filename.lower().endswith(".xlsx"):
-        wb = load_workbook(file.file)
-        sheet = wb.active
-        rows = list(sheet.values)
-        headers = [str(h).strip() if h is not None else "" for h in rows[0]]
-        if not required.issubset(headers):
-            missing = required - set(headers)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing columns: {', '.join(sorted(missing))}",
-            )
-        for idx, data_row in enumerate(rows[1:], start=2):
-            row = dict(zip(headers, data_row))
-            process_row(row, idx)
-    else:
-        content = file.file.read().decode("utf-8")
-        reader = csv.DictReader(StringIO(content))
-        if not required.issubset(reader.fieldnames or []):
-            missing = required - set(reader.fieldnames or [])
-            raise HTTPException(
-                status_code=400, detail=f"Missing columns: {', '.join(sorted(missing))}"
-            )
-        for idx, row in enumerate(reader, start=2):
-            process_row(row, idx)
+    """Importa el padrón de asistentes en bloques (ver ``import_attendee_rows``).
 
+    El archivo se lee fila a fila (``read_only`` para XLSX); si alguna fila
+    falla no se guarda nada.
+    """
+    with open_table(file.file, file.filename) as reader:
+        results, synced, errors = import_attendee_rows(db, election_id, reader)
     if errors:
         raise HTTPException(status_code=400, detail=errors)
 
     db.commit()
+    typeahead.upsert(election_id, synced)
+    for att in results:
+        typeahead.set_attendee(election_id, att.identifier, att.representante, att.apoderado)
     output: List[schemas.Attendee] = []
     for att in results:
-        db.refresh(att)
         data = schemas.Attendee.model_validate(att).model_dump()
         data["requires_document"] = bool(att.apoderado)
         data["document_uploaded"] = bool(att.apoderado_pdf_url)
@@ -179,19 +80,24 @@ def import_attendees_excel(
     dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
 )
 def list_attendees(election_id: int, db: Session = Depends(get_db)):
-    attendees = (
-        db.query(models.Attendee)
-        .filter_by(election_id=election_id)
+    rows = row_dicts(
+        db.query(
+            models.Attendee.id,
+            models.Attendee.election_id,
+            models.Attendee.identifier,
+            models.Attendee.accionista,
+            models.Attendee.representante,
+            models.Attendee.apoderado,
+            models.Attendee.acciones,
+            models.Attendee.apoderado_pdf_url,
+        )
+        .filter(models.Attendee.election_id == election_id)
         .order_by(models.Attendee.id)
-        .all()
     )
-    result: List[schemas.Attendee] = []
-    for att in attendees:
-        data = schemas.Attendee.model_validate(att).model_dump()
-        data["requires_document"] = bool(att.apoderado)
-        data["document_uploaded"] = bool(att.apoderado_pdf_url)
-        result.append(schemas.Attendee(**data))
-    return result
+    for row in rows:
+        row["requires_document"] = bool(row["apoderado"])
+        row["document_uploaded"] = bool(row["apoderado_pdf_url"])
+    return FastJSONResponse(rows)
 
 
 @router.get(
@@ -227,12 +133,21 @@ def update_attendee(
     attendee = db.query(models.Attendee).filter_by(id=attendee_id, election_id=election_id).first()
     if not attendee:
         raise HTTPException(status_code=404, detail="attendee not found")
+    previous_identifier = attendee.identifier
+    previous_pdf = attendee.apoderado_pdf_url
     for field, value in payload.model_dump(exclude_unset=True).items():
         if field == "apoderado" and not value:
             attendee.apoderado_pdf_url = None
         setattr(attendee, field, value)
     db.commit()
+    if previous_pdf != attendee.apoderado_pdf_url:
+        release(db, previous_pdf)
     db.refresh(attendee)
+    if previous_identifier != attendee.identifier:
+        typeahead.set_attendee(election_id, previous_identifier, None, None)
+    typeahead.set_attendee(
+        election_id, attendee.identifier, attendee.representante, attendee.apoderado
+    )
     data = schemas.Attendee.model_validate(attendee).model_dump()
     data["requires_document"] = bool(attendee.apoderado)
     data["document_uploaded"] = bool(attendee.apoderado_pdf_url)
@@ -252,8 +167,11 @@ def delete_attendee(
     attendee = db.query(models.Attendee).filter_by(id=attendee_id, election_id=election_id).first()
     if not attendee:
         raise HTTPException(status_code=404, detail="attendee not found")
+    pdf_url = attendee.apoderado_pdf_url
     db.delete(attendee)
     db.commit()
+    release(db, pdf_url)
+    typeahead.set_attendee(election_id, attendee.identifier, None, None)
 
 
 @router.post(
@@ -275,19 +193,11 @@ async def upload_apoderado_pdf(
         raise HTTPException(status_code=400, detail="attendee has no apoderado")
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="invalid file type")
-    content = await file.read()
-    storage_dir = Path("storage") / str(election_id) / "apoderados"
-    storage_dir.mkdir(parents=True, exist_ok=True)
-    file_path = storage_dir / f"{attendee.id}.pdf"
-    if attendee.apoderado_pdf_url:
-        try:
-            os.remove(attendee.apoderado_pdf_url)
-        except OSError:
-            pass
-    with open(file_path, "wb") as f:
-        f.write(content)
-    attendee.apoderado_pdf_url = str(file_path)
+    previous_pdf = attendee.apoderado_pdf_url
+    attendee.apoderado_pdf_url = await save_upload(file)
     db.commit()
+    if previous_pdf != attendee.apoderado_pdf_url:
+        await release_async(db, previous_pdf)
     db.refresh(attendee)
     data = schemas.Attendee.model_validate(attendee).model_dump()
     data["requires_document"] = True
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy import case, func, or_, select, union
 from typing import Dict, List
-from .. import schemas, models, database
+from .. import schemas, models
 from ..models import AttendanceMode
 from datetime import datetime, timezone
 from ..security import get_current_user, require_election_role
 from ..observer import manager, compute_summary
 from ..observer import observer_row
 from ..utils import enforce_registration_window
+from ..pagination import decode_cursor, encode_cursor, keyset_after
+from ..search import document_key
+from ..proxy_status import active_proxy
+from ..representation import has_active_proxy
+from ..database import get_db
 import anyio
 import io
 import csv
@@ -22,27 +28,6 @@ except Exception:  # pragma: no cover - reportlab optional
 
 router = APIRouter(prefix="/elections/{election_id}/attendance", tags=["attendance"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def _has_active_proxy(db: Session, election_id: int, shareholder_id: int) -> bool:
-    return (
-        db.query(models.ProxyAssignment)
-        .join(models.Proxy)
-        .filter(
-            models.ProxyAssignment.shareholder_id == shareholder_id,
-            models.Proxy.election_id == election_id,
-            models.Proxy.status == models.ProxyStatus.VALID,
-        )
-        .first()
-        is not None
-    )
-
 
 def _smtp_settings(db: Session) -> dict:
     return {s.key: s.value for s in db.query(models.Setting).all()}
@@ -93,6 +78,115 @@ def _build_pdf(election: models.Election, rows: List[tuple]) -> bytes:
     return pdf
 
 
+def _document_matches(db: Session, election_id: int, document: str):
+    """Resuelve un documento escaneado al accionista, asistente y poder vigente.
+
+    Coincide tanto con el documento del accionista como con el del apoderado
+    de un poder válido; ambas búsquedas usan el índice de ``document_key``.
+    """
+    key = document_key(document)
+    if not key:
+        raise HTTPException(status_code=400, detail="invalid document")
+    active = (
+        select(
+            models.ProxyAssignment.shareholder_id,
+            models.Proxy.id.label("proxy_id"),
+            models.Person.name.label("proxy_person"),
+            models.Person.document_key.label("proxy_document_key"),
+        )
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .join(models.Person, models.Person.id == models.Proxy.proxy_person_id)
+        .where(
+            models.Proxy.election_id == election_id,
+            active_proxy(),
+        )
+        .subquery()
+    )
+    matching_ids = union(
+        select(models.Shareholder.id).where(models.Shareholder.document_key == key),
+        select(active.c.shareholder_id).where(active.c.proxy_document_key == key),
+    )
+    return (
+        db.query(
+            models.Shareholder.id.label("shareholder_id"),
+            models.Shareholder.code,
+            models.Shareholder.name,
+            models.Shareholder.document,
+            models.Shareholder.actions,
+            models.Attendance.mode.label("attendance_mode"),
+            models.Attendance.present,
+            models.Attendee.id.label("attendee_id"),
+            models.Attendee.representante,
+            models.Attendee.apoderado,
+            active.c.proxy_id,
+            active.c.proxy_person,
+            case(
+                (models.Shareholder.document_key == key, "shareholder"), else_="proxy"
+            ).label("matched_by"),
+        )
+        .join(
+            models.Attendance,
+            (models.Attendance.shareholder_id == models.Shareholder.id)
+            & (models.Attendance.election_id == election_id),
+        )
+        .outerjoin(
+            models.Attendee,
+            (models.Attendee.shareholder_id == models.Shareholder.id)
+            & (models.Attendee.election_id == election_id),
+        )
+        .outerjoin(active, active.c.shareholder_id == models.Shareholder.id)
+        .filter(models.Shareholder.id.in_(matching_ids))
+        .order_by(models.Shareholder.code)
+        .all()
+    )
+
+
+@router.get(
+    "/by-document/{document}",
+    response_model=List[schemas.DocumentMatch],
+    dependencies=[require_election_role([models.ElectionRole.ATTENDANCE])]
+)
+def lookup_by_document(election_id: int, document: str, db: Session = Depends(get_db)):
+    rows = _document_matches(db, election_id, document)
+    if not rows:
+        raise HTTPException(status_code=404, detail="document not found")
+    return [row._mapping for row in rows]
+
+
+@router.post(
+    "/by-document/{document}/mark",
+    response_model=schemas.AttendanceBulkMarkResponse,
+    dependencies=[require_election_role([models.ElectionRole.ATTENDANCE])]
+)
+def mark_by_document(
+    election_id: int,
+    document: str,
+    payload: schemas.AttendanceDocumentMark,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Marca a los accionistas titulares del documento.
+
+    Los apoderados se registran con el poder (``/proxies/{id}/mark``); la
+    consulta por documento devuelve su ``proxy_id``.
+    """
+    codes = list(
+        dict.fromkeys(
+            row.code
+            for row in _document_matches(db, election_id, document)
+            if row.matched_by == "shareholder"
+        )
+    )
+    if not codes:
+        raise HTTPException(status_code=404, detail="shareholder not found")
+    return bulk_mark_attendance(
+        election_id,
+        schemas.AttendanceBulkMark(codes=codes, **payload.model_dump()),
+        request,
+        db,
+        current_user,
+    )
 
 
 @router.post(
@@ -117,7 +211,7 @@ def mark_attendance(
     shareholder = db.query(models.Shareholder).filter_by(code=code).first()
     if not shareholder:
         raise HTTPException(status_code=404, detail="shareholder not found")
-    if mode == AttendanceMode.AUSENTE and _has_active_proxy(db, election_id, shareholder.id):
+    if mode == AttendanceMode.AUSENTE and has_active_proxy(db, election_id, shareholder.id):
         raise HTTPException(status_code=400, detail="shareholder has active proxy")
     enforce_registration_window(db, election_id, current_user)
 
@@ -134,6 +228,7 @@ def mark_attendance(
         raise HTTPException(status_code=400, detail="attendance already marked")
     history = models.AttendanceHistory(
         attendance=attendance,
+        election_id=election_id,
         from_mode=attendance.mode,
         to_mode=mode,
         from_present=attendance.present,
@@ -178,7 +273,7 @@ def bulk_mark_attendance(
         if not shareholder:
             failed.append(code)
             continue
-        if payload.mode == AttendanceMode.AUSENTE and _has_active_proxy(db, election_id, shareholder.id):
+        if payload.mode == AttendanceMode.AUSENTE and has_active_proxy(db, election_id, shareholder.id):
             failed.append(code)
             continue
         attendance = (
@@ -199,6 +294,7 @@ def bulk_mark_attendance(
             continue
         history = models.AttendanceHistory(
             attendance=attendance,
+            election_id=election_id,
             from_mode=attendance.mode,
             to_mode=payload.mode,
             from_present=attendance.present,
@@ -234,20 +330,161 @@ def bulk_mark_attendance(
     dependencies=[require_election_role([models.ElectionRole.ATTENDANCE])]
 )
 def attendance_history(election_id: int, code: str, db: Session = Depends(get_db)):
-    shareholder = db.query(models.Shareholder).filter_by(code=code).first()
-    if not shareholder:
-        raise HTTPException(status_code=404, detail="shareholder not found")
-    attendance = db.query(models.Attendance).filter_by(
-        election_id=election_id, shareholder_id=shareholder.id
-    ).first()
-    if not attendance:
-        return []
-    return (
+    history = (
         db.query(models.AttendanceHistory)
-        .filter_by(attendance_id=attendance.id)
+        .join(models.Attendance, models.Attendance.id == models.AttendanceHistory.attendance_id)
+        .join(models.Shareholder, models.Shareholder.id == models.Attendance.shareholder_id)
+        .filter(
+            models.Shareholder.code == code,
+            models.Attendance.election_id == election_id,
+        )
         .order_by(models.AttendanceHistory.id)
         .all()
     )
+    if not history and not db.query(models.Shareholder.id).filter_by(code=code).first():
+        raise HTTPException(status_code=404, detail="shareholder not found")
+    return history
+
+
+def _history_filters(
+    query,
+    election_id: int,
+    changed_by: str | None,
+    mode: AttendanceMode | None,
+    since: datetime | None,
+    until: datetime | None,
+):
+    query = query.filter(models.AttendanceHistory.election_id == election_id)
+    if changed_by:
+        query = query.filter(models.AttendanceHistory.changed_by == changed_by)
+    if mode:
+        query = query.filter(models.AttendanceHistory.to_mode == mode)
+    if since:
+        query = query.filter(models.AttendanceHistory.changed_at >= since)
+    if until:
+        query = query.filter(models.AttendanceHistory.changed_at < until)
+    return query
+
+
+@router.get(
+    "/timeline",
+    response_model=schemas.AttendanceHistoryPage,
+    dependencies=[require_election_role([models.ElectionRole.ATTENDANCE])]
+)
+def attendance_timeline(
+    election_id: int,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    changed_by: str | None = None,
+    mode: AttendanceMode | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """Historial de cambios de toda la elección paginado por (changed_at, id)."""
+    descending = order == "desc"
+    query = _history_filters(
+        db.query(
+            models.AttendanceHistory,
+            models.Attendance.shareholder_id,
+            models.Shareholder.code,
+            models.Shareholder.name,
+        )
+        .join(models.Attendance, models.Attendance.id == models.AttendanceHistory.attendance_id)
+        .join(models.Shareholder, models.Shareholder.id == models.Attendance.shareholder_id),
+        election_id,
+        changed_by,
+        mode,
+        since,
+        until,
+    )
+    if cursor:
+        changed_at, last_id = decode_cursor(cursor, 2)
+        try:
+            changed_at = datetime.fromisoformat(changed_at)
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        query = query.filter(
+            keyset_after(
+                models.AttendanceHistory.changed_at,
+                models.AttendanceHistory.id,
+                changed_at,
+                last_id,
+                descending,
+            )
+        )
+    if descending:
+        query = query.order_by(
+            models.AttendanceHistory.changed_at.desc(), models.AttendanceHistory.id.desc()
+        )
+    else:
+        query = query.order_by(
+            models.AttendanceHistory.changed_at, models.AttendanceHistory.id
+        )
+    rows = query.limit(limit + 1).all()
+    items = [
+        schemas.AttendanceHistoryEntry(
+            **schemas.AttendanceHistory.model_validate(history).model_dump(),
+            shareholder_id=shareholder_id,
+            code=code,
+            name=name,
+        )
+        for history, shareholder_id, code, name in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = encode_cursor(last.changed_at.isoformat(), last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _minute_bucket(db: Session):
+    column = models.AttendanceHistory.changed_at
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("minute", column)
+    return func.strftime("%Y-%m-%d %H:%M:00", column)
+
+
+@router.get(
+    "/arrivals",
+    response_model=List[schemas.ArrivalBucket],
+    dependencies=[
+        require_election_role(
+            [models.ElectionRole.ATTENDANCE, models.ElectionRole.OBSERVER]
+        )
+    ]
+)
+def attendance_arrivals(
+    election_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """Llegadas (ausente -> presente) agregadas por minuto en la base de datos."""
+    bucket = _minute_bucket(db).label("minute")
+    query = _history_filters(
+        db.query(bucket, func.count(models.AttendanceHistory.id)),
+        election_id,
+        None,
+        None,
+        since,
+        until,
+    ).filter(
+        models.AttendanceHistory.to_present.is_(True),
+        or_(
+            models.AttendanceHistory.from_present.is_(False),
+            models.AttendanceHistory.from_present.is_(None),
+        ),
+    )
+    rows = query.group_by(bucket).order_by(bucket).all()
+    result = []
+    for minute, arrivals in rows:
+        if isinstance(minute, str):
+            minute = datetime.fromisoformat(minute).replace(tzinfo=timezone.utc)
+        result.append(schemas.ArrivalBucket(minute=minute, arrivals=arrivals))
+    return result
 
 
 @router.get(
@@ -1,20 +1,13 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas
 from ..security import require_role
+from ..database import get_db
 
 router = APIRouter(prefix="/elections/{election_id}/audit", tags=["audit"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get(
     "",
     response_model=List[schemas.AuditLog],
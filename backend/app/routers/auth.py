@@ -3,13 +3,21 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import os
 from datetime import datetime, timedelta, timezone
-import hashlib, hmac, secrets
+import secrets
 
 import jwt
 
-from ..database import SessionLocal
+from ..database import get_db
+from ..passwords import (
+    hash_password,
+    hash_password_pooled,
+    needs_rehash,
+    verify_password,
+    verify_password_pooled,
+)
 from ..models import User
-from ..security import get_current_user
+from ..ratelimit import login_limiter
+from ..security import election_role_claims, get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,31 +26,6 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-# track failed login attempts per username
-FAILED_LOGINS: dict[str, int] = {}
-MAX_FAILED_ATTEMPTS = 5
-
-
-def hash_password(password: str, salt: bytes | None = None) -> str:
-    if salt is None:
-        salt = os.urandom(16)
-    pwd_hash = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
-    return f"{salt.hex()}:{pwd_hash.hex()}"
-
-
-def verify_password(password: str, hashed: str) -> bool:
-    salt_hex, pwd_hex = hashed.split(":")
-    salt = bytes.fromhex(salt_hex)
-    new_hash = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
-    return hmac.compare_digest(new_hash.hex(), pwd_hex)
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 class LoginRequest(BaseModel):
     username: str
@@ -87,18 +70,24 @@ class ResetPasswordRequest(BaseModel):
 @router.post("/login")
 def login(req: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter_by(username=req.username).first()
-    if FAILED_LOGINS.get(req.username, 0) >= MAX_FAILED_ATTEMPTS:
-        if not user or not verify_password(req.password, user.hashed_password):
+    # PBKDF2 corre en el pool de procesos; este hilo solo espera el resultado
+    valid = bool(user) and verify_password_pooled(req.password, user.hashed_password)
+    limit_key = f"login:{req.username}"
+    if not valid:
+        if login_limiter.hit(limit_key, db):
             raise HTTPException(status_code=429, detail="Too many failed attempts")
-    if not user or not verify_password(req.password, user.hashed_password):
-        FAILED_LOGINS[req.username] = FAILED_LOGINS.get(req.username, 0) + 1
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
     if not user.is_verified:
         raise HTTPException(status_code=401, detail="Usuario no verificado")
-    FAILED_LOGINS.pop(req.username, None)
+    login_limiter.reset(limit_key, db)
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = hash_password_pooled(req.password)
+        db.commit()
     token_data = {"sub": user.username, "role": user.role}
     access_token = create_token(
-        token_data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), "access"
+        {**token_data, **election_role_claims(db, user)},
+        timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        "access",
     )
     refresh_token = create_token(
         token_data, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES), "refresh"
@@ -112,7 +101,7 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/refresh")
-def refresh(req: RefreshRequest):
+def refresh(req: RefreshRequest, db: Session = Depends(get_db)):
     try:
         payload = jwt.decode(req.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         if payload.get("type") != "refresh":
@@ -123,8 +112,11 @@ def refresh(req: RefreshRequest):
         raise HTTPException(status_code=401, detail="Token expirado")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
+    # Los roles por elección se leen de nuevo: el token renovado ya los trae al día
+    user = db.query(User).filter_by(username=username).first()
+    claims = election_role_claims(db, user) if user else {}
     access_token = create_token(
-        {"sub": username, "role": role},
+        {"sub": username, "role": role, **claims},
         timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
         "access",
     )
@@ -138,9 +130,9 @@ def change_password(
     current_user=Depends(get_current_user),
 ):
     user = db.query(User).filter_by(username=current_user["username"]).first()
-    if not user or not verify_password(req.old_password, user.hashed_password):
+    if not user or not verify_password_pooled(req.old_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Contraseña actual incorrecta")
-    user.hashed_password = hash_password(req.new_password)
+    user.hashed_password = hash_password_pooled(req.new_password)
     db.commit()
     return {"status": "password_changed"}
 
@@ -152,7 +144,7 @@ def register(req: RegisterRequest, db: Session = Depends(get_db)):
     token = secrets.token_hex(16)
     user = User(
         username=req.username,
-        hashed_password=hash_password(req.password),
+        hashed_password=hash_password_pooled(req.password),
         role=req.role,
         is_verified=False,
         verification_token=token,
@@ -194,7 +186,7 @@ def reset_password(req: ResetPasswordRequest, db: Session = Depends(get_db)):
         or user.reset_token_expires < datetime.now(timezone.utc).replace(tzinfo=None)
     ):
         raise HTTPException(status_code=400, detail="Token inválido o expirado")
-    user.hashed_password = hash_password(req.new_password)
+    user.hashed_password = hash_password_pooled(req.new_password)
     user.reset_token = None
     user.reset_token_expires = None
     db.commit()
@@ -1,20 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas
 from ..security import require_role, get_current_user
+from ..database import get_db
 
 router = APIRouter(prefix="/elections/{election_id}/users", tags=["election-users"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("", response_model=List[schemas.ElectionUserRole], dependencies=[require_role(["ADMIN_BVG"])])
 def list_election_users(election_id: int, db: Session = Depends(get_db)):
     rows = (
@@ -2,21 +2,19 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, timezone
-from .. import schemas, models, database
-from ..security import require_role, get_current_user
+from .. import schemas, models
+from ..security import (
+    bump_election_roles,
+    get_current_user,
+    has_election_role,
+    require_role,
+)
 from ..observer import compute_summary
+from ..database import get_db
 
 router = APIRouter(prefix="/elections", tags=["elections"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("", response_model=schemas.Election, dependencies=[require_role(["ADMIN_BVG"])])
 def create_election(election: schemas.ElectionCreate, db: Session = Depends(get_db)):
     data = election.model_dump(
@@ -199,23 +197,8 @@ def close_election(
         raise HTTPException(status_code=404, detail="Election not found")
     if election.status == models.ElectionStatus.CLOSED:
         return election
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter(
-                models.ElectionUserRole.election_id == election_id,
-                models.ElectionUserRole.user_id == user.id,
-                models.ElectionUserRole.role == models.ElectionRole.VOTE,
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(current_user, election_id, [models.ElectionRole.VOTE], db):
+        raise HTTPException(status_code=403, detail="No autorizado")
     election.status = models.ElectionStatus.CLOSED
     election.closed_at = datetime.now(timezone.utc)
     log = models.AuditLog(
@@ -269,6 +252,7 @@ def update_election(
         or payload.vote_registrars is not None
         or payload.observers is not None
     ):
+        bump_election_roles(db, election_id)
         db.query(models.ElectionUserRole).filter_by(
             election_id=election_id
         ).delete()
@@ -348,6 +332,7 @@ def delete_election(election_id: int, db: Session = Depends(get_db)):
     election = db.query(models.Election).filter_by(id=election_id).first()
     if not election:
         raise HTTPException(status_code=404, detail="Election not found")
+    bump_election_roles(db, election_id)
     db.query(models.ElectionUserRole).filter_by(election_id=election_id).delete()
     db.delete(election)
     db.commit()
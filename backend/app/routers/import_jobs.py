@@ -0,0 +1,83 @@
+import asyncio
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List
+
+from .. import import_jobs, models, schemas
+from ..security import get_current_user, require_role
+from ..utils import enforce_registration_window
+from ..database import get_db
+
+router = APIRouter(prefix="/elections/{election_id}/import-jobs", tags=["import-jobs"])
+
+
+def _get_job(db: Session, election_id: int, job_id: int) -> models.ImportJob:
+    job = db.query(models.ImportJob).filter_by(id=job_id, election_id=election_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="import job not found")
+    return job
+
+
+@router.post(
+    "",
+    status_code=202,
+    response_model=schemas.ImportJob,
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+async def create_import_job(
+    election_id: int,
+    kind: str = Form(...),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Encola una carga de padrón (``shareholders`` o ``assistants``) y devuelve el job."""
+    await run_in_threadpool(enforce_registration_window, db, election_id, current_user)
+    job = await run_in_threadpool(
+        import_jobs.submit,
+        db,
+        election_id,
+        kind,
+        file,
+        current_user["username"],
+        asyncio.get_running_loop(),
+    )
+    return import_jobs.job_dict(job)
+
+
+@router.get(
+    "",
+    response_model=List[schemas.ImportJob],
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def list_import_jobs(election_id: int, db: Session = Depends(get_db)):
+    jobs = (
+        db.query(models.ImportJob)
+        .filter_by(election_id=election_id)
+        .order_by(models.ImportJob.id.desc())
+        .all()
+    )
+    return [import_jobs.job_dict(job) for job in jobs]
+
+
+@router.get(
+    "/{job_id}",
+    response_model=schemas.ImportJob,
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def get_import_job(election_id: int, job_id: int, db: Session = Depends(get_db)):
+    return import_jobs.job_dict(_get_job(db, election_id, job_id))
+
+
+@router.post(
+    "/{job_id}/cancel",
+    status_code=202,
+    response_model=schemas.ImportJob,
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def cancel_import_job(election_id: int, job_id: int, db: Session = Depends(get_db)):
+    """Pide la cancelación; el job se detiene y revierte al terminar el bloque en curso."""
+    job = _get_job(db, election_id, job_id)
+    import_jobs.cancel(db, job)
+    return import_jobs.job_dict(job)
@@ -2,22 +2,15 @@ from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPExce
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from typing import List
-import jwt
 from .. import models, schemas, database
-from ..security import SECRET_KEY, ALGORITHM, require_role, require_election_role
-from ..observer import manager, compute_summary, observer_row
+from ..security import decode_token, has_election_role, require_role, require_election_role
+from ..observer import manager, compute_summary, observer_rows
+from ..serialization import FastJSONResponse
+from ..database import get_db
 
 router = APIRouter(prefix="/elections/{election_id}/observer", tags=["observer"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.websocket("/ws")
 async def observer_ws(websocket: WebSocket, election_id: int):
     token = websocket.query_params.get("token")
@@ -25,37 +18,28 @@ async def observer_ws(websocket: WebSocket, election_id: int):
         await websocket.close(code=1008)
         return
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        role = payload.get("role")
-        username = payload.get("sub")
-        if role not in ("ADMIN_BVG", "FUNCIONAL_BVG"):
-            await websocket.close(code=1008)
-            return
-    except jwt.PyJWTError:
+        user = decode_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    if user["role"] not in ("ADMIN_BVG", "FUNCIONAL_BVG"):
         await websocket.close(code=1008)
         return
     db = database.SessionLocal()
     try:
-        if role != "ADMIN_BVG":
-            user = db.query(models.User).filter_by(username=username).first()
-            allowed = (
-                db.query(models.ElectionUserRole)
-                .filter(
-                    models.ElectionUserRole.election_id == election_id,
-                    models.ElectionUserRole.user_id == user.id,
-                    models.ElectionUserRole.role.in_(
-                        [
-                            models.ElectionRole.ATTENDANCE,
-                            models.ElectionRole.VOTE,
-                            models.ElectionRole.OBSERVER,
-                        ]
-                    ),
-                )
-                .first()
-            )
-            if not allowed:
-                await websocket.close(code=1008)
-                return
+        allowed = has_election_role(
+            user,
+            election_id,
+            [
+                models.ElectionRole.ATTENDANCE,
+                models.ElectionRole.VOTE,
+                models.ElectionRole.OBSERVER,
+            ],
+            db,
+        )
+        if not allowed:
+            await websocket.close(code=1008)
+            return
         await manager.connect(websocket)
         await websocket.send_json({"summary": compute_summary(db, election_id)})
         while True:
@@ -79,9 +63,4 @@ async def observer_ws(websocket: WebSocket, election_id: int):
     ],
 )
 def observer_table(election_id: int, db: Session = Depends(get_db)):
-    rows: List[schemas.ObserverRow] = []
-    shareholders = db.query(models.Shareholder.id).all()
-    for (sh_id,) in shareholders:
-        row = observer_row(db, election_id, sh_id)
-        rows.append(schemas.ObserverRow(**row))
-    return rows
+    return FastJSONResponse(observer_rows(db, election_id))
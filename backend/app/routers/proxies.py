@@ -1,28 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from datetime import date, datetime, timezone
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload
+from datetime import datetime, timezone
 from typing import List
-from pathlib import Path
-from .. import schemas, models, database
+from .. import schemas, models
 from ..models import AttendanceMode
 from ..security import get_current_user, require_role
 from ..observer import manager, compute_summary
 from ..observer import observer_row
 from ..utils import enforce_registration_window
+from ..serialization import FastJSONResponse, row_dicts
+from ..storage import release, release_async, save_upload
+from ..pagination import decode_cursor, encode_cursor
+from ..proxy_status import (
+    active_proxy,
+    effective_present,
+    effective_status,
+    is_active,
+    sweep_expired,
+)
+from ..observer import observer_rows
+from ..representation import (
+    conflict_guard,
+    conflicting_shareholders,
+    conflicts,
+    ensure_mapped,
+    refresh_representations,
+)
+from ..importer import open_table, require_columns
+from .. import proxy_import
+from ..database import get_db
 import anyio
+import zipfile
 
 router = APIRouter(prefix="/elections/{election_id}/proxies", tags=["proxies"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def _log(
     db: Session,
     election_id: int,
@@ -42,19 +56,25 @@ def _log(
     db.add(log)
 
 
-def _refresh_status(db: Session, proxy: models.Proxy):
-    if (
-        proxy.status == models.ProxyStatus.VALID
-        and proxy.fecha_vigencia
-        and date.today() > proxy.fecha_vigencia
-    ):
-        proxy.status = models.ProxyStatus.EXPIRED
-        proxy.present = False
-        db.commit()
-        db.refresh(proxy)
+def _check_conflicts(
+    db: Session,
+    election_id: int,
+    proxy_data: schemas.ProxyCreate,
+    exclude_proxy_id: int | None = None,
+):
+    """Un accionista no puede quedar asignado a dos poderes vigentes."""
+    if proxy_data.status != models.ProxyStatus.VALID:
+        return
+    shareholder_ids = {a.shareholder_id for a in proxy_data.assignments or []}
+    if conflicting_shareholders(db, election_id, shareholder_ids, exclude_proxy_id):
+        raise HTTPException(status_code=400, detail="shareholder already has an active proxy")
 
 
-MAX_PDF_SIZE = 2 * 1024 * 1024
+def _check_assignments(proxy_data: schemas.ProxyCreate):
+    shareholder_ids = [a.shareholder_id for a in proxy_data.assignments or []]
+    if len(set(shareholder_ids)) != len(shareholder_ids):
+        raise HTTPException(status_code=400, detail="duplicate assignment")
+
 
 @router.post(
     "",
@@ -72,9 +92,6 @@ async def create_proxy(
     proxy_data = schemas.ProxyCreate.model_validate_json(data)
     if pdf.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="invalid file type")
-    content = await pdf.read()
-    if len(content) > MAX_PDF_SIZE:
-        raise HTTPException(status_code=400, detail="file too large")
 
     election = db.query(models.Election).filter_by(id=election_id).first()
     if not election:
@@ -93,6 +110,9 @@ async def create_proxy(
     )
     if existing:
         raise HTTPException(status_code=400, detail="proxy already exists")
+    _check_conflicts(db, election_id, proxy_data)
+    _check_assignments(proxy_data)
+    # El PDF se guarda al final, cuando ya pasaron todas las validaciones
     db_proxy = models.Proxy(
         pdf_url="",
         election_id=election_id,
@@ -108,22 +128,10 @@ async def create_proxy(
         marked_at=proxy_data.marked_at,
     )
     db.add(db_proxy)
-    db.commit()
-    db.refresh(db_proxy)
-
-    storage_dir = Path("storage") / str(election_id)
-    storage_dir.mkdir(parents=True, exist_ok=True)
-    file_path = storage_dir / f"{db_proxy.id}.pdf"
-    with open(file_path, "wb") as f:
-        f.write(content)
+    db.flush()
 
-    db_proxy.pdf_url = str(file_path)
     assignments = []
-    seen = set()
     for assignment in proxy_data.assignments or []:
-        if assignment.shareholder_id in seen:
-            raise HTTPException(status_code=400, detail="duplicate assignment")
-        seen.add(assignment.shareholder_id)
         db_assignment = models.ProxyAssignment(
             proxy_id=db_proxy.id, **assignment.model_dump()
         )
@@ -131,22 +139,208 @@ async def create_proxy(
         assignments.append(db_assignment)
 
     _log(db, election_id, current_user, "PROXY_CREATE", request, {"proxy_id": db_proxy.id})
-    db.commit()
+    with conflict_guard(db):
+        ensure_mapped(db, [db_proxy.id])
+        db_proxy.pdf_url = await save_upload(pdf)
+        db.commit()
     db.refresh(db_proxy)
     db_proxy.assignments = assignments
     return db_proxy
 
 
+@router.post(
+    "/import",
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def import_proxies(
+    election_id: int,
+    request: Request,
+    manifest: UploadFile = File(...),
+    archive: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Importa poderes desde un manifiesto CSV/XLSX y un ZIP con los PDF.
+
+    Todo se valida antes de escribir; si alguna fila falla se devuelve la
+    lista de errores por fila y no se guarda nada.
+    """
+    election = db.query(models.Election).filter_by(id=election_id).first()
+    if not election:
+        raise HTTPException(status_code=404, detail="election not found")
+    enforce_registration_window(db, election_id, current_user)
+
+    with open_table(manifest.file, manifest.filename) as reader:
+        require_columns(reader, proxy_import.REQUIRED_COLUMNS)
+        rows = proxy_import.parse_rows(reader)
+    if not rows:
+        raise HTTPException(status_code=400, detail="empty manifest")
+    try:
+        zf = zipfile.ZipFile(archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="invalid zip archive")
+    with zf:
+        shareholders, persons, errors = proxy_import.validate(
+            db, election, rows, set(zf.namelist())
+        )
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+        with conflict_guard(db):
+            return proxy_import.import_proxies(
+                db,
+                election_id,
+                rows,
+                zf,
+                shareholders,
+                persons,
+                audit=lambda result: _log(
+                    db, election_id, current_user, "PROXY_IMPORT", request, result
+                ),
+            )
+
+
 @router.get(
     "",
     response_model=List[schemas.Proxy],
     dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
 )
 def list_proxies(election_id: int, db: Session = Depends(get_db)):
-    proxies = db.query(models.Proxy).filter_by(election_id=election_id).all()
-    for prx in proxies:
-        _refresh_status(db, prx)
-    return proxies
+    proxies = row_dicts(
+        db.query(
+            models.Proxy.id,
+            models.Proxy.election_id,
+            models.Proxy.proxy_person_id,
+            models.Proxy.tipo_doc,
+            models.Proxy.num_doc,
+            models.Proxy.fecha_otorg,
+            models.Proxy.fecha_vigencia,
+            models.Proxy.pdf_url,
+            effective_status().label("status"),
+            models.Proxy.mode,
+            effective_present().label("present"),
+            models.Proxy.marked_by,
+            models.Proxy.marked_at,
+        )
+        .filter(models.Proxy.election_id == election_id)
+        .order_by(models.Proxy.id)
+    )
+    by_proxy = {proxy["id"]: proxy for proxy in proxies}
+    for proxy in proxies:
+        proxy["assignments"] = []
+    assignments = (
+        db.query(
+            models.ProxyAssignment.proxy_id,
+            models.ProxyAssignment.id,
+            models.ProxyAssignment.shareholder_id,
+            models.ProxyAssignment.weight_actions_snapshot,
+            models.ProxyAssignment.valid_from,
+            models.ProxyAssignment.valid_until,
+        )
+        .join(models.Proxy, models.Proxy.id == models.ProxyAssignment.proxy_id)
+        .filter(models.Proxy.election_id == election_id)
+        .order_by(models.ProxyAssignment.id)
+    )
+    for assignment in row_dicts(assignments):
+        by_proxy[assignment.pop("proxy_id")]["assignments"].append(assignment)
+    return FastJSONResponse(proxies)
+
+
+@router.get(
+    "/page",
+    response_model=schemas.ProxyPage,
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def list_proxies_page(
+    election_id: int,
+    status: models.ProxyStatus | None = None,
+    present: bool | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Poderes con apoderado y accionistas asignados en un número fijo de consultas."""
+    query = db.query(
+        models.Proxy,
+        effective_status().label("status"),
+        effective_present().label("present"),
+    ).filter(models.Proxy.election_id == election_id)
+    if status is not None:
+        query = query.filter(effective_status() == status)
+    if present is not None:
+        query = query.filter(effective_present().is_(present))
+    total = query.order_by(None).count() if include_total else None
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        query = query.filter(models.Proxy.id > last_id)
+    rows = (
+        query.options(
+            selectinload(models.Proxy.person),
+            selectinload(models.Proxy.assignments).selectinload(
+                models.ProxyAssignment.shareholder
+            ),
+        )
+        .order_by(models.Proxy.id)
+        .limit(limit + 1)
+        .all()
+    )
+    items = [
+        _proxy_detail(proxy, proxy_status, proxy_present)
+        for proxy, proxy_status, proxy_present in rows[:limit]
+    ]
+    next_cursor = encode_cursor(rows[limit - 1][0].id) if len(rows) > limit else None
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor, "total": total})
+
+
+@router.get(
+    "/conflicts",
+    response_model=List[schemas.ProxyConflict],
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def list_proxy_conflicts(election_id: int, db: Session = Depends(get_db)):
+    """Accionistas asignados a más de un poder vigente."""
+    return conflicts(db, election_id)
+
+
+def _proxy_detail(proxy: models.Proxy, status, present) -> dict:
+    person = proxy.person
+    return {
+        "id": proxy.id,
+        "election_id": proxy.election_id,
+        "proxy_person_id": proxy.proxy_person_id,
+        "tipo_doc": proxy.tipo_doc,
+        "num_doc": proxy.num_doc,
+        "fecha_otorg": proxy.fecha_otorg,
+        "fecha_vigencia": proxy.fecha_vigencia,
+        "pdf_url": proxy.pdf_url,
+        "status": status,
+        "mode": proxy.mode,
+        "present": present,
+        "marked_by": proxy.marked_by,
+        "marked_at": proxy.marked_at,
+        "person": {
+            "id": person.id,
+            "type": person.type,
+            "name": person.name,
+            "document": person.document,
+            "email": person.email,
+        },
+        "assignments": [
+            {
+                "id": a.id,
+                "shareholder_id": a.shareholder_id,
+                "weight_actions_snapshot": a.weight_actions_snapshot,
+                "valid_from": a.valid_from,
+                "valid_until": a.valid_until,
+                "code": a.shareholder.code,
+                "name": a.shareholder.name,
+                "actions": a.shareholder.actions,
+            }
+            for a in sorted(proxy.assignments, key=lambda a: a.id)
+        ],
+    }
 
 
 @router.put(
@@ -173,21 +367,14 @@ async def update_proxy(
 
     proxy_data = schemas.ProxyCreate.model_validate_json(data)
 
-    enforce_registration_window(db, election_id, current_user)
+    if pdf is not None and pdf.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="invalid file type")
 
-    if pdf is not None:
-        if pdf.content_type != "application/pdf":
-            raise HTTPException(status_code=400, detail="invalid file type")
-        content = await pdf.read()
-        if len(content) > MAX_PDF_SIZE:
-            raise HTTPException(status_code=400, detail="file too large")
-        storage_dir = Path("storage") / str(election_id)
-        storage_dir.mkdir(parents=True, exist_ok=True)
-        file_path = storage_dir / f"{proxy.id}.pdf"
-        with open(file_path, "wb") as f:
-            f.write(content)
-        proxy.pdf_url = str(file_path)
+    enforce_registration_window(db, election_id, current_user)
+    _check_conflicts(db, election_id, proxy_data, exclude_proxy_id=proxy.id)
+    _check_assignments(proxy_data)
 
+    previous_pdf = proxy.pdf_url
     if proxy_data.num_doc != proxy.num_doc:
         existing = (
             db.query(models.Proxy)
@@ -209,17 +396,20 @@ async def update_proxy(
 
     db.query(models.ProxyAssignment).filter_by(proxy_id=proxy.id).delete()
     assignments = []
-    seen = set()
     for assignment in proxy_data.assignments or []:
-        if assignment.shareholder_id in seen:
-            raise HTTPException(status_code=400, detail="duplicate assignment")
-        seen.add(assignment.shareholder_id)
         db_assignment = models.ProxyAssignment(proxy_id=proxy.id, **assignment.model_dump())
         db.add(db_assignment)
         assignments.append(db_assignment)
 
     _log(db, election_id, current_user, "PROXY_UPDATE", request, {"proxy_id": proxy.id})
-    db.commit()
+    with conflict_guard(db):
+        ensure_mapped(db, [proxy.id])
+        # El PDF nuevo se guarda solo si el poder pasó todas las validaciones
+        if pdf is not None:
+            proxy.pdf_url = await save_upload(pdf)
+        db.commit()
+    if previous_pdf != proxy.pdf_url:
+        await release_async(db, previous_pdf)
     db.refresh(proxy)
     proxy.assignments = assignments
     return proxy
@@ -247,15 +437,13 @@ def delete_proxy(
 
     enforce_registration_window(db, election_id, current_user)
 
-    file_path = Path(proxy.pdf_url)
-    if file_path.exists():
-        file_path.unlink()
-
+    pdf_url = proxy.pdf_url
     db.query(models.ProxyAssignment).filter_by(proxy_id=proxy.id).delete()
     db.delete(proxy)
 
     _log(db, election_id, current_user, "PROXY_DELETE", request, {"proxy_id": proxy.id})
     db.commit()
+    release(db, pdf_url)
 
 
 @router.post(
@@ -280,8 +468,7 @@ def mark_proxy(
         raise HTTPException(status_code=404, detail="proxy not found")
 
     enforce_registration_window(db, election_id, current_user)
-    _refresh_status(db, proxy)
-    if proxy.status != models.ProxyStatus.VALID:
+    if not is_active(proxy):
         raise HTTPException(status_code=400, detail="proxy not valid")
 
     proxy.mode = payload.mode
@@ -299,6 +486,86 @@ def mark_proxy(
     return proxy
 
 
+@router.post(
+    "/bulk_mark",
+    response_model=schemas.ProxyBulkMarkResponse,
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def bulk_mark_proxies(
+    election_id: int,
+    payload: schemas.ProxyBulkMark,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Marca varios poderes con un solo UPDATE y una sola notificación al observador.
+
+    Los ids que no pertenecen a la elección o cuyo poder no está vigente se
+    devuelven en ``failed``.
+    """
+    enforce_registration_window(db, election_id, current_user)
+    requested = list(dict.fromkeys(payload.proxy_ids))
+    if not requested:
+        return {"updated": [], "failed": []}
+    username = current_user["username"]
+    now = datetime.now(timezone.utc)
+    updated = sorted(
+        proxy_id
+        for (proxy_id,) in db.execute(
+            update(models.Proxy)
+            .where(
+                models.Proxy.election_id == election_id,
+                models.Proxy.id.in_(requested),
+                active_proxy(),
+            )
+            .values(
+                mode=payload.mode,
+                present=payload.mode != AttendanceMode.AUSENTE,
+                marked_by=username,
+                marked_at=now,
+            )
+            .returning(models.Proxy.id),
+            execution_options={"synchronize_session": False},
+        )
+    )
+    done = set(updated)
+    failed = [proxy_id for proxy_id in requested if proxy_id not in done]
+    if not updated:
+        return {"updated": [], "failed": failed}
+
+    refresh_representations(db, updated)
+    ip = request.client.host if request.client else None
+    user_agent = request.headers.get("user-agent")
+    db.execute(
+        insert(models.AuditLog),
+        [
+            {
+                "election_id": election_id,
+                "username": username,
+                "action": "PROXY_MARK",
+                "details": {"proxy_id": proxy_id, "mode": payload.mode.value},
+                "ip": ip,
+                "user_agent": user_agent,
+                "created_at": now,
+            }
+            for proxy_id in updated
+        ],
+    )
+    shareholder_ids = sorted(
+        {
+            shareholder_id
+            for (shareholder_id,) in db.query(models.ProxyAssignment.shareholder_id).filter(
+                models.ProxyAssignment.proxy_id.in_(updated)
+            )
+        }
+    )
+    db.commit()
+    summary = compute_summary(db, election_id)
+    rows = observer_rows(db, election_id, shareholder_ids)
+    anyio.from_thread.run(manager.broadcast, {"summary": summary, "rows": rows})
+    return {"updated": updated, "failed": failed}
+
+
 @router.post(
     "/{proxy_id}/invalidate",
     response_model=schemas.Proxy,
@@ -333,6 +600,28 @@ def invalidate_proxy(
     return proxy
 
 
+@router.post(
+    "/expire",
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
+)
+def expire_proxies(
+    election_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Marca como vencidos, en un solo UPDATE, los poderes con vigencia pasada."""
+    swept = sweep_expired(db, election_id).get(election_id)
+    if not swept:
+        return {"expired": 0, "proxy_ids": []}
+    _log(db, election_id, current_user, "PROXY_EXPIRE", request, {"proxy_ids": swept["proxy_ids"]})
+    db.commit()
+    summary = compute_summary(db, election_id)
+    rows = observer_rows(db, election_id, swept["shareholder_ids"])
+    anyio.from_thread.run(manager.broadcast, {"summary": summary, "rows": rows})
+    return {"expired": len(swept["proxy_ids"]), "proxy_ids": swept["proxy_ids"]}
+
+
 @router.get(
     "/{proxy_id}/pdf",
     dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
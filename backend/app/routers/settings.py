@@ -1,19 +1,12 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from .. import schemas, models, database
+from .. import schemas, models
 from ..security import require_role
+from ..database import get_db
 
 router = APIRouter(prefix="/settings", tags=["settings"], dependencies=[require_role(["ADMIN_BVG"])])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("", response_model=schemas.Settings)
 def get_settings(db: Session = Depends(get_db)):
     rows = db.query(models.Setting).all()
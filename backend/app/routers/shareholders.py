@@ -1,26 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from typing import List
-import csv
-from io import StringIO
-from .. import schemas, models, database
+from datetime import datetime, timezone
+from decimal import Decimal
+from .. import schemas, models, search
 from ..security import get_current_user, require_role, require_election_role
+from ..models import AttendanceMode
 from ..utils import enforce_registration_window
+from ..pagination import decode_cursor, encode_cursor, keyset_after
+from ..importer import (
+    SHAREHOLDER_FILE_COLUMNS,
+    STAGE_COLUMNS,
+    ShareholderImporter,
+    chunked,
+    import_shareholder_rows,
+    open_csv,
+    require_columns,
+    validate_shareholder_rows,
+)
+from ..import_sessions import preview_store
+from ..typeahead import registry as typeahead
+from ..serialization import FastJSONResponse, row_dicts
+from ..roster import refresh_snapshots
+from ..database import get_db
 
 router = APIRouter(prefix="/elections/{election_id}/shareholders", tags=["shareholders"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-
-
 def _log(db: Session, election_id: int, user, action: str, request: Request, details: dict | None = None):
     log = models.AuditLog(
         election_id=election_id,
@@ -33,23 +39,6 @@ def _log(db: Session, election_id: int, user, action: str, request: Request, det
     db.add(log)
 
 
-def _ensure_attendance(db: Session, election_id: int, shareholder_id: int):
-    exists = (
-        db.query(models.Attendance)
-        .filter_by(election_id=election_id, shareholder_id=shareholder_id)
-        .first()
-    )
-    if not exists:
-        db.add(
-            models.Attendance(
-                election_id=election_id,
-                shareholder_id=shareholder_id,
-                mode=models.AttendanceMode.AUSENTE,
-                present=False,
-            )
-        )
-
-
 @router.post(
     "/import",
     response_model=List[schemas.Shareholder],
@@ -62,26 +51,19 @@ def import_shareholders(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
-    result = []
     enforce_registration_window(db, election_id, current_user)
-    for sh in shareholders:
-        existing = db.query(models.Shareholder).filter_by(code=sh.code).first()
-        if existing:
-            for field, value in sh.model_dump().items():
-                setattr(existing, field, value)
-            db.flush()
-            _ensure_attendance(db, election_id, existing.id)
-            result.append(existing)
-        else:
-            new_sh = models.Shareholder(**sh.model_dump())
-            db.add(new_sh)
-            db.flush()
-            _ensure_attendance(db, election_id, new_sh.id)
-            result.append(new_sh)
-    _log(db, election_id, current_user, "SHAREHOLDER_IMPORT", request, {"count": len(result)})
+    # Último valor gana cuando el mismo código aparece varias veces
+    rows = {sh.code: sh for sh in shareholders}
+    with ShareholderImporter(db, election_id) as importer:
+        importer.stage(rows.values())
+        counts = importer.merge()
+        result = [
+            schemas.Shareholder.model_validate(sh)
+            for sh in importer.merged_shareholders()
+        ]
+    _log(db, election_id, current_user, "SHAREHOLDER_IMPORT", request, {"count": counts["received"]})
     db.commit()
-    for sh in result:
-        db.refresh(sh)
+    typeahead.upsert(election_id, result)
     return result
 
 
@@ -97,96 +79,76 @@ def import_shareholders_file(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
-    content = file.file.read().decode("utf-8")
-    reader = csv.DictReader(StringIO(content))
-    required = {"code", "name", "document", "actions"}
-    if not required.issubset(reader.fieldnames or []):
-        missing = required - set(reader.fieldnames or [])
-        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
-
-    valid: List[schemas.ShareholderCreate] = []
-    errors = []
-    seen_codes = set()
-    for idx, row in enumerate(reader, start=2):
-        row_errors = []
-        code = (row.get("code") or "").strip()
-        if not code:
-            row_errors.append("code required")
-        elif code in seen_codes:
-            row_errors.append("duplicate code in file")
-        else:
-            seen_codes.add(code)
-        name = (row.get("name") or "").strip()
-        if not name:
-            row_errors.append("name required")
-        document = (row.get("document") or "").strip()
-        if not document:
-            row_errors.append("document required")
-        email = (row.get("email") or "").strip() or None
-        actions_raw = row.get("actions")
-        try:
-            actions = float(actions_raw)
-            if actions < 0:
-                row_errors.append("actions must be >= 0")
-        except (TypeError, ValueError):
-            row_errors.append("actions must be a number")
-            actions = 0
-        if row_errors:
-            errors.append({"row": idx, "errors": row_errors})
-            continue
-        valid.append(
-            schemas.ShareholderCreate(
-                code=code, name=name, document=document, email=email, actions=actions
-            )
-        )
+    with open_csv(file.file) as reader:
+        if preview:
+            require_columns(reader, SHAREHOLDER_FILE_COLUMNS)
+            errors = []
+            valid = [v.model_dump() for v in validate_shareholder_rows(reader, errors)]
+            token = expires_at = None
+            if valid and not errors:
+                session = preview_store.put(
+                    election_id,
+                    current_user["username"],
+                    [tuple(v[c] for c in STAGE_COLUMNS) for v in valid],
+                )
+                token = session.token
+                expires_at = datetime.fromtimestamp(session.expires_at, timezone.utc)
+            return {
+                "valid": valid,
+                "invalid": errors,
+                "token": token,
+                "expires_at": expires_at,
+            }
 
-    if preview:
-        return {"valid": [v.model_dump() for v in valid], "invalid": errors}
-    if errors:
-        raise HTTPException(status_code=400, detail=errors)
-
-    enforce_registration_window(db, election_id, current_user)
-    result = []
-    for sh in valid:
-        existing = db.query(models.Shareholder).filter_by(code=sh.code).first()
-        if existing:
-            for field, value in sh.model_dump().items():
-                setattr(existing, field, value)
-            db.flush()
-            _ensure_attendance(db, election_id, existing.id)
-            result.append(existing)
-        else:
-            new_sh = models.Shareholder(**sh.model_dump())
-            db.add(new_sh)
-            db.flush()
-            _ensure_attendance(db, election_id, new_sh.id)
-            result.append(new_sh)
-
-    _log(db, election_id, current_user, "SHAREHOLDER_IMPORT", request, {"count": len(result)})
+        enforce_registration_window(db, election_id, current_user)
+        counts, errors = import_shareholder_rows(db, election_id, reader)
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+    _log(db, election_id, current_user, "SHAREHOLDER_IMPORT", request, {"count": counts["received"]})
     db.commit()
-    for sh in result:
-        db.refresh(sh)
-    return [schemas.Shareholder.model_validate(r).model_dump() for r in result]
+    # Las cargas masivas pueden renombrar accionistas de otras elecciones
+    typeahead.invalidate()
+    return counts
 
 
-@router.get(
-    "",
-    response_model=List[schemas.ShareholderWithAttendance],
-    dependencies=[
-        require_election_role(
-            [models.ElectionRole.ATTENDANCE, models.ElectionRole.VOTE]
-        )
-    ],
+@router.post(
+    "/import-file/{token}/commit",
+    dependencies=[require_role(["FUNCIONAL_BVG", "ADMIN_BVG"])]
 )
-def list_shareholders(
+def commit_shareholders_preview(
     election_id: int,
-    q: str | None = None,
+    token: str,
+    request: Request,
     db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
 ):
-    query = (
+    """Aplica las filas validadas en una vista previa sin volver a subir el archivo."""
+    enforce_registration_window(db, election_id, current_user)
+    # El token se consume solo si el commit tiene éxito: ante un error se puede reintentar
+    session = preview_store.get(token, election_id, current_user["username"])
+    with ShareholderImporter(db, election_id) as importer:
+        for chunk in chunked(session.rows):
+            importer.stage(chunk)
+        counts = importer.merge()
+    _log(db, election_id, current_user, "SHAREHOLDER_IMPORT", request, {"count": counts["received"]})
+    db.commit()
+    preview_store.discard(token)
+    # Las cargas masivas pueden renombrar accionistas de otras elecciones
+    typeahead.invalidate()
+    return counts
+
+
+def _roster_query(db: Session, election_id: int):
+    return (
         db.query(
-            models.Shareholder,
-            models.Attendance.mode,
+            models.Shareholder.id,
+            models.Shareholder.code,
+            models.Shareholder.name,
+            models.Shareholder.document,
+            models.Shareholder.email,
+            models.Shareholder.actions,
+            models.Shareholder.status,
+            models.Attendance.mode.label("attendance_mode"),
             models.Attendee.representante,
             models.Attendee.apoderado,
             models.Attendee.id.label("attendee_id"),
@@ -199,34 +161,126 @@ def list_shareholders(
         )
         .outerjoin(
             models.Attendee,
-            (models.Attendee.identifier == models.Shareholder.code)
+            (models.Attendee.shareholder_id == models.Shareholder.id)
             & (models.Attendee.election_id == election_id),
         )
         .filter(models.Attendance.election_id == election_id)
     )
-    if q:
-        q_like = f"%{q}%"
+
+
+def _search(db: Session, query, q: str | None):
+    """Filtra por texto usando el índice de búsqueda; devuelve (query, rank)."""
+    matches = search.shareholder_matches(db, q)
+    if matches is None:
+        return query, None
+    query = query.join(matches, matches.c.id == models.Shareholder.id)
+    return query, matches.c.rank
+
+
+def _with_attendance(row) -> schemas.ShareholderWithAttendance:
+    data = dict(row._mapping)
+    data["apoderado_pdf"] = bool(data.pop("apoderado_pdf_url"))
+    return schemas.ShareholderWithAttendance(**data)
+
+
+@router.get(
+    "",
+    response_model=List[schemas.ShareholderWithAttendance],
+    dependencies=[
+        require_election_role(
+            [models.ElectionRole.ATTENDANCE, models.ElectionRole.VOTE]
+        )
+    ],
+)
+def list_shareholders(
+    election_id: int,
+    q: str | None = None,
+    db: Session = Depends(get_db),
+):
+    query, rank = _search(db, _roster_query(db, election_id), q)
+    if rank is not None:
+        query = query.order_by(rank, models.Shareholder.id).limit(search.SEARCH_RESULT_LIMIT)
+    rows = row_dicts(query.all())
+    for row in rows:
+        row["apoderado_pdf"] = bool(row.pop("apoderado_pdf_url"))
+    return FastJSONResponse(rows)
+
+
+SHAREHOLDER_SORTS = {
+    "code": (models.Shareholder.code, str),
+    "name": (models.Shareholder.name, str),
+    "actions": (models.Shareholder.actions, Decimal),
+    "mode": (models.Attendance.mode, AttendanceMode),
+}
+
+
+@router.get(
+    "/page",
+    response_model=schemas.ShareholderPage,
+    dependencies=[
+        require_election_role(
+            [models.ElectionRole.ATTENDANCE, models.ElectionRole.VOTE]
+        )
+    ],
+)
+def list_shareholders_page(
+    election_id: int,
+    q: str | None = None,
+    mode: AttendanceMode | None = None,
+    sort: str = Query("code", pattern="^(code|name|actions|mode)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    include_total: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Padrón paginado por cursor sobre (columna de orden, id)."""
+    column, cast = SHAREHOLDER_SORTS[sort]
+    descending = order == "desc"
+    query, _ = _search(db, _roster_query(db, election_id), q)
+    if mode:
+        query = query.filter(models.Attendance.mode == mode)
+    total = query.order_by(None).count() if include_total else None
+    if cursor:
+        value, last_id = decode_cursor(cursor, 2)
+        try:
+            value, last_id = cast(value), int(last_id)
+        except (TypeError, ValueError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="invalid cursor")
         query = query.filter(
-            or_(
-                models.Shareholder.name.ilike(q_like),
-                models.Shareholder.code.ilike(q_like),
-            )
+            keyset_after(column, models.Shareholder.id, value, last_id, descending)
         )
-    rows = query.all()
-    result: List[schemas.ShareholderWithAttendance] = []
-    for sh, mode, rep, apo, att_id, apo_pdf in rows:
-        data = schemas.Shareholder.model_validate(sh).model_dump()
-        result.append(
-            schemas.ShareholderWithAttendance(
-                **data,
-                attendance_mode=mode,
-                representante=rep,
-                apoderado=apo,
-                attendee_id=att_id,
-                apoderado_pdf=bool(apo_pdf),
-            )
+    if descending:
+        query = query.order_by(column.desc(), models.Shareholder.id.desc())
+    else:
+        query = query.order_by(column, models.Shareholder.id)
+    rows = query.limit(limit + 1).all()
+    items = [_with_attendance(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        value = last.attendance_mode.value if sort == "mode" else getattr(last, sort)
+        next_cursor = encode_cursor(value, last.id)
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+@router.get(
+    "/suggest",
+    response_model=List[schemas.ShareholderSuggestion],
+    dependencies=[
+        require_election_role(
+            [models.ElectionRole.ATTENDANCE, models.ElectionRole.VOTE]
         )
-    return result
+    ],
+)
+def suggest_shareholders(
+    election_id: int,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """Autocompletado por código, nombre o documento desde el índice en memoria."""
+    return [s._asdict() for s in typeahead.suggest(db, election_id, q, limit)]
 
 
 @router.get(
@@ -244,42 +298,13 @@ def get_shareholder(
     db: Session = Depends(get_db),
 ):
     row = (
-        db.query(
-            models.Shareholder,
-            models.Attendance.mode,
-            models.Attendee.representante,
-            models.Attendee.apoderado,
-            models.Attendee.id.label("attendee_id"),
-            models.Attendee.apoderado_pdf_url,
-        )
-        .join(
-            models.Attendance,
-            (models.Shareholder.id == models.Attendance.shareholder_id)
-            & (models.Attendance.election_id == election_id),
-        )
-        .outerjoin(
-            models.Attendee,
-            (models.Attendee.identifier == models.Shareholder.code)
-            & (models.Attendee.election_id == election_id),
-        )
-        .filter(
-            models.Shareholder.id == shareholder_id,
-            models.Attendance.election_id == election_id,
-        )
+        _roster_query(db, election_id)
+        .filter(models.Shareholder.id == shareholder_id)
         .first()
     )
     if not row:
         raise HTTPException(status_code=404, detail="shareholder not found")
-    sh, mode, rep, apo, att_id, apo_pdf = row
-    data = schemas.Shareholder.model_validate(sh).model_dump()
-    return schemas.ShareholderWithAttendance(
-        **data,
-        attendance_mode=mode,
-        representante=rep,
-        apoderado=apo,
-        attendee_id=att_id,
-        apoderado_pdf=bool(apo_pdf),
-    )
+    return _with_attendance(row)
 
 
 @router.put(
@@ -308,6 +333,7 @@ def update_shareholder(
     _log(db, election_id, current_user, "SHAREHOLDER_UPDATE", request, {"shareholder_id": shareholder.id})
     db.commit()
     db.refresh(shareholder)
+    typeahead.upsert(election_id, [shareholder])
     return shareholder
 
 
@@ -330,7 +356,13 @@ def delete_shareholder(
     db.query(models.Attendance).filter_by(
         election_id=election_id, shareholder_id=shareholder.id
     ).delete()
+    db.query(models.Attendee).filter_by(shareholder_id=shareholder.id).update(
+        {"shareholder_id": None}, synchronize_session=False
+    )
     db.delete(shareholder)
+    db.flush()
+    refresh_snapshots(db, [election_id])
     _log(db, election_id, current_user, "SHAREHOLDER_DELETE", request, {"shareholder_id": shareholder.id})
     db.commit()
+    typeahead.remove(shareholder_id)
 
@@ -2,21 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import models, schemas, database
-from ..routers.auth import hash_password
+from .. import models, schemas
+from ..passwords import hash_many, hash_password_pooled
 from ..security import require_role
+from ..database import get_db
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("", response_model=List[schemas.User], dependencies=[require_role(["ADMIN_BVG"])] )
 def list_users(db: Session = Depends(get_db)):
     return db.query(models.User).all()
@@ -28,7 +21,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Username already exists")
     db_user = models.User(
         username=user.username,
-        hashed_password=hash_password(user.password),
+        hashed_password=hash_password_pooled(user.password),
         role=user.role,
     )
     db.add(db_user)
@@ -37,6 +30,27 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 
+@router.post("/bulk", response_model=List[schemas.User], dependencies=[require_role(["ADMIN_BVG"])] )
+def create_users(users: List[schemas.UserCreate], db: Session = Depends(get_db)):
+    usernames = [u.username for u in users]
+    if len(set(usernames)) != len(usernames):
+        raise HTTPException(status_code=400, detail="duplicate usernames in request")
+    taken = db.query(models.User.username).filter(models.User.username.in_(usernames)).first()
+    if taken:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    # Los hashes se calculan en paralelo en el pool de procesos
+    hashes = hash_many([u.password for u in users])
+    db_users = [
+        models.User(username=u.username, hashed_password=h, role=u.role)
+        for u, h in zip(users, hashes)
+    ]
+    db.add_all(db_users)
+    db.commit()
+    for db_user in db_users:
+        db.refresh(db_user)
+    return db_users
+
+
 @router.put("/{user_id}", response_model=schemas.User, dependencies=[require_role(["ADMIN_BVG"])] )
 def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db)):
     db_user = db.get(models.User, user_id)
@@ -45,7 +59,7 @@ def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(ge
     if user.role is not None:
         db_user.role = user.role
     if user.password is not None:
-        db_user.hashed_password = hash_password(user.password)
+        db_user.hashed_password = hash_password_pooled(user.password)
     db.commit()
     db.refresh(db_user)
     return db_user
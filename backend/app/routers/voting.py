@@ -10,9 +10,10 @@ import smtplib
 import logging
 from email.message import EmailMessage
 from fastapi.responses import StreamingResponse
-from .. import models, schemas, database
-from ..security import require_role, get_current_user
+from .. import models, schemas
+from ..security import require_role, get_current_user, has_election_role
 from ..observer import manager, compute_summary
+from ..database import get_db
 from .attendance import send_attendance_report as send_attendance_report_fn
 try:
     from reportlab.lib.pagesizes import letter
@@ -56,14 +57,6 @@ ETEC_COLORS = (
 )
 
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def _smtp_settings(db: Session) -> dict:
     return {s.key: s.value for s in db.query(models.Setting).all()}
 
@@ -106,7 +99,7 @@ def _build_vote_report_pdf(db: Session, election_id: int) -> bytes:
         db.query(models.Attendee, models.Shareholder)
         .join(
             models.Shareholder,
-            models.Attendee.identifier == models.Shareholder.code,
+            models.Attendee.shareholder_id == models.Shareholder.id,
         )
         .filter(models.Attendee.election_id == election_id)
         .all()
@@ -303,23 +296,8 @@ def start_voting(
         summary = compute_summary(db, election_id)
         if summary["porcentaje_quorum"] < election.min_quorum:
             raise HTTPException(status_code=400, detail="quorum not met")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter_by(
-                election_id=election_id,
-                user_id=user.id,
-                role=models.ElectionRole.VOTE,
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(current_user, election_id, [models.ElectionRole.VOTE], db):
+        raise HTTPException(status_code=403, detail="No autorizado")
     election.voting_open = True
     election.voting_opened_by = current_user["username"]
     election.voting_opened_at = datetime.now(timezone.utc)
@@ -359,23 +337,8 @@ def close_voting(
         raise HTTPException(status_code=400, detail="voting not open")
     if election.voting_closed_at is not None:
         raise HTTPException(status_code=400, detail="voting already closed")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter_by(
-                election_id=election_id,
-                user_id=user.id,
-                role=models.ElectionRole.VOTE,
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(current_user, election_id, [models.ElectionRole.VOTE], db):
+        raise HTTPException(status_code=403, detail="No autorizado")
     election.voting_open = False
     election.voting_closed_by = current_user["username"]
     election.voting_closed_at = datetime.now(timezone.utc)
@@ -480,23 +443,24 @@ def list_pending_ballots(election_id: int, db: Session = Depends(get_db)):
 
 
 def _ballot_results(db: Session, ballot_id: int) -> List[schemas.OptionResult]:
-    options = db.query(models.BallotOption).filter_by(ballot_id=ballot_id).all()
-    results: List[schemas.OptionResult] = []
-    for opt in options:
-        total = (
-            db.query(func.coalesce(func.sum(models.Vote.weight), 0))
-            .filter_by(option_id=opt.id)
-            .scalar()
-        )
-        results.append(
-            schemas.OptionResult(
-                id=opt.id,
-                ballot_id=opt.ballot_id,
-                text=opt.text,
-                votes=float(total),
-            )
+    """Totales por opción en una sola consulta; la suma es exacta hasta la respuesta."""
+    rows = (
+        db.query(
+            models.BallotOption.id,
+            models.BallotOption.ballot_id,
+            models.BallotOption.text,
+            func.coalesce(func.sum(models.Vote.weight), 0),
         )
-    return results
+        .outerjoin(models.Vote, models.Vote.option_id == models.BallotOption.id)
+        .filter(models.BallotOption.ballot_id == ballot_id)
+        .group_by(models.BallotOption.id, models.BallotOption.ballot_id, models.BallotOption.text)
+        .order_by(models.BallotOption.id)
+        .all()
+    )
+    return [
+        schemas.OptionResult(id=option_id, ballot_id=option_ballot, text=text, votes=float(total))
+        for option_id, option_ballot, text, total in rows
+    ]
 
 
 @router.post(
@@ -536,25 +500,13 @@ def cast_vote(
         summary = compute_summary(db, election.id)
         if summary["porcentaje_quorum"] < election.min_quorum:
             raise HTTPException(status_code=400, detail="quorum not met")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter(
-                models.ElectionUserRole.election_id == ballot.election_id,
-                models.ElectionUserRole.user_id == user.id,
-                models.ElectionUserRole.role.in_(
-                    [models.ElectionRole.VOTE, models.ElectionRole.VOTER]
-                ),
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(
+        current_user,
+        ballot.election_id,
+        [models.ElectionRole.VOTE, models.ElectionRole.VOTER],
+        db,
+    ):
+        raise HTTPException(status_code=403, detail="No autorizado")
     option = (
         db.query(models.BallotOption)
         .filter_by(id=vote.option_id, ballot_id=ballot_id)
@@ -622,25 +574,13 @@ def vote_all(
         summary = compute_summary(db, election.id)
         if summary["porcentaje_quorum"] < election.min_quorum:
             raise HTTPException(status_code=400, detail="quorum not met")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter(
-                models.ElectionUserRole.election_id == ballot.election_id,
-                models.ElectionUserRole.user_id == user.id,
-                models.ElectionUserRole.role.in_(
-                    [models.ElectionRole.VOTE, models.ElectionRole.VOTER]
-                ),
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(
+        current_user,
+        ballot.election_id,
+        [models.ElectionRole.VOTE, models.ElectionRole.VOTER],
+        db,
+    ):
+        raise HTTPException(status_code=403, detail="No autorizado")
     option = (
         db.query(models.BallotOption)
         .filter_by(id=payload.option_id, ballot_id=ballot_id)
@@ -650,14 +590,10 @@ def vote_all(
         raise HTTPException(status_code=400, detail="Invalid option for ballot")
     attendees = (
         db.query(models.Attendee)
-        .join(
-            models.Shareholder,
-            models.Attendee.identifier == models.Shareholder.code,
-        )
         .join(
             models.Attendance,
             (
-                models.Attendance.shareholder_id == models.Shareholder.id
+                models.Attendance.shareholder_id == models.Attendee.shareholder_id
             )
             & (
                 models.Attendance.election_id == models.Attendee.election_id
@@ -715,25 +651,13 @@ def close_ballot(
     ballot = db.query(models.Ballot).filter_by(id=ballot_id).first()
     if not ballot:
         raise HTTPException(status_code=404, detail="Ballot not found")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter(
-                models.ElectionUserRole.election_id == ballot.election_id,
-                models.ElectionUserRole.user_id == user.id,
-                models.ElectionUserRole.role.in_(
-                    [models.ElectionRole.VOTE, models.ElectionRole.VOTER]
-                ),
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(
+        current_user,
+        ballot.election_id,
+        [models.ElectionRole.VOTE, models.ElectionRole.VOTER],
+        db,
+    ):
+        raise HTTPException(status_code=403, detail="No autorizado")
     ballot.status = models.BallotStatus.CLOSED
     log = models.AuditLog(
         election_id=ballot.election_id,
@@ -767,25 +691,13 @@ def reopen_ballot(
     ballot = db.query(models.Ballot).filter_by(id=ballot_id).first()
     if not ballot:
         raise HTTPException(status_code=404, detail="Ballot not found")
-    if current_user["role"] != "ADMIN_BVG":
-        user = (
-            db.query(models.User)
-            .filter_by(username=current_user["username"])
-            .first()
-        )
-        allowed = (
-            db.query(models.ElectionUserRole)
-            .filter(
-                models.ElectionUserRole.election_id == ballot.election_id,
-                models.ElectionUserRole.user_id == user.id,
-                models.ElectionUserRole.role.in_(
-                    [models.ElectionRole.VOTE, models.ElectionRole.VOTER]
-                ),
-            )
-            .first()
-        )
-        if not allowed:
-            raise HTTPException(status_code=403, detail="No autorizado")
+    if not has_election_role(
+        current_user,
+        ballot.election_id,
+        [models.ElectionRole.VOTE, models.ElectionRole.VOTER],
+        db,
+    ):
+        raise HTTPException(status_code=403, detail="No autorizado")
     ballot.status = models.BallotStatus.OPEN
     log = models.AuditLog(
         election_id=ballot.election_id,
@@ -9,6 +9,7 @@ from .models import (
     QuestionType,
     ElectionRole,
     BallotStatus,
+    ImportJobStatus,
 )
 
 
@@ -47,6 +48,21 @@ class ShareholderWithAttendance(Shareholder):
     apoderado_pdf: bool = False
 
 
+class ShareholderSuggestion(BaseModel):
+    id: int
+    code: str
+    name: str
+    document: str
+    representante: Optional[str] = None
+    apoderado: Optional[str] = None
+
+
+class ShareholderPage(BaseModel):
+    items: List[ShareholderWithAttendance]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
 class AttendanceBase(BaseModel):
     election_id: int
     mode: AttendanceMode
@@ -75,6 +91,28 @@ class AttendanceBulkMarkResponse(BaseModel):
     failed: List[str]
 
 
+class AttendanceDocumentMark(BaseModel):
+    mode: AttendanceMode
+    evidence: Optional[dict] = None
+    reason: Optional[str] = None
+
+
+class DocumentMatch(BaseModel):
+    shareholder_id: int
+    code: str
+    name: str
+    document: str
+    actions: float
+    attendance_mode: AttendanceMode
+    present: bool
+    attendee_id: Optional[int] = None
+    representante: Optional[str] = None
+    apoderado: Optional[str] = None
+    proxy_id: Optional[int] = None
+    proxy_person: Optional[str] = None
+    matched_by: str
+
+
 class AttendanceHistory(BaseModel):
     id: int
     attendance_id: int
@@ -91,6 +129,22 @@ class AttendanceHistory(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AttendanceHistoryEntry(AttendanceHistory):
+    shareholder_id: int
+    code: str
+    name: str
+
+
+class AttendanceHistoryPage(BaseModel):
+    items: List[AttendanceHistoryEntry]
+    next_cursor: Optional[str] = None
+
+
+class ArrivalBucket(BaseModel):
+    minute: datetime
+    arrivals: int
+
+
 class PersonBase(BaseModel):
     type: PersonType
     name: str
@@ -155,10 +209,49 @@ class Proxy(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ProxyAssignmentDetail(ProxyAssignment):
+    code: str
+    name: str
+    actions: float
+
+
+class ProxyDetail(Proxy):
+    person: Person
+    assignments: List[ProxyAssignmentDetail] = Field(default_factory=list)
+
+
+class ProxyPage(BaseModel):
+    items: List[ProxyDetail]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class ProxyConflictEntry(BaseModel):
+    proxy_id: int
+    apoderado: str
+
+
+class ProxyConflict(BaseModel):
+    shareholder_id: int
+    code: str
+    name: str
+    proxies: List[ProxyConflictEntry]
+
+
 class ProxyMark(BaseModel):
     mode: AttendanceMode
 
 
+class ProxyBulkMark(BaseModel):
+    proxy_ids: List[int]
+    mode: AttendanceMode
+
+
+class ProxyBulkMarkResponse(BaseModel):
+    updated: List[int]
+    failed: List[int]
+
+
 class ObserverRow(BaseModel):
     code: str
     name: str
@@ -393,3 +486,22 @@ class Vote(VoteBase):
 class OptionResult(Option):
     votes: float
 
+
+class ImportJob(BaseModel):
+    id: int
+    election_id: int
+    kind: str
+    filename: Optional[str] = None
+    status: ImportJobStatus
+    rows_parsed: int = 0
+    rows_valid: int = 0
+    rows_written: int = 0
+    errors: Optional[list] = None
+    result: Optional[dict] = None
+    created_by: str
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
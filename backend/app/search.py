@@ -0,0 +1,124 @@
+"""Accent-insensitive substring search over the shareholder registry.
+
+Every shareholder carries a ``search_key`` (code and name, lower-cased and
+stripped of accents). PostgreSQL serves ``LIKE '%q%'`` on that column from a
+``pg_trgm`` GIN index and ranks by trigram similarity; SQLite keeps an FTS5
+shadow table with the trigram tokenizer in sync through triggers and ranks
+with bm25. Queries shorter than a trigram fall back to a plain ``LIKE``.
+
+The module also derives ``document_key``, the normalized ID number used for
+exact indexed lookups of shareholders and proxy holders.
+"""
+
+import os
+import unicodedata
+from sqlalchemy import DDL, event, literal, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "100"))
+
+FTS_TABLE = "shareholders_fts"
+
+
+def normalize(value: str | None) -> str:
+    """Lower-case, strip accents and collapse whitespace."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def search_key(code: str | None, name: str | None) -> str:
+    return normalize(f"{code or ''} {name or ''}")
+
+
+def document_key(value: str | None) -> str:
+    """Document number as scanned or typed: alphanumerics only, upper-case, no leading zeros."""
+    compact = "".join(ch for ch in normalize(value) if ch.isalnum()).upper()
+    return compact.lstrip("0") or compact[:1]
+
+
+@event.listens_for(models.Shareholder, "before_insert")
+@event.listens_for(models.Shareholder, "before_update")
+def _set_shareholder_keys(mapper, connection, target):
+    target.search_key = search_key(target.code, target.name)
+    target.document_key = document_key(target.document)
+
+
+@event.listens_for(models.Person, "before_insert")
+@event.listens_for(models.Person, "before_update")
+def _set_person_keys(mapper, connection, target):
+    target.document_key = document_key(target.document)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def shareholder_matches(db: Session, q: str | None):
+    """Subquery of ``(id, rank)`` for shareholders matching ``q``.
+
+    Lower ranks are better matches. Returns ``None`` for an empty query.
+    """
+    key = normalize(q)
+    if not key:
+        return None
+    dialect = db.get_bind().dialect.name
+    column = models.Shareholder.search_key
+    if dialect == "sqlite" and len(key) >= 3:
+        phrase = '"' + key.replace('"', '""') + '"'
+        return (
+            select(
+                literal_column("rowid").label("id"),
+                literal_column("rank").label("rank"),
+            )
+            .select_from(text(FTS_TABLE))
+            .where(text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=phrase))
+            .subquery("search_matches")
+        )
+    pattern = f"%{_escape_like(key)}%"
+    if dialect == "postgresql":
+        rank = -literal_column("similarity(shareholders.search_key, :trgm_key)").bindparams(
+            trgm_key=key
+        )
+    else:
+        rank = literal(0)
+    return (
+        select(models.Shareholder.id.label("id"), rank.label("rank"))
+        .where(column.like(pattern, escape="\\"))
+        .subquery("search_matches")
+    )
+
+
+_shareholders = models.Shareholder.__table__
+
+for _statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_shareholders_search_key_trgm "
+    "ON shareholders USING gin (search_key gin_trgm_ops)",
+):
+    event.listen(_shareholders, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+for _statement in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "search_key, content='shareholders', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON shareholders BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON shareholders BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) "
+    "VALUES ('delete', old.id, old.search_key); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON shareholders BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) "
+    "VALUES ('delete', old.id, old.search_key); "
+    f"INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key); END",
+):
+    event.listen(_shareholders, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    _shareholders,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
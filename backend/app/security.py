@@ -1,17 +1,57 @@
-from fastapi import Depends, HTTPException
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+"""Token verification and role checks.
+
+Verified access tokens are kept in a small LRU (``JWT_CACHE_SIZE``) until
+their ``exp``, so repeated requests skip the signature check.
+
+Access tokens may carry the user's election roles as signed claims: ``er``
+maps election id to role and ``rv`` is the user's ``roles_version`` when
+the token was issued (``JWT_ELECTION_ROLES``, see ``election_role_claims``).
+Any change to a user's election roles bumps ``roles_version``. While the
+claim is current, ``has_election_role`` answers from the token. The version
+is cached per process for ``ROLES_VERSION_TTL`` seconds and cleared on
+commits that change roles, so other workers see a change within the TTL;
+after that the token's claim is ignored and the check goes to the database
+until the client refreshes its token.
+"""
+
 import os
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
-from .database import SessionLocal
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
 from . import models
+from .database import SessionLocal, get_db
 
 SECRET_KEY = os.getenv("JWT_SECRET", "changeme")
 ALGORITHM = "HS256"
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+JWT_ELECTION_ROLES = os.getenv("JWT_ELECTION_ROLES", "true").lower() in ("1", "true", "yes")
+JWT_ELECTION_ROLES_MAX = int(os.getenv("JWT_ELECTION_ROLES_MAX", "50"))
+ROLES_VERSION_TTL = float(os.getenv("ROLES_VERSION_TTL", "5"))
 
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+_tokens: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+_versions: dict[str, tuple[int | None, float]] = {}
+_lock = threading.Lock()
+
+
+def decode_token(token: str) -> dict:
+    """Verified ``{username, role}`` of an access token (cached until ``exp``)."""
+    now = time.time()
+    with _lock:
+        cached = _tokens.get(token)
+        if cached is not None:
+            if cached[0] > now:
+                _tokens.move_to_end(token)
+                return cached[1]
+            del _tokens[token]
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -22,7 +62,22 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         raise HTTPException(status_code=401, detail="Token expirado")
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
-    return {"username": username, "role": role}
+    user = {"username": username, "role": role}
+    if "er" in payload and "rv" in payload:
+        user["election_roles"] = payload["er"]
+        user["roles_version"] = payload["rv"]
+    exp = payload.get("exp")
+    if exp is not None and JWT_CACHE_SIZE > 0:
+        with _lock:
+            _tokens[token] = (float(exp), user)
+            _tokens.move_to_end(token)
+            while len(_tokens) > JWT_CACHE_SIZE:
+                _tokens.popitem(last=False)
+    return user
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return dict(decode_token(credentials.credentials))
 
 
 def require_role(roles):
@@ -32,6 +87,63 @@ def require_role(roles):
     return Depends(role_dependency)
 
 
+def election_role_claims(db: Session, user: models.User) -> dict:
+    """``er``/``rv`` claims for an access token, or ``{}`` when not embedded."""
+    if not JWT_ELECTION_ROLES or user.role == "ADMIN_BVG":
+        return {}
+    rows = (
+        db.query(models.ElectionUserRole.election_id, models.ElectionUserRole.role)
+        .filter(models.ElectionUserRole.user_id == user.id)
+        .all()
+    )
+    if len(rows) > JWT_ELECTION_ROLES_MAX:
+        return {}
+    return {
+        "er": {str(election_id): role.value for election_id, role in rows},
+        "rv": user.roles_version or 0,
+    }
+
+
+def roles_version(db: Session, username: str) -> int | None:
+    now = time.monotonic()
+    with _lock:
+        cached = _versions.get(username)
+        if cached is not None and now - cached[1] < ROLES_VERSION_TTL:
+            return cached[0]
+    version = db.query(models.User.roles_version).filter_by(username=username).scalar()
+    with _lock:
+        _versions[username] = (version, now)
+    return version
+
+
+def has_election_role(user: dict, election_id: int, roles, db: Session | None = None) -> bool:
+    """Whether ``user`` holds one of ``roles`` in the election (admins always do)."""
+    if user["role"] == "ADMIN_BVG":
+        return True
+    roles = {getattr(r, "value", r) for r in roles}
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        claim = user.get("election_roles")
+        if claim is not None and user.get("roles_version") == roles_version(db, user["username"]):
+            return claim.get(str(election_id)) in roles
+        return (
+            db.query(models.ElectionUserRole.id)
+            .join(models.User, models.User.id == models.ElectionUserRole.user_id)
+            .filter(
+                models.User.username == user["username"],
+                models.ElectionUserRole.election_id == election_id,
+                models.ElectionUserRole.role.in_(roles),
+            )
+            .first()
+            is not None
+        )
+    finally:
+        if own_session:
+            db.close()
+
+
 def require_election_role(roles):
     if not isinstance(roles, (list, set, tuple)):
         roles_list = [roles]
@@ -41,30 +153,57 @@ def require_election_role(roles):
     def role_dependency(
         election_id: int,
         user=Depends(get_current_user),
+        db: Session = Depends(get_db),
     ):
-        if user["role"] == "ADMIN_BVG":
-            return
-        db = SessionLocal()
-        try:
-            db_user = (
-                db.query(models.User)
-                .filter_by(username=user["username"])
-                .first()
-            )
-            if not db_user:
-                raise HTTPException(status_code=401, detail="User not found")
-            exists = (
-                db.query(models.ElectionUserRole)
-                .filter(
-                    models.ElectionUserRole.election_id == election_id,
-                    models.ElectionUserRole.user_id == db_user.id,
-                    models.ElectionUserRole.role.in_(roles_list),
-                )
-                .first()
-            )
-            if not exists:
-                raise HTTPException(status_code=403, detail="No autorizado")
-        finally:
-            db.close()
+        if not has_election_role(user, election_id, roles_list, db):
+            raise HTTPException(status_code=403, detail="No autorizado")
 
     return Depends(role_dependency)
+
+
+def bump_roles_version(db: Session, user_ids) -> None:
+    """Invalidate role claims of ``user_ids`` (a list or a SELECT of ids)."""
+    if isinstance(user_ids, (list, tuple, set)):
+        user_ids = sorted({u for u in user_ids if u is not None})
+        if not user_ids:
+            return
+    users = models.User.__table__
+    db.connection().execute(
+        update(users)
+        .where(users.c.id.in_(user_ids))
+        .values(roles_version=users.c.roles_version + 1)
+    )
+    db.info["roles_changed"] = True
+
+
+def bump_election_roles(db: Session, election_id: int) -> None:
+    """Bump every user holding a role in ``election_id``, before a bulk delete."""
+    bump_roles_version(
+        db,
+        select(models.ElectionUserRole.user_id).where(
+            models.ElectionUserRole.election_id == election_id
+        ),
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_roles(session: Session, flush_context):
+    user_ids = {
+        obj.user_id
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, models.ElectionUserRole)
+    }
+    if user_ids:
+        bump_roles_version(session, user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_versions(session: Session):
+    if session.info.pop("roles_changed", False):
+        with _lock:
+            _versions.clear()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_versions(session: Session, previous_transaction):
+    session.info.pop("roles_changed", None)
@@ -0,0 +1,57 @@
+"""Direct JSON serialization for large list endpoints.
+
+The list endpoints map SQL rows to plain dicts and return them through
+``FastJSONResponse``. Because a ``Response`` is returned, FastAPI skips the
+``response_model`` validation pass (the model still documents the shape),
+and rows are encoded straight to bytes with orjson (a requirement; the
+stdlib ``json`` fallback only keeps bare development checkouts working).
+``Decimal`` values are emitted as floats, matching the ``float`` fields of
+the Pydantic schemas, and UTC datetimes end in ``Z`` as Pydantic writes them.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - development checkouts without orjson
+    orjson = None  # type: ignore
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        if value.utcoffset() is not None and not value.utcoffset():
+            text = text[:-6] + "Z"
+        return text
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def row_dicts(rows) -> list[dict]:
+    """Plain dicts from SQLAlchemy result rows, keyed by column label."""
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,147 @@
+"""Column type for share quantities (actions, acciones, weights).
+
+With ``SHARES_STORAGE=micro`` share columns are stored as BIGINT counts of
+micro-shares (``value * 10**6``), so SUM and comparisons run on integers
+in the database and totals are exact. The default, ``decimal``, keeps the
+original DECIMAL columns. Either way the ORM hands ``Decimal`` values to
+Python and SQL aggregates over ``Shares`` columns come back as ``Decimal``,
+so application code does not depend on the storage; conversion to float
+happens only when a response is serialized.
+
+The format a database holds is recorded in ``settings`` (``shares_storage``,
+see migration ``0010``) and ``check_storage`` refuses to start the app with
+a different setting. ``convert_storage`` (``python convert_shares.py``)
+switches an existing database between the two formats.
+"""
+
+import os
+from decimal import ROUND_HALF_EVEN, Decimal
+from sqlalchemy import DECIMAL, BigInteger, column, inspect, select, table, text
+from sqlalchemy.types import TypeDecorator
+
+SHARES_STORAGE = os.getenv("SHARES_STORAGE", "decimal").lower()
+MICRO = 10**6
+STORAGES = ("decimal", "micro")
+SETTING_KEY = "shares_storage"
+SHARE_COLUMNS = (
+    ("shareholders", "actions"),
+    ("election_roster_snapshots", "capital_suscrito"),
+    ("proxy_assignments", "weight_actions_snapshot"),
+    ("proxy_representations", "weight_actions_snapshot"),
+    ("attendees", "acciones"),
+    ("votes", "weight"),
+)
+
+_settings = table("settings", column("key"), column("value"))
+
+
+def to_micro(value) -> int:
+    """Exact integer micro-shares; finer fractions are rounded half-even."""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * MICRO).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_micro(value: int) -> Decimal:
+    return Decimal(value) / MICRO
+
+
+class Shares(TypeDecorator):
+    impl = DECIMAL
+    cache_ok = True
+
+    @property
+    def micro(self) -> bool:
+        return SHARES_STORAGE == "micro"
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(BigInteger() if self.micro else DECIMAL())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.micro:
+            return value
+        return to_micro(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or not self.micro:
+            return value
+        return from_micro(int(value))
+
+
+def stored_storage(connection) -> str:
+    """Format recorded for the database, or detected from ``shareholders.actions``."""
+    inspector = inspect(connection)
+    if inspector.has_table("settings"):
+        value = connection.execute(
+            select(_settings.c.value).where(_settings.c.key == SETTING_KEY)
+        ).scalar()
+        if value:
+            return value
+    if inspector.has_table("shareholders"):
+        for col in inspector.get_columns("shareholders"):
+            if col["name"] == "actions" and isinstance(col["type"], BigInteger):
+                return "micro"
+    return "decimal"
+
+
+def _record(connection, storage: str) -> None:
+    connection.execute(_settings.delete().where(_settings.c.key == SETTING_KEY))
+    connection.execute(_settings.insert().values(key=SETTING_KEY, value=storage))
+
+
+def check_storage(engine) -> None:
+    """Raise if ``SHARES_STORAGE`` differs from what the database holds."""
+    with engine.connect() as connection:
+        stored = stored_storage(connection)
+    if stored != SHARES_STORAGE:
+        raise RuntimeError(
+            f"SHARES_STORAGE={SHARES_STORAGE} but the database stores {stored} shares; "
+            f"run `python convert_shares.py {SHARES_STORAGE}` first"
+        )
+
+
+def convert_storage(connection, target: str) -> bool:
+    """Convert every share column to ``target``; False if it already is.
+
+    Tables that do not exist are skipped. SQLite cannot alter a column type:
+    the values are scaled in place and the table is rebuilt in batch mode.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.operations import Operations
+
+    if target not in STORAGES:
+        raise ValueError(f"unknown shares storage: {target}")
+    if stored_storage(connection) == target:
+        return False
+    to_micro = target == "micro"
+    old_type, new_type = (DECIMAL(), BigInteger()) if to_micro else (BigInteger(), DECIMAL())
+    ops = Operations(MigrationContext.configure(connection))
+    inspector = inspect(connection)
+    sqlite = connection.dialect.name == "sqlite"
+    for table_name, column_name in SHARE_COLUMNS:
+        if not inspector.has_table(table_name):
+            continue
+        if sqlite:
+            # Se escala antes: la copia del batch ya hace CAST al tipo nuevo
+            scaled = (
+                f"round({column_name} * {MICRO})"
+                if to_micro
+                else f"{column_name} / {MICRO}.0"
+            )
+            connection.execute(text(f"UPDATE {table_name} SET {column_name} = {scaled}"))
+            with ops.batch_alter_table(table_name) as batch:
+                batch.alter_column(column_name, type_=new_type, existing_type=old_type)
+        else:
+            ops.alter_column(
+                table_name,
+                column_name,
+                type_=new_type,
+                existing_type=old_type,
+                postgresql_using=(
+                    f"round({column_name} * {MICRO})::bigint"
+                    if to_micro
+                    else f"{column_name}::numeric / {MICRO}"
+                ),
+            )
+    _record(connection, target)
+    return True
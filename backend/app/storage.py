@@ -0,0 +1,153 @@
+"""Content-addressed storage for uploaded PDFs.
+
+Uploads are copied to disk in chunks while being hashed with SHA-256 and
+the copy is aborted as soon as ``MAX_PDF_SIZE`` is exceeded, so a file is
+never held in memory. The finished file is stored as
+``<STORAGE_DIR>/pdf/<h[:2]>/<h>.pdf``; identical documents share one file.
+Because paths are shared, a file is only removed once no proxy or
+attendee references it any more.
+
+The reference check cannot see an upload that deduplicated to an existing
+file but whose row is not committed yet. Storing therefore refreshes the
+file's mtime, and nothing younger than ``STORAGE_GC_GRACE`` seconds is
+deleted. ``release`` removes older unreferenced files at once. Anything it
+had to keep is collected later by ``sweep_orphans``, which the app runs
+every ``STORAGE_GC_INTERVAL`` seconds. The sweep also removes abandoned
+temporary files.
+
+``store_fileobj`` and ``release`` are blocking; async handlers use
+``save_upload`` and ``release_async``, which run them in the threadpool.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO
+from fastapi import HTTPException, UploadFile
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import database, models
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DIR = Path(os.getenv("STORAGE_DIR", "storage"))
+MAX_PDF_SIZE = int(os.getenv("MAX_PDF_SIZE", str(2 * 1024 * 1024)))
+STORAGE_GC_GRACE = int(os.getenv("STORAGE_GC_GRACE", "3600"))
+STORAGE_GC_INTERVAL = int(os.getenv("STORAGE_GC_INTERVAL", "3600"))
+CHUNK_SIZE = 64 * 1024
+
+
+def store_fileobj(fileobj: BinaryIO, max_size: int | None = None, root: Path | None = None) -> str:
+    """Copy ``fileobj`` into the store and return its path."""
+    max_size = max_size or MAX_PDF_SIZE
+    root = root or STORAGE_DIR
+    tmp_dir = root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=400, detail="file too large")
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest()
+        target = root / "pdf" / name[:2] / f"{name}.pdf"
+        if target.exists():
+            os.remove(tmp_name)
+            # Marca el archivo como recién usado: la limpieza respeta el periodo de gracia
+            os.utime(target)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_name, target)
+        return str(target)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+async def save_upload(upload: UploadFile, max_size: int | None = None) -> str:
+    await upload.seek(0)
+    return await run_in_threadpool(store_fileobj, upload.file, max_size)
+
+
+def is_referenced(db: Session, path: str) -> bool:
+    return (
+        db.query(models.Proxy.id).filter(models.Proxy.pdf_url == path).first() is not None
+        or db.query(models.Attendee.id)
+        .filter(models.Attendee.apoderado_pdf_url == path)
+        .first()
+        is not None
+    )
+
+
+def _expired(path, grace: int) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) >= grace
+    except OSError:
+        return False
+
+
+def release(db: Session, path: str | None) -> bool:
+    """Delete ``path`` unless it is referenced or was stored within the grace period.
+
+    Call it after the change that dropped the reference has been committed.
+    """
+    # Primero la referencia y luego la fecha: un upload concurrente toca el
+    # archivo antes de confirmar su fila
+    if not path or is_referenced(db, path) or not _expired(path, STORAGE_GC_GRACE):
+        return False
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
+
+
+async def release_async(db: Session, path: str | None) -> bool:
+    return await run_in_threadpool(release, db, path)
+
+
+def sweep_orphans(db: Session, root: Path | None = None, grace: int | None = None) -> int:
+    """Remove unreferenced stored files and stale temporary files; returns the count."""
+    root = root or STORAGE_DIR
+    grace = STORAGE_GC_GRACE if grace is None else grace
+    removed = 0
+    for path in (root / "tmp").glob("*.part"):
+        if _expired(path, grace):
+            path.unlink(missing_ok=True)
+            removed += 1
+    for path in (root / "pdf").glob("*/*.pdf"):
+        if not _expired(path, grace) or is_referenced(db, str(path)):
+            continue
+        # Se vuelve a mirar la fecha: pudo reutilizarse durante la consulta
+        if _expired(path, grace):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _sweep() -> int:
+    db = database.SessionLocal()
+    try:
+        return sweep_orphans(db)
+    finally:
+        db.close()
+
+
+async def run_periodic_sweep(interval: int = STORAGE_GC_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_sweep)
+        except Exception:  # pragma: no cover - keep the loop alive
+            logger.exception("storage sweep failed")
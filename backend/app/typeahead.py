@@ -0,0 +1,241 @@
+"""In-process typeahead index for registrar lookups.
+
+Each election gets an index built from its roster on first use. Every word
+of the normalized name (and of the attendee's representative/proxy holder)
+and the code and document are indexed by their prefixes; code and document
+are also indexed by trigrams so partial cédula numbers match anywhere.
+Lookups intersect the candidate sets of each query word and verify them, so
+no keystroke reaches the database once the index is warm.
+
+The shareholder and assistant endpoints patch the indexes in place after
+they commit; bulk file imports invalidate them and the next lookup rebuilds.
+Indexes live in the worker process that built them, so changes made through
+another worker only show up once the index is rebuilt: indexes older than
+``TYPEAHEAD_TTL`` seconds are rebuilt on the next lookup (0 disables it).
+"""
+
+import os
+import threading
+import time
+from typing import Iterable, NamedTuple
+from sqlalchemy.orm import Session
+
+from . import models
+from .search import normalize
+
+TYPEAHEAD_PREFIX_LEN = int(os.getenv("TYPEAHEAD_PREFIX_LEN", "8"))
+TYPEAHEAD_TTL = float(os.getenv("TYPEAHEAD_TTL", "30"))
+
+
+class Suggestion(NamedTuple):
+    id: int
+    code: str
+    name: str
+    document: str
+    representante: str | None = None
+    apoderado: str | None = None
+
+
+def _compact(value: str) -> str:
+    """Normalized value without punctuation, as typed for codes and cédulas."""
+    return "".join(ch for ch in normalize(value) if ch.isalnum())
+
+
+class _Entry:
+    __slots__ = ("suggestion", "words", "code", "document", "keys")
+
+    def __init__(self, suggestion: Suggestion):
+        self.suggestion = suggestion
+        names = " ".join(
+            filter(None, (suggestion.name, suggestion.representante, suggestion.apoderado))
+        )
+        self.code = _compact(suggestion.code)
+        self.document = _compact(suggestion.document)
+        self.words = {_compact(w) for w in names.split()} | {self.code, self.document}
+        self.words.discard("")
+        self.keys: set[str] = set()
+
+    def matches(self, word: str) -> bool:
+        return (
+            any(w.startswith(word) for w in self.words)
+            or word in self.code
+            or word in self.document
+        )
+
+
+class TypeaheadIndex:
+    def __init__(self, suggestions: Iterable[Suggestion] = (), prefix_len: int = TYPEAHEAD_PREFIX_LEN):
+        self.prefix_len = prefix_len
+        self.built_at = time.monotonic()
+        self._entries: dict[int, _Entry] = {}
+        self._by_code: dict[str, int] = {}
+        self._keys: dict[str, set[int]] = {}
+        for suggestion in suggestions:
+            self.upsert(suggestion)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, shareholder_id: int):
+        return shareholder_id in self._entries
+
+    def get(self, shareholder_id: int) -> Suggestion | None:
+        entry = self._entries.get(shareholder_id)
+        return entry.suggestion if entry else None
+
+    def get_by_code(self, code: str) -> Suggestion | None:
+        shareholder_id = self._by_code.get(code)
+        return None if shareholder_id is None else self.get(shareholder_id)
+
+    def upsert(self, suggestion: Suggestion):
+        self.remove(suggestion.id)
+        entry = _Entry(suggestion)
+        for word in entry.words:
+            for size in range(1, min(len(word), self.prefix_len) + 1):
+                entry.keys.add("p:" + word[:size])
+        for value in (entry.code, entry.document):
+            for start in range(len(value) - 2):
+                entry.keys.add("g:" + value[start:start + 3])
+        for key in entry.keys:
+            self._keys.setdefault(key, set()).add(suggestion.id)
+        self._entries[suggestion.id] = entry
+        self._by_code[suggestion.code] = suggestion.id
+
+    def remove(self, shareholder_id: int):
+        entry = self._entries.pop(shareholder_id, None)
+        if entry is None:
+            return
+        self._by_code.pop(entry.suggestion.code, None)
+        for key in entry.keys:
+            ids = self._keys.get(key)
+            if ids is not None:
+                ids.discard(shareholder_id)
+                if not ids:
+                    del self._keys[key]
+
+    def suggest(self, q: str, limit: int = 10) -> list[Suggestion]:
+        words = [w for w in (_compact(word) for word in q.split()) if w]
+        if not words:
+            return []
+        candidates = None
+        for word in sorted(words, key=len, reverse=True):
+            ids = self._keys.get("p:" + word[: self.prefix_len], set())
+            if len(word) >= 3:
+                ids = ids | self._keys.get("g:" + word[:3], set())
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        query = "".join(words)
+        found = [
+            self._entries[i]
+            for i in candidates
+            if all(self._entries[i].matches(word) for word in words)
+        ]
+        found.sort(
+            key=lambda e: (
+                e.code != query and e.document != query,
+                not e.code.startswith(query),
+                normalize(e.suggestion.name),
+                e.suggestion.id,
+            )
+        )
+        return [e.suggestion for e in found[:limit]]
+
+
+class TypeaheadRegistry:
+    """Per-election indexes, built lazily and patched by the write endpoints."""
+
+    def __init__(self, ttl: float = TYPEAHEAD_TTL):
+        self.ttl = ttl
+        self._indexes: dict[int, TypeaheadIndex] = {}
+        self._lock = threading.RLock()
+
+    def _fresh(self, index: TypeaheadIndex | None) -> bool:
+        return index is not None and (
+            self.ttl <= 0 or time.monotonic() - index.built_at < self.ttl
+        )
+
+    def get(self, db: Session, election_id: int) -> TypeaheadIndex:
+        with self._lock:
+            index = self._indexes.get(election_id)
+        if not self._fresh(index):
+            index = TypeaheadIndex(load_suggestions(db, election_id))
+            with self._lock:
+                current = self._indexes.get(election_id)
+                # Otro hilo pudo reconstruirlo mientras tanto
+                if self._fresh(current) and current.built_at > index.built_at:
+                    index = current
+                else:
+                    self._indexes[election_id] = index
+        return index
+
+    def suggest(self, db: Session, election_id: int, q: str, limit: int = 10) -> list[Suggestion]:
+        index = self.get(db, election_id)
+        with self._lock:
+            return index.suggest(q, limit)
+
+    def upsert(self, election_id: int, shareholders: Iterable):
+        """Add shareholders to an election and refresh them in other loaded indexes."""
+        with self._lock:
+            for sh in shareholders:
+                for other_id, index in self._indexes.items():
+                    current = index.get(sh.id)
+                    if other_id == election_id or current:
+                        index.upsert(
+                            Suggestion(
+                                sh.id,
+                                sh.code,
+                                sh.name,
+                                sh.document,
+                                current.representante if current else None,
+                                current.apoderado if current else None,
+                            )
+                        )
+
+    def set_attendee(self, election_id: int, code: str, representante: str | None, apoderado: str | None):
+        with self._lock:
+            index = self._indexes.get(election_id)
+            current = index.get_by_code(code) if index else None
+            if current:
+                index.upsert(current._replace(representante=representante, apoderado=apoderado))
+
+    def remove(self, shareholder_id: int, election_id: int | None = None):
+        with self._lock:
+            for other_id, index in self._indexes.items():
+                if election_id is None or other_id == election_id:
+                    index.remove(shareholder_id)
+
+    def invalidate(self, election_id: int | None = None):
+        with self._lock:
+            if election_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(election_id, None)
+
+
+def load_suggestions(db: Session, election_id: int) -> list[Suggestion]:
+    rows = (
+        db.query(
+            models.Shareholder.id,
+            models.Shareholder.code,
+            models.Shareholder.name,
+            models.Shareholder.document,
+            models.Attendee.representante,
+            models.Attendee.apoderado,
+        )
+        .join(
+            models.Attendance,
+            (models.Attendance.shareholder_id == models.Shareholder.id)
+            & (models.Attendance.election_id == election_id),
+        )
+        .outerjoin(
+            models.Attendee,
+            (models.Attendee.shareholder_id == models.Shareholder.id)
+            & (models.Attendee.election_id == election_id),
+        )
+        .all()
+    )
+    return [Suggestion(*row) for row in rows]
+
+
+registry = TypeaheadRegistry()
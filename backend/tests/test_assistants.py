@@ -1,10 +1,11 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import Base, engine, SessionLocal
-from app import models
+from app import models, storage
 from app.routers.auth import hash_password
 from openpyxl import Workbook
 from io import BytesIO
+import os
 
 client = TestClient(app)
 
@@ -270,3 +271,189 @@ def test_upload_apoderado_pdf():
     )
     assert up_resp3.status_code == 400
 
+
+
+def test_apoderado_pdf_size_cap_and_shared_storage(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_GC_GRACE", 0)
+    headers, election_id = setup_auth_and_election()
+    data = create_csv([["1", "Alice", "", "Bob", 10], ["2", "Carol", "", "Dan", 5]])
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={"file": ("attendees.csv", data, "text/csv")},
+        headers=headers,
+    )
+    first, second = [a["id"] for a in resp.json()]
+    upload = {"file": ("doc.pdf", b"%PDF-1.4\nshared\n", "application/pdf")}
+    for attendee_id in (first, second):
+        assert client.post(
+            f"/elections/{election_id}/assistants/{attendee_id}/apoderado-pdf",
+            files=upload,
+            headers=headers,
+        ).status_code == 200
+    db = SessionLocal()
+    paths = {a.apoderado_pdf_url for a in db.query(models.Attendee).all()}
+    db.close()
+    assert len(paths) == 1
+    path = paths.pop()
+    # el archivo compartido sólo se borra cuando nadie lo referencia
+    client.delete(f"/elections/{election_id}/assistants/{first}", headers=headers)
+    assert os.path.exists(path)
+    client.delete(f"/elections/{election_id}/assistants/{second}", headers=headers)
+    assert not os.path.exists(path)
+
+    monkeypatch.setattr(storage, "CHUNK_SIZE", 4)
+    big = {"file": ("big.pdf", b"%PDF" + b"x" * 64, "application/pdf")}
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={"file": ("attendees.csv", create_csv([["3", "Eve", "", "Fay", 1]]), "text/csv")},
+        headers=headers,
+    )
+    third = resp.json()[0]["id"]
+    monkeypatch.setattr(storage, "MAX_PDF_SIZE", 16)
+    resp = client.post(
+        f"/elections/{election_id}/assistants/{third}/apoderado-pdf", files=big, headers=headers
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "file too large"
+    assert os.listdir(storage.STORAGE_DIR / "tmp") == []
+
+
+def test_release_keeps_recent_files_until_sweep(tmp_path):
+    setup_auth_and_election()
+    path = storage.store_fileobj(BytesIO(b"%PDF-1.4\nfresh\n"), root=tmp_path)
+    db = SessionLocal()
+    # recién guardado: otro upload pudo reutilizarlo sin confirmar aún su fila
+    assert storage.release(db, path) is False
+    assert storage.sweep_orphans(db, root=tmp_path) == 0
+    assert os.path.exists(path)
+    old = os.path.getmtime(path) - storage.STORAGE_GC_GRACE - 1
+    os.utime(path, (old, old))
+    assert storage.sweep_orphans(db, root=tmp_path) == 1
+    assert not os.path.exists(path)
+    db.close()
+
+
+def test_import_attendees_chunked_bulk_sync(monkeypatch):
+    from app import importer
+
+    headers, election_id = setup_auth_and_election()
+    db = SessionLocal()
+    db.add(
+        models.Shareholder(code="2", name="Old", document="DOC-2", email="b@example.com", actions=1)
+    )
+    db.commit()
+    db.close()
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 2)
+    data = create_xlsx(
+        [["1", "Alice", "", "", 10], [None, None, None, None, None], ["2", "Bob", "Rep", "", 5], ["3", "Carol", "", "Dan", 7]]
+    )
+    files = {
+        "file": (
+            "attendees.xlsx",
+            data,
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    }
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel", files=files, headers=headers
+    )
+    assert resp.status_code == 200
+    assert [a["identifier"] for a in resp.json()] == ["1", "2", "3"]
+    assert resp.json()[2]["requires_document"] is True
+
+    db = SessionLocal()
+    bob = db.query(models.Shareholder).filter_by(code="2").one()
+    # se actualizan nombre y acciones, pero no el documento ni el correo existentes
+    assert (bob.name, float(bob.actions), bob.document, bob.email) == ("Bob", 5, "DOC-2", "b@example.com")
+    assert db.query(models.Attendance).filter_by(election_id=election_id).count() == 3
+    db.close()
+
+    # un error en un bloque posterior no deja nada guardado
+    data = create_csv([["4", "Dora", "", "", 1], ["5", "Ed", "", "", 2], ["6", "Flo", "", "", -1]])
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={"file": ("attendees.csv", data, "text/csv")},
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == ["Row 4: acciones must be positive"]
+    assert len(client.get(f"/elections/{election_id}/assistants", headers=headers).json()) == 3
+
+    # las filas vacías del XLSX cuentan para el número de fila informado
+    data = create_xlsx([["7", "Gus", "", "", 1], [None, None, None, None, None], ["8", "Hal", "", "", 0]])
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={
+            "file": (
+                "attendees.xlsx",
+                data,
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == ["Row 4: acciones must be positive"]
+
+
+def test_attendees_resolve_shareholder_id():
+    headers, election_id = setup_auth_and_election()
+    data = create_csv([["1", "Alice", "", "", 10]])
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={"file": ("attendees.csv", data, "text/csv")},
+        headers=headers,
+    )
+    attendee_id = resp.json()[0]["id"]
+    db = SessionLocal()
+    attendee = db.get(models.Attendee, attendee_id)
+    alice = db.query(models.Shareholder).filter_by(code="1").one()
+    assert attendee.shareholder_id == alice.id
+    # un asistente creado antes que su accionista se enlaza al crearlo
+    waiting = models.Attendee(election_id=election_id, identifier="9", accionista="Zoe", acciones=1)
+    db.add(waiting)
+    db.commit()
+    assert waiting.shareholder_id is None
+    zoe = models.Shareholder(code="9", name="Zoe", document="D9", actions=1)
+    db.add(zoe)
+    db.commit()
+    db.refresh(waiting)
+    assert waiting.shareholder_id == zoe.id
+    carl = models.Shareholder(code="7", name="Carl", document="D7", actions=1)
+    db.add(carl)
+    db.commit()
+    carl_id = carl.id
+    db.close()
+
+    resp = client.put(
+        f"/elections/{election_id}/assistants/{attendee_id}",
+        json={"identifier": "7"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    db = SessionLocal()
+    assert db.get(models.Attendee, attendee_id).shareholder_id == carl_id
+    db.close()
+
+    # cambiar el código del accionista mueve el enlace al asistente del nuevo código
+    resp = client.put(
+        f"/elections/{election_id}/shareholders/{carl_id}",
+        json={"code": "9B"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    db = SessionLocal()
+    assert db.get(models.Attendee, attendee_id).shareholder_id is None
+    db.add(models.Attendee(election_id=election_id, identifier="8", accionista="Carl", acciones=1))
+    db.commit()
+    db.close()
+    resp = client.put(
+        f"/elections/{election_id}/shareholders/{carl_id}",
+        json={"code": "8"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    db = SessionLocal()
+    linked = db.query(models.Attendee.identifier).filter_by(shareholder_id=carl_id).all()
+    assert linked == [("8",)]
+    db.close()
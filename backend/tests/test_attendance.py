@@ -48,6 +48,47 @@ def test_attendance_history_endpoint():
     assert history[0]["user_agent"]
 
 
+def test_attendance_timeline_pagination_and_arrivals():
+    headers, election_id = setup_env()
+    data = [
+        {"code": f"SH{i}", "name": f"Name {i}", "document": f"D{i}", "email": "a@example.com", "actions": 10}
+        for i in range(1, 4)
+    ]
+    client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    for i in range(1, 4):
+        client.post(f"/elections/{election_id}/attendance/SH{i}/mark", json={"mode": "PRESENCIAL"}, headers=headers)
+    client.post(f"/elections/{election_id}/attendance/SH1/mark", json={"mode": "VIRTUAL"}, headers=headers)
+
+    resp = client.get(f"/elections/{election_id}/attendance/timeline", params={"limit": 3}, headers=headers)
+    assert resp.status_code == 200
+    page = resp.json()
+    assert [item["code"] for item in page["items"]] == ["SH1", "SH3", "SH2"]
+    assert page["items"][0]["to_mode"] == "VIRTUAL"
+    assert page["next_cursor"]
+    resp = client.get(
+        f"/elections/{election_id}/attendance/timeline",
+        params={"limit": 3, "cursor": page["next_cursor"]},
+        headers=headers,
+    )
+    page = resp.json()
+    assert [item["code"] for item in page["items"]] == ["SH1"]
+    assert page["next_cursor"] is None
+
+    resp = client.get(
+        f"/elections/{election_id}/attendance/timeline",
+        params={"mode": "VIRTUAL", "changed_by": "AdminBVG"},
+        headers=headers,
+    )
+    assert len(resp.json()["items"]) == 1
+    assert client.get(
+        f"/elections/{election_id}/attendance/timeline", params={"cursor": "bogus"}, headers=headers
+    ).status_code == 400
+
+    resp = client.get(f"/elections/{election_id}/attendance/arrivals", headers=headers)
+    assert resp.status_code == 200
+    assert sum(b["arrivals"] for b in resp.json()) == 3
+
+
 def test_bulk_mark_attendance_all_success():
     headers, election_id = setup_env()
     data = [
@@ -219,6 +260,87 @@ def test_cannot_mark_absent_with_active_proxy():
     assert resp.status_code == 400
 
 
+def test_lookup_and_mark_by_document():
+    headers, election_id = setup_env()
+    data = [
+        {"code": "SH1", "name": "Alice", "document": "09-1234567-8", "email": None, "actions": 10},
+        {"code": "SH2", "name": "Bob", "document": "D2", "email": None, "actions": 5},
+    ]
+    client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    db = SessionLocal()
+    shareholder = db.query(models.Shareholder).filter_by(code="SH2").first()
+    person = models.Person(
+        type=models.PersonType.TERCERO, name="Proxy Person", document="0.555", email=None
+    )
+    db.add(person)
+    db.commit()
+    proxy = models.Proxy(
+        election_id=election_id,
+        proxy_person_id=person.id,
+        tipo_doc="ID",
+        num_doc="123",
+        fecha_otorg=date.today(),
+        pdf_url="proxy.pdf",
+        status=models.ProxyStatus.VALID,
+    )
+    db.add(proxy)
+    db.commit()
+    db.add(models.ProxyAssignment(proxy_id=proxy.id, shareholder_id=shareholder.id, weight_actions_snapshot=5))
+    db.commit()
+    proxy_id = proxy.id
+    db.close()
+
+    base = f"/elections/{election_id}/attendance/by-document"
+    resp = client.get(f"{base}/912345678", headers=headers)
+    assert resp.status_code == 200
+    assert [(r["code"], r["matched_by"]) for r in resp.json()] == [("SH1", "shareholder")]
+    resp = client.get(f"{base}/555", headers=headers)
+    match = resp.json()[0]
+    assert (match["code"], match["matched_by"], match["proxy_id"]) == ("SH2", "proxy", proxy_id)
+    assert client.get(f"{base}/999", headers=headers).status_code == 404
+
+    resp = client.post(f"{base}/0912345678/mark", json={"mode": "PRESENCIAL"}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["updated"][0]["mode"] == "PRESENCIAL"
+    assert client.post(f"{base}/555/mark", json={"mode": "PRESENCIAL"}, headers=headers).status_code == 404
+
+
+def test_summary_capital_scoped_to_election_roster():
+    headers, election_id = setup_env()
+    other = client.post("/elections", json={"name": "Other", "date": "2024-02-01"}, headers=headers).json()["id"]
+    data = [
+        {"code": "SH1", "name": "Alice", "document": "D1", "email": None, "actions": 100},
+        {"code": "SH2", "name": "Bob", "document": "D2", "email": None, "actions": 50},
+    ]
+    resp = client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    ids = {r["code"]: r["id"] for r in resp.json()}
+    client.post(
+        f"/elections/{other}/shareholders/import",
+        json=[{"code": "SH9", "name": "Zoe", "document": "D9", "email": None, "actions": 1000}],
+        headers=headers,
+    )
+    url = f"/elections/{election_id}/attendance/summary"
+    summary = client.get(url, headers=headers).json()
+    assert (summary["total"], summary["capital_suscrito"]) == (2, 150.0)
+    db = SessionLocal()
+    snapshot = db.get(models.ElectionRosterSnapshot, election_id)
+    assert (snapshot.roster_size, float(snapshot.capital_suscrito)) == (2, 150.0)
+    db.close()
+
+    client.put(f"/elections/{election_id}/shareholders/{ids['SH2']}", json={"actions": 70}, headers=headers)
+    assert client.get(url, headers=headers).json()["capital_suscrito"] == 170.0
+    client.delete(f"/elections/{election_id}/shareholders/{ids['SH1']}", headers=headers)
+    summary = client.get(url, headers=headers).json()
+    assert (summary["total"], summary["capital_suscrito"]) == (1, 70.0)
+    other_summary = client.get(f"/elections/{other}/attendance/summary", headers=headers).json()
+    assert other_summary["capital_suscrito"] == 1000.0
+    # el último accionista se va: el snapshot se elimina, no queda desactualizado
+    client.delete(f"/elections/{election_id}/shareholders/{ids['SH2']}", headers=headers)
+    db = SessionLocal()
+    assert db.get(models.ElectionRosterSnapshot, election_id) is None
+    db.close()
+
+
 def test_vote_registrar_can_access_summary():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
@@ -52,6 +52,112 @@ def test_login_rate_limit(admin_user):
         "/auth/login", json={"username": "AdminBVG", "password": "wrong"}
     )
     assert resp.status_code == 429
+    resp = client.post(
+        "/auth/login", json={"username": "AdminBVG", "password": "BVG2025"}
+    )
+    assert resp.status_code == 200
+
+
+@pytest.mark.parametrize("backend", ["memory", "db"])
+def test_rate_limiter_sliding_window(admin_user, backend, monkeypatch):
+    from app import ratelimit
+
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    limiter = ratelimit.create_limiter(2, 60, backend)
+    assert not limiter.hit("k")
+    now[0] += 30
+    assert not limiter.hit("k")
+    assert limiter.is_limited("k")
+    assert limiter.hit("k")
+    now[0] += 31  # el primer intento sale de la ventana
+    assert not limiter.is_limited("k")
+    assert not limiter.hit("k")
+    assert limiter.is_limited("k")
+    limiter.reset("k")
+    assert not limiter.is_limited("k")
+    if backend == "memory":
+        bounded = ratelimit.MemoryRateLimiter(2, 60, max_keys=3)
+        for i in range(10):
+            bounded.hit(f"user{i}")
+        assert len(bounded) == 3
+
+
+@pytest.mark.parametrize("backend", ["memory", "db"])
+def test_rate_limiter_parallel_hits_respect_limit(admin_user, backend):
+    from concurrent.futures import ThreadPoolExecutor
+    from app import ratelimit
+
+    limiter = ratelimit.create_limiter(3, 60, backend)
+    limiter.reset("parallel")
+
+    def attempt(_):
+        db = SessionLocal()
+        try:
+            return limiter.hit("parallel", db)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(attempt, range(12)))
+    # solo pasan ``limit`` intentos aunque lleguen a la vez
+    assert results.count(False) == 3
+    if backend == "db":
+        db = SessionLocal()
+        assert db.query(models.RateLimitHit).filter_by(key="parallel").count() == 3
+        db.close()
+
+
+def test_login_upgrades_legacy_hash(admin_user):
+    import hashlib
+
+    salt = bytes(16)
+    legacy = f"{salt.hex()}:{hashlib.pbkdf2_hmac('sha256', b'Legacy1', salt, 100_000).hex()}"
+    db = SessionLocal()
+    db.add(models.User(username="legacy", hashed_password=legacy, role="FUNCIONAL_BVG"))
+    db.commit()
+    db.close()
+    resp = client.post("/auth/login", json={"username": "legacy", "password": "Legacy1"})
+    assert resp.status_code == 200
+    db = SessionLocal()
+    stored = db.query(models.User).filter_by(username="legacy").one().hashed_password
+    db.close()
+    assert stored.startswith("pbkdf2_sha256$")
+    resp = client.post("/auth/login", json={"username": "legacy", "password": "Legacy1"})
+    assert resp.status_code == 200
+    assert client.get("/metrics").json()["password_hashing"]["completed"] >= 3
+
+
+def test_login_rejected_when_password_queue_is_full(admin_user, monkeypatch):
+    from app import passwords
+
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_MAX_QUEUE", 0)
+    rejected = passwords.metrics()["rejected"]
+    resp = client.post("/auth/login", json={"username": "AdminBVG", "password": "BVG2025"})
+    assert resp.status_code == 503
+    assert resp.json()["detail"] == "password service busy"
+    assert passwords.metrics()["rejected"] == rejected + 1
+
+
+def test_password_pool_replaced_when_broken(admin_user, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+    from app import passwords
+
+    class Broken:
+        def submit(self, *args):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(passwords._pool, "_executor", Broken())
+    restarts = passwords.metrics()["restarts"]
+    resp = client.post("/auth/login", json={"username": "AdminBVG", "password": "BVG2025"})
+    assert resp.status_code == 200
+    assert passwords.metrics()["restarts"] == restarts + 1
+    replacement = passwords._pool._executor
+    assert not isinstance(replacement, Broken)
+    replacement.shutdown(wait=False)
 
 
 def test_auth_flows():
@@ -155,3 +155,25 @@ def test_registrar_users_see_assigned_election():
     assert resp.status_code == 200
     assert len(resp.json()) == 1
     assert resp.json()[0]["id"] == election2
+
+
+def test_election_role_claim_and_revocation():
+    import jwt
+
+    reg1_id, _ = setup_db()
+    admin_headers = login("admin")
+    election_id = client.post(
+        "/elections",
+        json={"name": "A", "date": "2024-01-01", "attendance_registrars": [reg1_id]},
+        headers=admin_headers,
+    ).json()["id"]
+    reg1_headers = login("reg1")
+    token = reg1_headers["Authorization"].split()[1]
+    claims = jwt.decode(token, options={"verify_signature": False})
+    assert claims["er"] == {str(election_id): "ATTENDANCE"}
+    url = f"/elections/{election_id}/attendance/history?code=S1"
+    assert client.get(url, headers=reg1_headers).status_code == 200
+    # quitar el rol invalida el claim del token ya emitido
+    resp = client.delete(f"/elections/{election_id}/users/{reg1_id}", headers=admin_headers)
+    assert resp.status_code == 204
+    assert client.get(url, headers=reg1_headers).status_code == 403
@@ -8,3 +8,13 @@ def test_health_endpoint():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
+
+
+def test_metrics_endpoint():
+    from app.database import engine_options
+
+    data = client.get("/metrics").json()
+    assert data["db_pool"]["checkedout"] >= 0
+    assert "pending" in data["password_hashing"]
+    assert engine_options("sqlite:///./test.db") == {}
+    assert engine_options("postgresql://db/bvg")["pool_pre_ping"] is True
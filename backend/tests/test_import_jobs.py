@@ -0,0 +1,185 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app import importer, import_jobs, models
+from app.routers.auth import hash_password
+
+client = TestClient(app)
+
+
+def setup_env():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(
+        models.User(
+            username="AdminBVG",
+            hashed_password=hash_password("BVG2025"),
+            role="ADMIN_BVG",
+        )
+    )
+    db.commit()
+    db.close()
+    token = client.post("/auth/login", json={"username": "AdminBVG", "password": "BVG2025"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    resp = client.post("/elections", json={"name": "Demo", "date": "2024-01-01"}, headers=headers)
+    return headers, resp.json()["id"]
+
+
+def wait_for(election_id, job_id, headers):
+    for _ in range(100):
+        job = client.get(f"/elections/{election_id}/import-jobs/{job_id}", headers=headers).json()
+        if job["status"] not in ("QUEUED", "RUNNING"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("import job did not finish")
+
+
+def test_import_job_runs_in_background_and_persists_errors():
+    headers, election_id = setup_env()
+    data = "id,accionista,representante_legal,apoderado,acciones\n1,Alice,,,10\n2,Bob,,,5\n"
+    resp = client.post(
+        f"/elections/{election_id}/import-jobs",
+        data={"kind": "assistants"},
+        files={"file": ("padron.csv", data, "text/csv")},
+        headers=headers,
+    )
+    assert resp.status_code == 202
+    job = wait_for(election_id, resp.json()["id"], headers)
+    assert job["status"] == "SUCCEEDED"
+    assert (job["rows_parsed"], job["rows_valid"], job["rows_written"]) == (2, 2, 2)
+    assert job["result"] == {"attendees_created": 2, "shareholders_synced": 2}
+    assert len(client.get(f"/elections/{election_id}/assistants", headers=headers).json()) == 2
+
+    bad = "code,name,document,actions\nS1,Ann,D1,3\nS2,,D2,x\n"
+    resp = client.post(
+        f"/elections/{election_id}/import-jobs",
+        data={"kind": "shareholders"},
+        files={"file": ("accionistas.csv", bad, "text/csv")},
+        headers=headers,
+    )
+    job = wait_for(election_id, resp.json()["id"], headers)
+    assert job["status"] == "FAILED"
+    assert job["errors"] == [{"row": 3, "errors": ["name required", "actions must be a number"]}]
+    jobs = client.get(f"/elections/{election_id}/import-jobs", headers=headers).json()
+    assert [j["status"] for j in jobs] == ["FAILED", "SUCCEEDED"]
+
+
+def test_cancel_import_job(monkeypatch):
+    headers, election_id = setup_env()
+    queued = []
+    monkeypatch.setattr(import_jobs._executor, "submit", lambda *args: queued.append(args))
+    resp = client.post(
+        f"/elections/{election_id}/import-jobs",
+        data={"kind": "assistants"},
+        files={"file": ("padron.csv", "id,accionista,representante_legal,apoderado,acciones\n1,Al,,,1\n", "text/csv")},
+        headers=headers,
+    )
+    job_id = resp.json()["id"]
+    resp = client.post(f"/elections/{election_id}/import-jobs/{job_id}/cancel", headers=headers)
+    assert resp.status_code == 202
+    run_job, *args = queued[0]
+    run_job(*args)
+    job = client.get(f"/elections/{election_id}/import-jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "CANCELLED"
+    assert client.get(f"/elections/{election_id}/assistants", headers=headers).json() == []
+    resp = client.post(f"/elections/{election_id}/import-jobs/{job_id}/cancel", headers=headers)
+    assert resp.status_code == 400
+
+
+def test_cancel_reaches_job_running_in_another_worker(monkeypatch):
+    headers, election_id = setup_env()
+    queued = []
+    monkeypatch.setattr(import_jobs._executor, "submit", lambda *args: queued.append(args))
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 1)
+    rows = "".join(f"{i},Name {i},,,1\n" for i in range(1, 4))
+    resp = client.post(
+        f"/elections/{election_id}/import-jobs",
+        data={"kind": "assistants"},
+        files={"file": ("padron.csv", "id,accionista,representante_legal,apoderado,acciones\n" + rows, "text/csv")},
+        headers=headers,
+    )
+    job_id = resp.json()["id"]
+    # el job corre en otro proceso: aquí no hay handle
+    import_jobs._handles.pop(job_id)
+    published = []
+
+    def publish(loop, job):
+        # la cancelación llega mientras corre el primer bloque
+        if job.status == models.ImportJobStatus.RUNNING and not published:
+            published.append(job.id)
+            cancel = client.post(f"/elections/{election_id}/import-jobs/{job_id}/cancel", headers=headers)
+            assert cancel.status_code == 202
+
+    monkeypatch.setattr(import_jobs, "_publish", publish)
+    run_job, *args = queued[0]
+    run_job(*args)
+    job = client.get(f"/elections/{election_id}/import-jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "CANCELLED"
+    assert client.get(f"/elections/{election_id}/assistants", headers=headers).json() == []
+
+
+def test_only_stale_jobs_of_other_workers_are_failed(monkeypatch):
+    headers, election_id = setup_env()
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(seconds=import_jobs.IMPORT_JOB_STALE_AFTER + 1)
+    db = SessionLocal()
+    jobs = {
+        "stale": (models.ImportJobStatus.QUEUED, "gone:1", old),
+        "legacy": (models.ImportJobStatus.RUNNING, None, None),
+        "alive": (models.ImportJobStatus.RUNNING, "other:2", now),
+        "own": (models.ImportJobStatus.QUEUED, import_jobs.WORKER_ID, old),
+        "done": (models.ImportJobStatus.SUCCEEDED, "gone:1", old),
+    }
+    ids = {}
+    for name, (status, owner, beat) in jobs.items():
+        job = models.ImportJob(
+            election_id=election_id,
+            kind="assistants",
+            filename="padron.csv",
+            status=status,
+            created_by="AdminBVG",
+            owner=owner,
+            heartbeat_at=beat,
+        )
+        db.add(job)
+        db.flush()
+        ids[name] = job.id
+    db.commit()
+    db.close()
+
+    assert import_jobs.fail_stale() == 2
+    # el latido renueva los jobs propios
+    import_jobs.heartbeat()
+    db = SessionLocal()
+    status = {name: db.get(models.ImportJob, job_id).status.value for name, job_id in ids.items()}
+    own_beat = db.get(models.ImportJob, ids["own"]).heartbeat_at
+    db.close()
+    assert status == {
+        "stale": "FAILED",
+        "legacy": "FAILED",
+        "alive": "RUNNING",
+        "own": "QUEUED",
+        "done": "SUCCEEDED",
+    }
+    assert own_beat.replace(tzinfo=timezone.utc) >= now.replace(microsecond=0)
+
+    # el dueño tardío no revive un job ya marcado como fallido
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("id,accionista,representante_legal,apoderado,acciones\n1,Al,,,1\n")
+    import_jobs.run_job(ids["stale"], path)
+    job = client.get(f"/elections/{election_id}/import-jobs/{ids['stale']}", headers=headers).json()
+    assert job["status"] == "FAILED"
+    assert job["errors"] == ["import worker stopped"]
+    assert client.get(f"/elections/{election_id}/assistants", headers=headers).json() == []
+    db = SessionLocal()
+    failed = db.get(models.ImportJob, ids["stale"])
+    assert not import_jobs._finish(db, failed, import_jobs._Handle(), models.ImportJobStatus.SUCCEEDED)
+    assert db.get(models.ImportJob, ids["stale"]).status == models.ImportJobStatus.FAILED
+    db.close()
@@ -1,9 +1,11 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import Base, engine, SessionLocal
+from sqlalchemy import event
 from app import models
 from app.routers.auth import hash_password
 import json
+from datetime import date, timedelta
 
 client = TestClient(app)
 
@@ -94,6 +96,8 @@ def test_create_and_list_proxies():
     proxies = response.json()
     assert len(proxies) == 1
     assert proxies[0]["id"] == data["id"]
+    # el listado serializado directamente mantiene la forma del esquema
+    assert proxies[0] == data
 
 
 def test_proxy_presence_and_invalidation():
@@ -253,3 +257,461 @@ def test_update_and_delete_proxy():
     assert list_resp.status_code == 200
     assert list_resp.json() == []
 
+
+
+def test_expired_proxies_read_time_and_sweep():
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    db = SessionLocal()
+    db.add(models.Attendance(election_id=election_id, shareholder_id=shareholder_id, mode=models.AttendanceMode.AUSENTE, present=False))
+    proxy = models.Proxy(
+        election_id=election_id,
+        proxy_person_id=person_id,
+        tipo_doc="ID",
+        num_doc="123",
+        fecha_otorg=date(2023, 1, 1),
+        fecha_vigencia=date.today() - timedelta(days=1),
+        pdf_url="proxy.pdf",
+        status=models.ProxyStatus.VALID,
+        mode=models.AttendanceMode.PRESENCIAL,
+        present=True,
+    )
+    db.add(proxy)
+    db.commit()
+    db.add(models.ProxyAssignment(proxy_id=proxy.id, shareholder_id=shareholder_id, weight_actions_snapshot=10))
+    db.commit()
+    proxy_id = proxy.id
+    db.close()
+
+    # vencido al leer, sin escribir en el GET
+    listed = client.get(f"/elections/{election_id}/proxies", headers=headers).json()
+    assert (listed[0]["status"], listed[0]["present"]) == ("EXPIRED", False)
+    summary = client.get(f"/elections/{election_id}/attendance/summary", headers=headers).json()
+    assert summary["representado"] == 0
+    db = SessionLocal()
+    assert db.get(models.Proxy, proxy_id).status == models.ProxyStatus.VALID
+    db.close()
+    mark = client.post(f"/elections/{election_id}/proxies/{proxy_id}/mark", json={"mode": "PRESENCIAL"}, headers=headers)
+    assert mark.status_code == 400
+
+    token = headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/elections/{election_id}/observer/ws?token={token}") as ws:
+        ws.receive_json()
+        resp = client.post(f"/elections/{election_id}/proxies/expire", headers=headers)
+        assert resp.json() == {"expired": 1, "proxy_ids": [proxy_id]}
+        msg = ws.receive_json()
+        assert [r["code"] for r in msg["rows"]] == ["SH_PRX"]
+        assert msg["summary"]["representado"] == 0
+    assert client.post(f"/elections/{election_id}/proxies/expire", headers=headers).json()["expired"] == 0
+    db = SessionLocal()
+    assert db.get(models.Proxy, proxy_id).status == models.ProxyStatus.EXPIRED
+    assert db.query(models.AuditLog).filter_by(action="PROXY_EXPIRE").count() == 1
+    db.close()
+
+
+def test_proxy_page_eager_loads_person_and_shareholders():
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    db = SessionLocal()
+    for i in range(3):
+        proxy = models.Proxy(
+            election_id=election_id,
+            proxy_person_id=person_id,
+            tipo_doc="ID",
+            num_doc=f"N{i}",
+            fecha_otorg=date(2023, 1, 1),
+            pdf_url="proxy.pdf",
+            status=models.ProxyStatus.VALID,
+            present=i == 1,
+        )
+        db.add(proxy)
+        db.flush()
+        db.add(models.ProxyAssignment(proxy_id=proxy.id, shareholder_id=shareholder_id, weight_actions_snapshot=10))
+    db.commit()
+    db.close()
+
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    url = f"/elections/{election_id}/proxies/page"
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        first = client.get(url, params={"limit": 2, "include_total": True}, headers=headers).json()
+        per_page = len(statements)
+        statements.clear()
+        client.get(url, params={"limit": 1}, headers=headers)
+        assert len(statements) == per_page - 1  # sin la consulta del total
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert first["total"] == 3
+    assert [p["num_doc"] for p in first["items"]] == ["N0", "N1"]
+    item = first["items"][0]
+    assert item["person"]["name"] == "Proxy Person"
+    assert item["assignments"][0]["code"] == "SH_PRX"
+    assert item["assignments"][0]["actions"] == 10.0
+    second = client.get(url, params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert [p["num_doc"] for p in second["items"]] == ["N2"]
+    assert second["next_cursor"] is None
+    present = client.get(url, params={"present": True, "status": "VALID"}, headers=headers).json()
+    assert [p["num_doc"] for p in present["items"]] == ["N1"]
+
+
+def test_bulk_import_proxies_from_manifest_and_zip():
+    import io
+    import zipfile
+
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    db = SessionLocal()
+    db.add(models.Shareholder(code="SH_B", name="Bob", document="D3", actions=6))
+    db.commit()
+    db.close()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("p1.pdf", b"%PDF-1.4 uno")
+        zf.writestr("p2.pdf", b"%PDF-1.4 dos")
+    header = "num_doc,tipo_doc,fecha_otorg,fecha_vigencia,person_name,person_document,shareholder_code,pdf,weight\n"
+    bad = header + (
+        "P1,ID,2023-12-01,,Nuevo,N-1,SH_PRX,p1.pdf,\n"
+        "P2,ID,2024-02-01,,Otro,N-2,NOPE,missing.pdf,\n"
+    )
+    files = {
+        "manifest": ("poderes.csv", bad, "text/csv"),
+        "archive": ("poderes.zip", archive.getvalue(), "application/zip"),
+    }
+    resp = client.post(f"/elections/{election_id}/proxies/import", files=files, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == [
+        {
+            "row": 3,
+            "errors": ["shareholder not found", "proxy not yet valid", "pdf not found in archive"],
+        }
+    ]
+    assert client.get(f"/elections/{election_id}/proxies", headers=headers).json() == []
+
+    good = header + (
+        "P1,ID,2023-12-01,,Nuevo,N-1,SH_PRX,p1.pdf,4\n"
+        "P2,ID,2023-12-01,2030-01-01,Proxy Person,pdocx,SH_B,p2.pdf,\n"
+    )
+    files["manifest"] = ("poderes.csv", good, "text/csv")
+    resp = client.post(f"/elections/{election_id}/proxies/import", files=files, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "proxies_created": 2,
+        "assignments_created": 2,
+        "persons_created": 1,
+        "pdfs_stored": 2,
+    }
+    proxies = client.get(f"/elections/{election_id}/proxies", headers=headers).json()
+    by_doc = {p["num_doc"]: p for p in proxies}
+    assert by_doc["P2"]["proxy_person_id"] == person_id
+    assert by_doc["P1"]["assignments"][0]["weight_actions_snapshot"] == 4
+    assert by_doc["P2"]["assignments"][0]["weight_actions_snapshot"] == 6
+    assert by_doc["P1"]["assignments"][0]["shareholder_id"] == shareholder_id
+
+    # un accionista ya representado no puede recibir otro poder
+    again = header + "P3,ID,2023-12-01,,Otro,N-3,SH_PRX,p1.pdf,\n"
+    files["manifest"] = ("poderes.csv", again, "text/csv")
+    resp = client.post(f"/elections/{election_id}/proxies/import", files=files, headers=headers)
+    assert resp.json()["detail"] == [
+        {"row": 2, "errors": ["shareholder already has an active proxy"]}
+    ]
+
+
+def test_bulk_import_releases_pdfs_when_commit_fails(monkeypatch, tmp_path):
+    import io
+    import zipfile
+    from fastapi import HTTPException
+    from app import storage
+    from app.routers import proxies as proxies_router
+
+    headers, election_id = setup_env()
+    setup_entities()
+    monkeypatch.setattr(storage, "STORAGE_DIR", tmp_path)
+    monkeypatch.setattr(storage, "STORAGE_GC_GRACE", 0)
+
+    def failing_log(*args, **kwargs):
+        raise HTTPException(status_code=503, detail="unavailable")
+
+    monkeypatch.setattr(proxies_router, "_log", failing_log)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("p1.pdf", b"%PDF-1.4 uno")
+    manifest = (
+        "num_doc,tipo_doc,fecha_otorg,fecha_vigencia,person_name,person_document,shareholder_code,pdf,weight\n"
+        "P1,ID,2023-12-01,,Nuevo,N-1,SH_PRX,p1.pdf,\n"
+    )
+    files = {
+        "manifest": ("poderes.csv", manifest, "text/csv"),
+        "archive": ("poderes.zip", archive.getvalue(), "application/zip"),
+    }
+    resp = client.post(f"/elections/{election_id}/proxies/import", files=files, headers=headers)
+    assert resp.status_code == 503
+    assert list((tmp_path / "pdf").glob("*/*.pdf")) == []
+    assert client.get(f"/elections/{election_id}/proxies", headers=headers).json() == []
+
+
+def test_bulk_mark_proxies_single_update_and_broadcast(monkeypatch):
+    from app.routers import proxies as proxies_router
+
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    db = SessionLocal()
+    other = models.Shareholder(code="SH_PRX2", name="Bob", document="D3", actions=5)
+    db.add(other)
+    db.flush()
+    ids = []
+    for num_doc, status, holder in (
+        ("B1", models.ProxyStatus.VALID, shareholder_id),
+        ("B2", models.ProxyStatus.VALID, other.id),
+        ("B3", models.ProxyStatus.INVALID, other.id),
+    ):
+        proxy = models.Proxy(
+            election_id=election_id,
+            proxy_person_id=person_id,
+            tipo_doc="ID",
+            num_doc=num_doc,
+            fecha_otorg=date(2023, 12, 1),
+            pdf_url="x.pdf",
+            status=status,
+        )
+        db.add(proxy)
+        db.flush()
+        db.add(models.ProxyAssignment(proxy_id=proxy.id, shareholder_id=holder, weight_actions_snapshot=1))
+        ids.append(proxy.id)
+    db.commit()
+    db.close()
+
+    messages = []
+
+    async def record(message):
+        messages.append(message)
+
+    monkeypatch.setattr(proxies_router.manager, "broadcast", record)
+    resp = client.post(
+        f"/elections/{election_id}/proxies/bulk_mark",
+        json={"proxy_ids": ids + [ids[0], 9999], "mode": "PRESENCIAL"},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {"updated": ids[:2], "failed": [ids[2], 9999]}
+    assert len(messages) == 1
+    assert messages[0]["summary"]["representado"] == 2
+    assert [row["code"] for row in messages[0]["rows"]] == ["SH_PRX", "SH_PRX2"]
+
+    db = SessionLocal()
+    logs = db.query(models.AuditLog).filter_by(action="PROXY_MARK").all()
+    assert sorted(log.details["proxy_id"] for log in logs) == ids[:2]
+    assert {p.marked_by for p in db.query(models.Proxy).filter(models.Proxy.id.in_(ids[:2]))} == {"AdminBVG"}
+    db.close()
+
+
+def test_representation_map_follows_proxy_changes():
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    payload = {
+        "election_id": election_id,
+        "proxy_person_id": person_id,
+        "tipo_doc": "ID",
+        "num_doc": "MAP1",
+        "fecha_otorg": "2024-01-01",
+        "fecha_vigencia": None,
+        "assignments": [
+            {
+                "shareholder_id": shareholder_id,
+                "weight_actions_snapshot": 7,
+                "valid_from": None,
+                "valid_until": None,
+            }
+        ],
+    }
+    files = {
+        "pdf": ("power.pdf", b"%PDF-1.4 map", "application/pdf"),
+        "data": (None, json.dumps(payload), "application/json"),
+    }
+    proxy_id = client.post(f"/elections/{election_id}/proxies", files=files, headers=headers).json()["id"]
+
+    def entries():
+        db = SessionLocal()
+        rows = [
+            (r.shareholder_id, r.proxy_id, r.apoderado, float(r.weight_actions_snapshot), r.present)
+            for r in db.query(models.ProxyRepresentation).filter_by(election_id=election_id)
+        ]
+        db.close()
+        return rows
+
+    assert entries() == [(shareholder_id, proxy_id, "Proxy Person", 7.0, False)]
+    client.post(
+        f"/elections/{election_id}/proxies/{proxy_id}/mark",
+        json={"mode": "PRESENCIAL"},
+        headers=headers,
+    )
+    assert entries() == [(shareholder_id, proxy_id, "Proxy Person", 7.0, True)]
+    summary = client.get(f"/elections/{election_id}/attendance/summary", headers=headers).json()
+    assert summary["capital_presente_representado"] == 7.0
+    # con poder vigente no puede marcarse ausente
+    resp = client.post(
+        f"/elections/{election_id}/attendance/SH_PRX/mark",
+        json={"mode": "AUSENTE"},
+        headers=headers,
+    )
+    assert resp.status_code == 400
+    client.post(f"/elections/{election_id}/proxies/{proxy_id}/invalidate", headers=headers)
+    assert entries() == []
+
+
+def test_conflicting_proxy_rejected_and_reported():
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+
+    def payload(num_doc):
+        return {
+            "election_id": election_id,
+            "proxy_person_id": person_id,
+            "tipo_doc": "ID",
+            "num_doc": num_doc,
+            "fecha_otorg": "2024-01-01",
+            "fecha_vigencia": None,
+            "assignments": [
+                {
+                    "shareholder_id": shareholder_id,
+                    "weight_actions_snapshot": 10,
+                    "valid_from": None,
+                    "valid_until": None,
+                }
+            ],
+        }
+
+    def files(num_doc):
+        return {
+            "pdf": ("power.pdf", b"%PDF-1.4 c", "application/pdf"),
+            "data": (None, json.dumps(payload(num_doc)), "application/json"),
+        }
+
+    first = client.post(f"/elections/{election_id}/proxies", files=files("C1"), headers=headers)
+    proxy_id = first.json()["id"]
+    resp = client.post(f"/elections/{election_id}/proxies", files=files("C2"), headers=headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "shareholder already has an active proxy"
+    # actualizar el mismo poder no es un conflicto
+    resp = client.put(
+        f"/elections/{election_id}/proxies/{proxy_id}",
+        files={"data": (None, json.dumps(payload("C1")), "application/json")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    assert client.get(f"/elections/{election_id}/proxies/conflicts", headers=headers).json() == []
+
+    # un doble poder cargado por fuera de la API aparece en el reporte
+    db = SessionLocal()
+    other = models.Proxy(
+        election_id=election_id,
+        proxy_person_id=person_id,
+        tipo_doc="ID",
+        num_doc="C3",
+        fecha_otorg=date(2024, 1, 1),
+        pdf_url="x.pdf",
+    )
+    db.add(other)
+    db.flush()
+    db.add(models.ProxyAssignment(proxy_id=other.id, shareholder_id=shareholder_id, weight_actions_snapshot=10))
+    db.commit()
+    other_id = other.id
+    db.close()
+    report = client.get(f"/elections/{election_id}/proxies/conflicts", headers=headers).json()
+    assert report == [
+        {
+            "shareholder_id": shareholder_id,
+            "code": "SH_PRX",
+            "name": "Alice",
+            "proxies": [
+                {"proxy_id": proxy_id, "apoderado": "Proxy Person"},
+                {"proxy_id": other_id, "apoderado": "Proxy Person"},
+            ],
+        }
+    ]
+
+
+def test_proxy_committed_after_check_is_rejected(monkeypatch, tmp_path):
+    from app import storage
+    from app.routers import proxies as proxies_router
+
+    headers, election_id = setup_env()
+    person_id, shareholder_id = setup_entities()
+    monkeypatch.setattr(storage, "STORAGE_DIR", tmp_path)
+    original_check = proxies_router._check_assignments
+
+    def racing_check(proxy_data):
+        # otro request registra un poder para el mismo accionista entre el chequeo y el commit
+        db = SessionLocal()
+        other = models.Proxy(
+            election_id=election_id,
+            proxy_person_id=person_id,
+            tipo_doc="ID",
+            num_doc="R1",
+            fecha_otorg=date(2024, 1, 1),
+            pdf_url="x.pdf",
+        )
+        db.add(other)
+        db.flush()
+        db.add(models.ProxyAssignment(proxy_id=other.id, shareholder_id=shareholder_id, weight_actions_snapshot=10))
+        db.commit()
+        db.close()
+        original_check(proxy_data)
+
+    monkeypatch.setattr(proxies_router, "_check_assignments", racing_check)
+    data = {
+        "election_id": election_id,
+        "proxy_person_id": person_id,
+        "tipo_doc": "ID",
+        "num_doc": "R2",
+        "fecha_otorg": "2024-01-01",
+        "fecha_vigencia": None,
+        "assignments": [
+            {
+                "shareholder_id": shareholder_id,
+                "weight_actions_snapshot": 10,
+                "valid_from": None,
+                "valid_until": None,
+            }
+        ],
+    }
+    resp = client.post(
+        f"/elections/{election_id}/proxies",
+        files={
+            "pdf": ("power.pdf", b"%PDF-1.4 r", "application/pdf"),
+            "data": (None, json.dumps(data), "application/json"),
+        },
+        headers=headers,
+    )
+    assert resp.status_code == 409
+    assert resp.json()["detail"] == "shareholder already has an active proxy"
+    db = SessionLocal()
+    assert db.query(models.Proxy).filter_by(num_doc="R2").count() == 0
+    db.close()
+    # el PDF solo se guarda cuando el poder pasó todas las validaciones
+    assert list(tmp_path.rglob("*.pdf")) == []
+
+    monkeypatch.undo()
+    monkeypatch.setattr(storage, "STORAGE_DIR", tmp_path)
+    data["num_doc"] = "R3"
+    data["status"] = "INVALID"
+    data["assignments"] = data["assignments"] * 2
+    files = {
+        "pdf": ("power.pdf", b"%PDF-1.4 d", "application/pdf"),
+        "data": (None, json.dumps(data), "application/json"),
+    }
+    resp = client.post(f"/elections/{election_id}/proxies", files=files, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "duplicate assignment"
+    db = SessionLocal()
+    other_id = db.query(models.Proxy.id).filter_by(num_doc="R1").scalar()
+    db.close()
+    files["data"] = (None, json.dumps({**data, "num_doc": "R1"}), "application/json")
+    resp = client.put(f"/elections/{election_id}/proxies/{other_id}", files=files, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "duplicate assignment"
+    assert list(tmp_path.rglob("*.pdf")) == []
@@ -1,7 +1,7 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import Base, engine, SessionLocal
-from app import models
+from app import models, importer, typeahead
 from app.routers.auth import hash_password
 
 client = TestClient(app)
@@ -60,7 +60,8 @@ def test_import_preview_and_confirm_shareholders_csv():
         headers=headers,
     )
     assert response.status_code == 200
-    assert response.json()[0]["code"] == "SH1"
+    assert response.json()["inserted"] == 1
+    assert response.json()["attendances_created"] == 1
 
     # idempotent import
     response = client.post(
@@ -69,6 +70,8 @@ def test_import_preview_and_confirm_shareholders_csv():
         headers=headers,
     )
     assert response.status_code == 200
+    assert response.json()["updated"] == 1
+    assert response.json()["attendances_created"] == 0
     list_resp = client.get(
         f"/elections/{election_id}/shareholders", headers=headers
     )
@@ -88,6 +91,211 @@ def test_import_preview_and_confirm_shareholders_csv():
     assert len(empty_resp.json()) == 0
 
 
+def test_import_file_streams_in_chunks(monkeypatch):
+    headers, election_id = setup_auth_and_election()
+    monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 2)
+    rows = [f"SH{i},Name {i},D{i},,{i}\n" for i in range(1, 6)]
+    bad_csv = "code,name,document,email,actions\n" + "".join(rows) + "SH9,,D9,,1\n"
+    files = {"file": ("shareholders.csv", bad_csv, "text/csv")}
+    response = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=false",
+        files=files,
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == [{"row": 7, "errors": ["name required"]}]
+    assert client.get(f"/elections/{election_id}/shareholders", headers=headers).json() == []
+
+    good_csv = "code,name,document,email,actions\n" + "".join(rows)
+    files = {"file": ("shareholders.csv", good_csv, "text/csv")}
+    response = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=false",
+        files=files,
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 5
+
+    files = {"file": ("shareholders.csv", "code,name\n\xff\xfe".encode("latin-1"), "text/csv")}
+    response = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=true",
+        files=files,
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+
+def test_import_preview_session_commit():
+    headers, election_id = setup_auth_and_election()
+    csv_content = (
+        "code,name,document,email,actions\n"
+        "SH1,Alice,D1,a@example.com,10\n"
+        "SH2,Bob,D2,,5\n"
+    )
+    files = {"file": ("shareholders.csv", csv_content, "text/csv")}
+    preview = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=true",
+        files=files,
+        headers=headers,
+    ).json()
+    assert len(preview["valid"]) == 2
+    assert preview["token"]
+    assert preview["expires_at"]
+
+    commit_url = f"/elections/{election_id}/shareholders/import-file/{preview['token']}/commit"
+    response = client.post(commit_url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 2
+    # los tokens son de un solo uso
+    assert client.post(commit_url, headers=headers).status_code == 404
+    assert len(client.get(f"/elections/{election_id}/shareholders", headers=headers).json()) == 2
+
+    bad = {"file": ("shareholders.csv", "code,name,document,email,actions\nSH3,,D3,,1\n", "text/csv")}
+    preview = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=true",
+        files=bad,
+        headers=headers,
+    ).json()
+    assert preview["token"] is None
+
+
+def test_import_preview_token_survives_failed_commit(monkeypatch):
+    from fastapi import HTTPException
+    from app.routers import shareholders as shareholders_router
+
+    headers, election_id = setup_auth_and_election()
+    files = {"file": ("shareholders.csv", "code,name,document,email,actions\nSH1,Alice,D1,,10\n", "text/csv")}
+    token = client.post(
+        f"/elections/{election_id}/shareholders/import-file?preview=true",
+        files=files,
+        headers=headers,
+    ).json()["token"]
+    commit_url = f"/elections/{election_id}/shareholders/import-file/{token}/commit"
+
+    def failing_log(*args, **kwargs):
+        raise HTTPException(status_code=503, detail="unavailable")
+
+    with monkeypatch.context() as m:
+        m.setattr(shareholders_router, "_log", failing_log)
+        assert client.post(commit_url, headers=headers).status_code == 503
+    response = client.post(commit_url, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+
+
+def test_list_shareholders_page_cursor_sort_and_filters():
+    headers, election_id = setup_auth_and_election()
+    data = [
+        {"code": f"SH{i}", "name": name, "document": f"D{i}", "email": None, "actions": actions}
+        for i, (name, actions) in enumerate(
+            [("Carla", 30), ("Ana", 10), ("Beto", 20), ("Dora", 20), ("Eva", 5)], start=1
+        )
+    ]
+    client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    client.post(f"/elections/{election_id}/attendance/SH2/mark", json={"mode": "PRESENCIAL"}, headers=headers)
+
+    url = f"/elections/{election_id}/shareholders/page"
+    first = client.get(url, params={"sort": "name", "limit": 2, "include_total": True}, headers=headers).json()
+    assert [r["name"] for r in first["items"]] == ["Ana", "Beto"]
+    assert first["total"] == 5
+    second = client.get(
+        url, params={"sort": "name", "limit": 2, "cursor": first["next_cursor"]}, headers=headers
+    ).json()
+    assert [r["name"] for r in second["items"]] == ["Carla", "Dora"]
+    assert second["total"] is None
+
+    codes = []
+    cursor = None
+    while True:
+        params = {"sort": "actions", "order": "desc", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get(url, params=params, headers=headers).json()
+        codes += [r["code"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert codes == ["SH1", "SH4", "SH3", "SH2", "SH5"]
+
+    present = client.get(url, params={"mode": "PRESENCIAL"}, headers=headers).json()
+    assert [r["code"] for r in present["items"]] == ["SH2"]
+    assert present["items"][0]["attendance_mode"] == "PRESENCIAL"
+    by_mode = client.get(url, params={"sort": "mode", "limit": 4}, headers=headers).json()
+    assert by_mode["next_cursor"]
+    assert client.get(url, params={"sort": "bogus"}, headers=headers).status_code == 422
+
+
+def test_search_shareholders_accent_insensitive():
+    headers, election_id = setup_auth_and_election()
+    data = [
+        {"code": "SH1", "name": "José Peña", "document": "D1", "email": None, "actions": 10},
+        {"code": "SH2", "name": "Josefina Pérez", "document": "D2", "email": None, "actions": 5},
+        {"code": "SH3", "name": "Ana 100%", "document": "D3", "email": None, "actions": 1},
+    ]
+    client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    url = f"/elections/{election_id}/shareholders"
+
+    resp = client.get(url, params={"q": "PENA"}, headers=headers)
+    assert [r["code"] for r in resp.json()] == ["SH1"]
+    resp = client.get(url, params={"q": "josé"}, headers=headers)
+    assert {r["code"] for r in resp.json()} == {"SH1", "SH2"}
+    resp = client.get(url, params={"q": "0%"}, headers=headers)
+    assert [r["code"] for r in resp.json()] == ["SH3"]
+    page = client.get(f"{url}/page", params={"q": "perez"}, headers=headers).json()
+    assert [r["code"] for r in page["items"]] == ["SH2"]
+
+    # la clave de búsqueda sigue al nombre tras editar
+    shareholder_id = resp.json()[0]["id"]
+    client.put(f"{url}/{shareholder_id}", json={"name": "Ana Núñez"}, headers=headers)
+    resp = client.get(url, params={"q": "nunez"}, headers=headers)
+    assert [r["code"] for r in resp.json()] == ["SH3"]
+    assert client.get(url, params={"q": "100"}, headers=headers).json() == []
+
+
+def test_suggest_shareholders_typeahead():
+    headers, election_id = setup_auth_and_election()
+    typeahead.registry.invalidate()
+    data = [
+        {"code": "SH1", "name": "José Peña", "document": "0912345678", "email": None, "actions": 10},
+        {"code": "SH2", "name": "Josefina Pérez", "document": "0987654321", "email": None, "actions": 5},
+    ]
+    resp = client.post(f"/elections/{election_id}/shareholders/import", json=data, headers=headers)
+    ids = {r["code"]: r["id"] for r in resp.json()}
+    url = f"/elections/{election_id}/shareholders/suggest"
+
+    assert [r["code"] for r in client.get(url, params={"q": "jos pe"}, headers=headers).json()] == ["SH1", "SH2"]
+    assert [r["code"] for r in client.get(url, params={"q": "1234"}, headers=headers).json()] == ["SH1"]
+    assert [r["code"] for r in client.get(url, params={"q": "sh2"}, headers=headers).json()] == ["SH2"]
+
+    client.put(
+        f"/elections/{election_id}/shareholders/{ids['SH2']}",
+        json={"name": "Marta Ruiz"},
+        headers=headers,
+    )
+    assert [r["code"] for r in client.get(url, params={"q": "mart"}, headers=headers).json()] == ["SH2"]
+    client.delete(f"/elections/{election_id}/shareholders/{ids['SH1']}", headers=headers)
+    assert client.get(url, params={"q": "pena"}, headers=headers).json() == []
+    assert client.get(url, headers=headers).status_code == 422
+
+
+def test_typeahead_index_expires_after_ttl(monkeypatch):
+    headers, election_id = setup_auth_and_election()
+    registry = typeahead.TypeaheadRegistry(ttl=30)
+    db = SessionLocal()
+    assert registry.suggest(db, election_id, "ana") == []
+    # Cambio hecho por otro worker: no pasa por este registro
+    sh = models.Shareholder(code="SH9", name="Ana", document="D9", actions=1)
+    db.add(sh)
+    db.flush()
+    db.add(models.Attendance(election_id=election_id, shareholder_id=sh.id))
+    db.commit()
+    assert registry.suggest(db, election_id, "ana") == []
+    now = typeahead.time.monotonic()
+    monkeypatch.setattr(typeahead.time, "monotonic", lambda: now + 31)
+    assert [s.code for s in registry.suggest(db, election_id, "ana")] == ["SH9"]
+    db.close()
+
+
 def test_list_shareholders_scoped_by_election():
     headers, election_id = setup_auth_and_election()
     # Create another election
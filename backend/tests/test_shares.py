@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app import models, shares
+from app.observer import compute_summary
+from app.routers.auth import hash_password
+
+client = TestClient(app)
+
+
+def test_micro_shares_round_trip_is_exact(monkeypatch):
+    monkeypatch.setattr(shares, "SHARES_STORAGE", "micro")
+    column = shares.Shares()
+    stored = [column.process_bind_param(v, None) for v in (Decimal("0.1"), 0.2, 3)]
+    assert stored == [100_000, 200_000, 3_000_000]
+    assert column.process_result_value(sum(stored), None) == Decimal("3.3")
+    assert shares.to_micro(Decimal("0.0000005")) == 0
+    assert shares.to_micro(Decimal("0.0000015")) == 2
+
+
+def test_micro_storage_import_and_vote_totals_are_exact(monkeypatch):
+    monkeypatch.setattr(shares, "SHARES_STORAGE", "micro")
+    # las columnas se crean como BIGINT de micro-acciones
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(models.User(username="AdminBVG", hashed_password=hash_password("BVG2025"), role="ADMIN_BVG"))
+    db.commit()
+    db.close()
+    token = client.post("/auth/login", json={"username": "AdminBVG", "password": "BVG2025"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    election_id = client.post(
+        "/elections", json={"name": "Micro", "date": "2024-01-01"}, headers=headers
+    ).json()["id"]
+
+    data = (
+        "id,accionista,representante_legal,apoderado,acciones\n"
+        "1,Alice,,,0.1\n"
+        "2,Bob,,,0.2\n"
+        "3,Carol,,,1234567.000001\n"
+    )
+    resp = client.post(
+        f"/elections/{election_id}/assistants/import-excel",
+        files={"file": ("attendees.csv", data, "text/csv")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    attendees = {a["identifier"]: a["id"] for a in resp.json()}
+
+    db = SessionLocal()
+    stored = db.execute(text("SELECT actions FROM shareholders ORDER BY code")).scalars().all()
+    assert stored == [100_000, 200_000, 1_234_567_000_001]
+    db.query(models.Attendance).filter_by(election_id=election_id).update(
+        {"present": True, "mode": models.AttendanceMode.PRESENCIAL}
+    )
+    db.commit()
+    db.close()
+
+    client.patch(f"/elections/{election_id}/status", json={"status": "OPEN"}, headers=headers)
+    client.post(f"/elections/{election_id}/start-voting", headers=headers)
+    ballot_id = client.post(
+        f"/elections/{election_id}/ballots", json={"title": "Exacto", "order": 1}, headers=headers
+    ).json()["id"]
+    yes = client.post(f"/ballots/{ballot_id}/options", json={"text": "Yes"}, headers=headers).json()
+    no = client.post(f"/ballots/{ballot_id}/options", json={"text": "No"}, headers=headers).json()
+    for identifier in ("1", "2"):
+        resp = client.post(
+            f"/ballots/{ballot_id}/vote",
+            json={"option_id": yes["id"], "attendee_id": attendees[identifier]},
+            headers=headers,
+        )
+        assert resp.status_code == 200
+    resp = client.post(
+        f"/ballots/{ballot_id}/vote",
+        json={"option_id": no["id"], "attendee_id": attendees["3"]},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+    results = {r["text"]: r["votes"] for r in client.get(f"/ballots/{ballot_id}/results", headers=headers).json()}
+    # con floats 0.1 + 0.2 daría 0.30000000000000004
+    assert results == {"Yes": 0.3, "No": 1234567.000001}
+    db = SessionLocal()
+    summary = compute_summary(db, election_id)
+    db.close()
+    assert summary["capital_suscrito"] == summary["capital_presente_directo"] == 1234567.300001
+
+    # las siguientes pruebas vuelven al almacenamiento DECIMAL
+    monkeypatch.setattr(shares, "SHARES_STORAGE", "decimal")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def test_convert_storage_and_startup_check(tmp_path, monkeypatch):
+    import pytest
+    from sqlalchemy import create_engine
+
+    other = create_engine(f"sqlite:///{tmp_path / 'shares.db'}")
+    with other.begin() as connection:
+        # una base parcial: las tablas que no existen se saltan
+        connection.execute(text("CREATE TABLE settings (key VARCHAR PRIMARY KEY, value VARCHAR)"))
+        connection.execute(
+            text("CREATE TABLE shareholders (id INTEGER PRIMARY KEY, code VARCHAR, actions DECIMAL NOT NULL)")
+        )
+        connection.execute(text("CREATE INDEX ix_shareholders_actions ON shareholders (actions)"))
+        connection.execute(text("INSERT INTO shareholders (code, actions) VALUES ('A', 0.1), ('B', 1234567.000001)"))
+    shares.check_storage(other)
+    monkeypatch.setattr(shares, "SHARES_STORAGE", "micro")
+    with pytest.raises(RuntimeError, match="convert_shares.py micro"):
+        shares.check_storage(other)
+
+    with other.begin() as connection:
+        assert shares.convert_storage(connection, "micro")
+        assert not shares.convert_storage(connection, "micro")
+    shares.check_storage(other)
+    with other.connect() as connection:
+        assert connection.execute(text("SELECT actions FROM shareholders ORDER BY code")).scalars().all() == [
+            100_000,
+            1_234_567_000_001,
+        ]
+        assert connection.execute(text("SELECT value FROM settings")).scalar() == "micro"
+        assert "ix_shareholders_actions" in {i["name"] for i in inspect(connection).get_indexes("shareholders")}
+
+    with other.begin() as connection:
+        assert shares.convert_storage(connection, "decimal")
+    monkeypatch.setattr(shares, "SHARES_STORAGE", "decimal")
+    shares.check_storage(other)
+    with other.connect() as connection:
+        values = connection.execute(text("SELECT actions FROM shareholders ORDER BY code")).scalars().all()
+    assert [round(float(v), 6) for v in values] == [0.1, 1234567.000001]
+    other.dispose()
@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.routers.auth import hash_password
+
+client = TestClient(app)
+
+
+def admin_headers():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(
+        models.User(
+            username="AdminBVG",
+            hashed_password=hash_password("BVG2025"),
+            role="ADMIN_BVG",
+        )
+    )
+    db.commit()
+    db.close()
+    token = client.post("/auth/login", json={"username": "AdminBVG", "password": "BVG2025"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_create_and_update_user():
+    headers = admin_headers()
+    resp = client.post(
+        "/users", json={"username": "reg", "password": "pw", "role": "FUNCIONAL_BVG"}, headers=headers
+    )
+    assert resp.status_code == 200
+    user_id = resp.json()["id"]
+    assert client.post("/auth/login", json={"username": "reg", "password": "pw"}).status_code == 200
+    resp = client.put(f"/users/{user_id}", json={"password": "pw2"}, headers=headers)
+    assert resp.status_code == 200
+    assert client.post("/auth/login", json={"username": "reg", "password": "pw"}).status_code == 401
+    assert client.post("/auth/login", json={"username": "reg", "password": "pw2"}).status_code == 200
+
+
+def test_bulk_create_users():
+    headers = admin_headers()
+    payload = [
+        {"username": f"bulk{i}", "password": f"pw{i}", "role": "FUNCIONAL_BVG"} for i in range(3)
+    ]
+    resp = client.post("/users/bulk", json=payload, headers=headers)
+    assert resp.status_code == 200
+    assert [u["username"] for u in resp.json()] == ["bulk0", "bulk1", "bulk2"]
+    resp = client.post("/auth/login", json={"username": "bulk2", "password": "pw2"})
+    assert resp.status_code == 200
+    resp = client.post("/users/bulk", json=payload[:1], headers=headers)
+    assert resp.status_code == 400